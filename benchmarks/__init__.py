@@ -0,0 +1,4 @@
+"""Standalone performance benchmarks for the movie web app.
+
+Each module can be run directly, e.g. ``python -m benchmarks.user_lookup``.
+"""
@@ -0,0 +1,46 @@
+"""Benchmark a page of movies served as HTML (/movies) against the JSON API, per available encoder."""
+import os
+import time
+
+from movie import create_app
+from movie.api import encoders
+from movie.movies.services import MOVIE_FIELDS
+
+REQUESTS = 300
+
+
+def measure(client, url, headers, requests):
+    start = time.perf_counter()
+    size = 0
+    for i in range(requests):
+        size = len(client.get(url.format(rank=i % 900 + 1), headers=headers).data)
+    return requests / (time.perf_counter() - start), size
+
+
+def run(requests=REQUESTS):
+    # Without the page cache, so every HTML request renders its template.
+    app = create_app({
+        'TEST_DATA_PATH': os.path.join('movie', 'adapters', 'data'),
+        'REPOSITORY': 'memory',
+        'PAGE_CACHE': '',
+    })
+    client = app.test_client()
+
+    paths = [('html', '/movies?rank={rank}', {})]
+    json_encoder = 'orjson' if encoders.orjson is not None else 'json'
+    paths.append((json_encoder, '/api/v1/movies?after={rank}&limit=10', {'Accept': encoders.JSON}))
+    paths.append((json_encoder + ' +reviews', '/api/v1/movies?after={rank}&limit=10&fields=' +
+                  ','.join(MOVIE_FIELDS), {'Accept': encoders.JSON}))
+    if encoders.msgpack is not None:
+        paths.append(('msgpack', '/api/v1/movies?after={rank}&limit=10', {'Accept': encoders.MSGPACK}))
+
+    results = []
+    for name, url, headers in paths:
+        requests_per_second, size = measure(client, url, headers, requests)
+        results.append({'format': name, 'requests_per_second': requests_per_second, 'bytes': size})
+    return results
+
+
+if __name__ == '__main__':
+    for result in run():
+        print(f"{result['format']:<16} {result['requests_per_second']:8.1f} requests/s {result['bytes']:8d} bytes")
@@ -0,0 +1,61 @@
+"""Benchmark the streaming movie ingest into SQLite on a synthetic CSV of up to a million rows."""
+import csv
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from movie.adapters import csv_ingest, database_repository, orm
+
+DATA_PATH = os.path.join('movie', 'adapters', 'data')
+SIZES = (1_000, 100_000, 1_000_000)
+
+
+def write_synthetic_csv(filename, number_of_rows, data_path=DATA_PATH):
+    # Repeats the bundled catalogue with fresh ranks until number_of_rows rows have been written.
+    with open(os.path.join(data_path, 'Data1000Movies.csv'), encoding='utf-8-sig', newline='') as infile:
+        reader = csv.reader(infile)
+        header = next(reader)
+        rows = list(reader)
+
+    with open(filename, 'w', encoding='utf-8', newline='') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(header)
+        for rank in range(1, number_of_rows + 1):
+            row = list(rows[(rank - 1) % len(rows)])
+            row[0] = rank
+            writer.writerow(row)
+
+
+def measure(number_of_rows, directory):
+    filename = os.path.join(directory, f'movies-{number_of_rows}.csv')
+    write_synthetic_csv(filename, number_of_rows)
+
+    engine = database_repository.create_database_engine({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(directory, f'movies-{number_of_rows}.db'),
+        'SQLALCHEMY_ECHO': False,
+        'SQLALCHEMY_POOL_CLASS': 'null',
+    })
+    orm.metadata.create_all(engine)
+
+    conn = engine.raw_connection()
+    start = time.perf_counter()
+    csv_ingest.ingest_movies(filename, csv_ingest.DatabaseMovieSink(conn))
+    elapsed = time.perf_counter() - start
+    conn.close()
+
+    return {'rows': number_of_rows, 'seconds': elapsed, 'rows_per_second': number_of_rows / elapsed,
+            'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+
+
+def run(sizes=SIZES):
+    with tempfile.TemporaryDirectory() as directory:
+        return [measure(size, directory) for size in sizes]
+
+
+if __name__ == '__main__':
+    sizes = tuple(int(size) for size in sys.argv[1:]) or SIZES
+    for result in run(sizes):
+        print(f"{result['rows']:>9} rows: {result['seconds']:7.2f}s  {result['rows_per_second']:9.0f} rows/s  "
+              f"max RSS {result['max_rss_mb']:.0f} MB")
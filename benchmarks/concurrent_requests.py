@@ -0,0 +1,55 @@
+"""Benchmark /movies throughput on the database repository under concurrent workers, per connection pool class."""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy.orm import clear_mappers
+
+from movie import create_app
+
+POOL_CLASSES = ('null', 'singleton', 'queue')
+WORKERS = 8
+REQUESTS_PER_WORKER = 50
+
+
+def measure(pool_class, database_uri, workers=WORKERS, requests_per_worker=REQUESTS_PER_WORKER):
+    app = create_app({
+        'TEST_DATA_PATH': os.path.join('movie', 'adapters', 'data'),
+        'REPOSITORY': 'database',
+        'SQLALCHEMY_DATABASE_URI': database_uri,
+        'SQLALCHEMY_ECHO': False,
+        'SQLALCHEMY_POOL_CLASS': pool_class,
+        # The singleton pool keeps one connection per thread and must have room for every worker thread plus this one.
+        'SQLALCHEMY_POOL_SIZE': workers + 1,
+    })
+
+    def worker(offset):
+        client = app.test_client()
+        for i in range(requests_per_worker):
+            client.get(f'/movies?rank={(offset * requests_per_worker + i) % 990 + 1}')
+
+    threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(workers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    clear_mappers()
+    return workers * requests_per_worker / elapsed
+
+
+def run(pool_classes=POOL_CLASSES, workers=WORKERS):
+    with tempfile.TemporaryDirectory() as directory:
+        database_uri = 'sqlite:///' + os.path.join(directory, 'movies.db')
+        return [{'pool': pool_class, 'workers': workers, 'requests_per_second': measure(pool_class, database_uri, workers)}
+                for pool_class in pool_classes]
+
+
+if __name__ == '__main__':
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else WORKERS
+    for result in run(workers=workers):
+        print(f"{result['pool']:<10} {result['workers']} workers: {result['requests_per_second']:8.1f} requests/s")
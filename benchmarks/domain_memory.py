@@ -0,0 +1,64 @@
+"""Benchmark memory held per movie by a MemoryRepository populated from the movie CSV.
+
+The catalogue is loaded `copies` times with shifted ranks, so the figures reflect a large catalogue rather than the
+fixed cost of an empty repository. Run against two checkouts to compare domain model layouts.
+"""
+import os
+import tracemalloc
+
+from movie.adapters import csv_ingest, memory_repository
+from movie.domain.movie import Movie
+
+DATA_PATH = os.path.join('movie', 'adapters', 'data')
+
+
+def traced_bytes(function):
+    tracemalloc.start()
+    try:
+        kept = function()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del kept
+    return current
+
+
+def run(data_path=DATA_PATH, copies=20):
+    records = list(csv_ingest.read_movie_records(os.path.join(data_path, 'Data1000Movies.csv')))
+    number_of_movies = len(records) * copies
+
+    def copied_records():
+        # Fresh strings for every copy, as parsing a larger file would produce.
+        for copy in range(copies):
+            offset = copy * len(records)
+            for record in records:
+                yield record._replace(rank=record.rank + offset, title=''.join(record.title),
+                                      description=' '.join(record.description.split(' ')),
+                                      director=' '.join(record.director.split(' ')),
+                                      metascore=''.join(record.metascore))
+
+    def populate():
+        repo = memory_repository.MemoryRepository()
+        sink = csv_ingest.MemoryMovieSink(repo)
+        for record in copied_records():
+            sink.add(record)
+        sink.close()
+        return repo
+
+    def movies_only():
+        return [Movie(record.rank, record.title, record.year, record.description, record.director,
+                      record.runtime_minutes, record.rating, record.metascore)
+                for record in copied_records()]
+
+    return {
+        'movies': number_of_movies,
+        'repository_bytes_per_movie': traced_bytes(populate) / number_of_movies,
+        'movie_object_bytes': traced_bytes(movies_only) / number_of_movies,
+    }
+
+
+if __name__ == '__main__':
+    result = run()
+    print(f"{result['movies']} movies")
+    print(f"populated repository {result['repository_bytes_per_movie']:8.0f} bytes per movie")
+    print(f"bare Movie objects   {result['movie_object_bytes']:8.0f} bytes per movie")
@@ -0,0 +1,117 @@
+"""Benchmark faceted browsing (a filtered page plus facet counts) on synthetic catalogues, memory and SQLite."""
+import os
+import sys
+import tempfile
+import time
+from typing import NamedTuple, Optional, Tuple
+
+from sqlalchemy.orm import sessionmaker, clear_mappers
+
+from benchmarks.bulk_load import write_synthetic_csv
+from movie.adapters import csv_ingest, database_repository, orm
+from movie.adapters.facet_index import FacetIndex, bitset_ranks
+from movie.adapters.repository import MovieFilter
+from movie.domain.genre import Genre
+
+DATA_PATH = os.path.join('movie', 'adapters', 'data')
+MEMORY_SIZE = 1_000_000
+DATABASE_SIZE = 100_000
+REPEAT = 20
+
+FILTERS = (
+    MovieFilter(),
+    MovieFilter(genres=('Drama',)),
+    MovieFilter(genres=('Action', 'Sci-Fi'), min_year=2015),
+    MovieFilter(director='Ridley Scott'),
+    MovieFilter(min_rating=7.5, max_year=2010),
+)
+
+
+class IndexedMovie(NamedTuple):
+    # The fields FacetIndex reads, without the rest of a Movie, so a million of them fit comfortably in memory.
+    rank: int
+    genres: Tuple[Genre, ...]
+    director: str
+    year: int
+    rating: Optional[float]
+
+
+def timed(function, repeat=REPEAT):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+def measure_memory(size, data_path=DATA_PATH):
+    records = list(csv_ingest.read_movie_records(os.path.join(data_path, 'Data1000Movies.csv')))
+    genres = dict()
+    index = FacetIndex()
+    start = time.perf_counter()
+    for rank in range(1, size + 1):
+        record = records[(rank - 1) % len(records)]
+        index.add_movie(IndexedMovie(rank, tuple(genres.setdefault(name, Genre(name)) for name in record.genres),
+                                     record.director, record.year, record.rating))
+    build_seconds = time.perf_counter() - start
+
+    def browse(movie_filter):
+        matched = index.filter(movie_filter)
+        return bitset_ranks(matched, 0, 10), matched.bit_count(), index.counts(matched)
+
+    # The first query of each filter builds and caches its bitsets; report it apart from the steady state.
+    cold = [timed(lambda: browse(movie_filter), 1) for movie_filter in FILTERS]
+    warm = [timed(lambda: browse(movie_filter)) for movie_filter in FILTERS]
+    return build_seconds, cold, warm
+
+
+def measure_database(size, directory):
+    filename = os.path.join(directory, 'movies.csv')
+    write_synthetic_csv(filename, size)
+    engine = database_repository.create_database_engine({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(directory, 'movies.db'),
+        'SQLALCHEMY_ECHO': False,
+        'SQLALCHEMY_POOL_CLASS': 'queue',
+    })
+    orm.metadata.create_all(engine)
+    conn = engine.raw_connection()
+    csv_ingest.ingest_movies(filename, csv_ingest.DatabaseMovieSink(conn))
+    conn.close()
+
+    orm.map_model_to_tables()
+    try:
+        repo = database_repository.SqlAlchemyRepository(sessionmaker(bind=engine))
+
+        def browse(movie_filter):
+            repo.get_movies_by_filter(movie_filter, 0, 10)
+            repo.get_facet_counts(movie_filter)
+            repo.reset_session()
+
+        return [timed(lambda: browse(movie_filter), REPEAT // 4) for movie_filter in FILTERS]
+    finally:
+        clear_mappers()
+
+
+def run(memory_size=MEMORY_SIZE, database_size=DATABASE_SIZE):
+    build_seconds, cold, warm = measure_memory(memory_size)
+    with tempfile.TemporaryDirectory() as directory:
+        database = measure_database(database_size, directory)
+    return {
+        'memory_size': memory_size,
+        'memory_build_seconds': build_seconds,
+        'database_size': database_size,
+        'filters': [{'filter': movie_filter, 'memory_cold_seconds': cold_seconds, 'memory_seconds': warm_seconds,
+                     'database_seconds': database_seconds}
+                    for movie_filter, cold_seconds, warm_seconds, database_seconds
+                    in zip(FILTERS, cold, warm, database)],
+    }
+
+
+if __name__ == '__main__':
+    sizes = [int(size) for size in sys.argv[1:3]]
+    result = run(*sizes)
+    print(f"memory: {result['memory_size']} movies indexed in {result['memory_build_seconds']:.1f}s; "
+          f"SQLite: {result['database_size']} movies")
+    for row in result['filters']:
+        described = {name: value for name, value in row['filter']._asdict().items() if value} or 'no filter'
+        print(f"{str(described):<60} memory {row['memory_seconds'] * 1e3:7.2f} ms "
+              f"(first {row['memory_cold_seconds'] * 1e3:7.1f} ms)  SQLite {row['database_seconds'] * 1e3:8.2f} ms")
@@ -0,0 +1,59 @@
+"""Micro-benchmark of the /movies request path on heavily reviewed movies: eager movie dicts against lazy ones."""
+import os
+import time
+
+from flask import render_template
+
+import movie.adapters.repository as repo
+import movie.movies.services as services
+from movie import create_app
+from movie.domain.review import make_review
+from movie.domain.user import User
+
+REVIEWS_PER_MOVIE = 500
+REPEAT = 200
+
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+def run(reviews_per_movie=REVIEWS_PER_MOVIE, repeat=REPEAT):
+    app = create_app({
+        'TEST_DATA_PATH': os.path.join('movie', 'adapters', 'data'),
+        'REPOSITORY': 'memory',
+        'PAGE_CACHE': '',
+    })
+    movies_per_page = app.config['MOVIES_PER_PAGE']
+
+    reviewer = User('benchmark', 'password')
+    repo.repo_instance.add_user(reviewer)
+    for movie in repo.repo_instance.get_movies_page(0, movies_per_page):
+        for i in range(reviews_per_movie):
+            repo.repo_instance.add_review(make_review(f'Review {i}', reviewer, movie))
+
+    def render(lazy):
+        # The page as /movies renders it, without the reviews of any movie expanded.
+        movies, next_rank = services.get_movies_page(0, movies_per_page, repo.repo_instance, lazy=lazy)
+        render_template('news/articles.html', title='Movie Rankings', movies=movies, first_movie_url=None,
+                        prev_movie_url=None, next_movie_url=None, show_reviews_for_movies=-1)
+
+    with app.test_request_context('/movies'):
+        eager = timed(lambda: render(False), repeat)
+        lazy = timed(lambda: render(True), repeat)
+
+    client = app.test_client()
+    request = timed(lambda: client.get('/movies?rank=1'), repeat)
+    return {'reviews_per_movie': reviews_per_movie, 'eager_seconds': eager, 'lazy_seconds': lazy,
+            'request_seconds': request}
+
+
+if __name__ == '__main__':
+    result = run()
+    print(f"{result['reviews_per_movie']} reviews on each movie of the page")
+    print(f"eager movie dicts {result['eager_seconds'] * 1e3:8.2f} ms per page")
+    print(f"lazy movie dicts  {result['lazy_seconds'] * 1e3:8.2f} ms per page")
+    print(f"GET /movies       {result['request_seconds'] * 1e3:8.2f} ms per request")
@@ -0,0 +1,69 @@
+"""Benchmark review profanity checks: better_profanity against the compiled ProfanityMatcher, on long and many reviews."""
+import random
+import sys
+import time
+
+from better_profanity import profanity
+
+from movie.movies.profanity_filter import create_profanity_matcher
+
+REVIEW_LENGTHS = (200, 2_000, 20_000)
+BATCH = 1_000
+WORDS = ('the', 'plot', 'was', 'slow', 'but', 'acting', 'carried', 'it', 'a', 'classic', 'of', 'its', 'kind',
+         'ending', 'felt', 'rushed', 'and', 'score', 'soared')
+
+
+def clean_review(length, rng):
+    words = []
+    while sum(len(word) + 1 for word in words) < length:
+        words.append(rng.choice(WORDS))
+    return ' '.join(words).capitalize() + '.'
+
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+def run(lengths=REVIEW_LENGTHS, batch=BATCH):
+    rng = random.Random(0)
+    start = time.perf_counter()
+    matcher = create_profanity_matcher({})
+    build_seconds = time.perf_counter() - start
+
+    rows = []
+    for length in lengths:
+        # Clean reviews are the common case and the slow one: every word has to be looked at.
+        review = clean_review(length, rng)
+        assert profanity.contains_profanity(review) == matcher.contains_profanity(review) == False
+        repeat = max(1, 20_000 // length)
+        rows.append({
+            'length': len(review),
+            'better_profanity_seconds': timed(lambda: profanity.contains_profanity(review), repeat),
+            'matcher_seconds': timed(lambda: matcher.contains_profanity(review), repeat * 10),
+        })
+
+    reviews = [clean_review(rng.randint(50, 500), rng) for _ in range(batch)]
+    reviews[::50] = [review + ' What shit.' for review in reviews[::50]]
+    assert matcher.check_many(reviews) == [profanity.contains_profanity(review) for review in reviews]
+    return {
+        'build_seconds': build_seconds,
+        'reviews': rows,
+        'batch': batch,
+        'batch_better_profanity_seconds': timed(lambda: [profanity.contains_profanity(r) for r in reviews], 1),
+        'batch_matcher_seconds': timed(lambda: [matcher.contains_profanity(r) for r in reviews], 5),
+        'batch_check_many_seconds': timed(lambda: matcher.check_many(reviews), 5),
+    }
+
+
+if __name__ == '__main__':
+    result = run(*[int(argument) for argument in sys.argv[1:2]])
+    print(f"matcher built in {result['build_seconds'] * 1e3:.1f} ms")
+    for row in result['reviews']:
+        print(f"{row['length']:>7} characters: better_profanity {row['better_profanity_seconds'] * 1e3:9.2f} ms  "
+              f"matcher {row['matcher_seconds'] * 1e3:7.3f} ms")
+    print(f"{result['batch']} reviews: better_profanity {result['batch_better_profanity_seconds'] * 1e3:.1f} ms  "
+          f"matcher {result['batch_matcher_seconds'] * 1e3:.1f} ms  "
+          f"check_many {result['batch_check_many_seconds'] * 1e3:.1f} ms")
@@ -0,0 +1,205 @@
+"""Repository benchmark suite: the same scenarios against the memory and database repositories at several sizes.
+
+Catalogues of each size are generated from Data1000Movies.csv, with a user for every ten movies. The scenarios are rank
+lookup, previous/next navigation, user lookup, review insert and rendering /movies through the Flask test client (with
+the page cache off). Results are written as JSON and compared with a stored baseline; the suite exits with status 1 when
+the median time of a scenario has grown by more than the tolerance.
+
+    python -m benchmarks.repository_suite --sizes 1000,10000,100000 --output results.json
+    python -m benchmarks.repository_suite --sizes 1000,1000000 --backends memory
+    python -m benchmarks.repository_suite --update-baseline
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from sqlalchemy.orm import clear_mappers
+
+import movie.adapters.repository as repo
+from benchmarks.bulk_load import write_synthetic_csv
+from movie import create_app
+from movie.domain.review import make_review
+
+DATA_PATH = os.path.join('movie', 'adapters', 'data')
+BASELINE = os.path.join('benchmarks', 'baseline.json')
+SIZES = (1_000, 10_000, 100_000)
+BACKENDS = ('memory', 'database')
+REPEAT = 200
+TOLERANCE = 0.5
+# Memory repository lookups take microseconds, where timer noise alone exceeds any relative tolerance.
+MIN_DIFFERENCE_MS = 0.05
+
+
+def write_catalogue(directory, size, data_path=DATA_PATH):
+    write_synthetic_csv(os.path.join(directory, 'Data1000Movies.csv'), size, data_path)
+    shutil.copy(os.path.join(data_path, 'reviews.csv'), directory)
+
+    # Every generated user shares the password hash of the first bundled user, so none is hashed while loading.
+    with open(os.path.join(data_path, 'users.csv'), encoding='utf-8-sig', newline='') as infile:
+        reader = csv.reader(infile)
+        header = next(reader)
+        users = list(reader)
+    with open(os.path.join(directory, 'users.csv'), 'w', encoding='utf-8', newline='') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(header)
+        writer.writerows(users)
+        for user_id in range(len(users) + 1, max(size // 10, len(users)) + 1):
+            writer.writerow([user_id, f'user{user_id}', users[0][2]])
+    return [user[1] for user in users] + [f'user{user_id}' for user_id in range(len(users) + 1, size // 10 + 1)]
+
+
+def summarize(timings):
+    mean = statistics.fmean(timings)
+    # Inclusive, so that the p95 of a few runs is not extrapolated beyond the slowest.
+    p95 = statistics.quantiles(timings, n=20, method='inclusive')[-1] if len(timings) > 1 else timings[0]
+    return {
+        'mean_ms': mean * 1000,
+        'p50_ms': statistics.median(timings) * 1000,
+        'p95_ms': p95 * 1000,
+        'ops_per_second': 1 / mean,
+    }
+
+
+def scenarios(app, repository, size, usernames, rng):
+    client = app.test_client()
+
+    def navigate():
+        movie = repository.get_movie(rng.randint(1, size))
+        repository.get_rank_of_previous_movie(movie)
+        repository.get_rank_of_next_movie(movie)
+
+    def insert_review():
+        # As services.add_review does, the movie and its reviewer are read in the session the review is added in.
+        movie = repository.get_movie(rng.randint(1, size))
+        user = repository.get_user(rng.choice(usernames))
+        repository.add_review(make_review('A benchmark review', user, movie))
+
+    return {
+        'rank lookup': lambda: repository.get_movie(rng.randint(1, size)),
+        'navigation': navigate,
+        'user lookup': lambda: repository.get_user(rng.choice(usernames)),
+        'review insert': insert_review,
+        'page render': lambda: client.get(f'/movies?rank={rng.randint(1, size)}'),
+    }
+
+
+def measure(backend, size, catalogue, usernames, directory, repeat=REPEAT, seed=0):
+    start = time.perf_counter()
+    app = create_app({
+        'TESTING': True,
+        'TEST_DATA_PATH': catalogue,
+        'REPOSITORY': backend,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(directory, f'movies-{size}.db'),
+        'SQLALCHEMY_ECHO': False,
+        'PAGE_CACHE': '',
+        'WTF_CSRF_ENABLED': False,
+    })
+    setup_seconds = time.perf_counter() - start
+
+    results = []
+    try:
+        with app.app_context():
+            repository = repo.repo_instance
+            for name, scenario in scenarios(app, repository, size, usernames, random.Random(seed)).items():
+                timings = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    scenario()
+                    timings.append(time.perf_counter() - start)
+                    # Each run starts with an empty database session, as a request does.
+                    repository.close_session()
+                results.append(dict(backend=backend, size=size, scenario=name, **summarize(timings)))
+    finally:
+        clear_mappers()
+    return {'backend': backend, 'size': size, 'setup_seconds': setup_seconds}, results
+
+
+def run(sizes=SIZES, backends=BACKENDS, repeat=REPEAT):
+    setups, results = [], []
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            catalogue = os.path.join(directory, f'catalogue-{size}')
+            os.mkdir(catalogue)
+            usernames = write_catalogue(catalogue, size)
+            for backend in backends:
+                setup, size_results = measure(backend, size, catalogue, usernames, directory, repeat)
+                setups.append(setup)
+                results.extend(size_results)
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'sqlite': sqlite3.sqlite_version,
+        },
+        'repeat': repeat,
+        'setup': setups,
+        'results': results,
+    }
+
+
+def regressions(report, baseline, tolerance=TOLERANCE, min_difference_ms=MIN_DIFFERENCE_MS):
+    """Returns (result, baseline result) for each scenario whose median time exceeds the baseline's by the tolerance,
+    and by at least min_difference_ms. Scenarios missing from the baseline are not compared.
+    """
+    expected = {(result['backend'], result['size'], result['scenario']): result for result in baseline['results']}
+    slower = []
+    for result in report['results']:
+        previous = expected.get((result['backend'], result['size'], result['scenario']))
+        if previous is not None and result['p50_ms'] > max(previous['p50_ms'] * (1 + tolerance),
+                                                           previous['p50_ms'] + min_difference_ms):
+            slower.append((result, previous))
+    return slower
+
+
+def print_report(report):
+    for setup in report['setup']:
+        print(f"{setup['backend']:<9}{setup['size']:>9} movies: set up in {setup['setup_seconds']:.1f}s")
+    print(f"{'backend':<9}{'movies':>9}  {'scenario':<14}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'per s':>10}")
+    for result in report['results']:
+        print(f"{result['backend']:<9}{result['size']:>9}  {result['scenario']:<14}{result['mean_ms']:>10.3f}"
+              f"{result['p50_ms']:>10.3f}{result['p95_ms']:>10.3f}{result['ops_per_second']:>10.0f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.repository_suite')
+    parser.add_argument('--sizes', default=','.join(map(str, SIZES)), help='comma-separated catalogue sizes')
+    parser.add_argument('--backends', default=','.join(BACKENDS), help='comma-separated: memory, database')
+    parser.add_argument('--repeat', type=int, default=REPEAT, help='runs of each scenario')
+    parser.add_argument('--output', help='file to write the results to as JSON')
+    parser.add_argument('--baseline', default=BASELINE, help='results to compare with')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='fraction by which a median may exceed the baseline before it counts as a regression')
+    parser.add_argument('--min-difference-ms', type=float, default=MIN_DIFFERENCE_MS,
+                        help='least growth of a median, in milliseconds, that counts as a regression')
+    parser.add_argument('--update-baseline', action='store_true', help='write the results to the baseline file')
+    arguments = parser.parse_args()
+
+    report = run(tuple(int(size) for size in arguments.sizes.split(',')), tuple(arguments.backends.split(',')),
+                 arguments.repeat)
+    print_report(report)
+    if arguments.output:
+        with open(arguments.output, 'w', encoding='utf-8') as outfile:
+            json.dump(report, outfile, indent=2)
+
+    if arguments.update_baseline:
+        with open(arguments.baseline, 'w', encoding='utf-8') as outfile:
+            json.dump(report, outfile, indent=2)
+        print(f'Wrote baseline {arguments.baseline}')
+    elif os.path.exists(arguments.baseline):
+        with open(arguments.baseline, encoding='utf-8') as infile:
+            slower = regressions(report, json.load(infile), arguments.tolerance, arguments.min_difference_ms)
+        for result, previous in slower:
+            print(f"REGRESSION {result['backend']} {result['size']} {result['scenario']}: "
+                  f"p50 {result['p50_ms']:.3f} ms against {previous['p50_ms']:.3f} ms")
+        if slower:
+            sys.exit(1)
+        print(f'No regressions against {arguments.baseline} beyond {arguments.tolerance:.0%}')
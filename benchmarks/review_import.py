@@ -0,0 +1,108 @@
+"""Benchmark the streaming review import and export against adding reviews one at a time through the repository."""
+import csv
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+
+from sqlalchemy.orm import sessionmaker, clear_mappers
+
+from movie.adapters import csv_ingest, database_repository, orm, review_csv
+from movie.domain.review import make_review
+
+DATA_PATH = os.path.join('movie', 'adapters', 'data')
+SIZES = (10_000, 1_000_000)
+USERS = 1_000
+# Reviews added one by one through the repository; each is a query for its user, one for its movie and a commit.
+REPOSITORY_SAMPLE = 500
+
+
+def write_synthetic_reviews(filename, number_of_reviews, number_of_users=USERS, number_of_movies=1_000):
+    rng = random.Random(0)
+    start = datetime(2020, 1, 1)
+    with open(filename, 'w', encoding='utf-8', newline='') as outfile:
+        writer = csv.writer(outfile, lineterminator='\n')
+        writer.writerow(review_csv.HEADER)
+        for review_id in range(1, number_of_reviews + 1):
+            writer.writerow([review_id, rng.randint(1, number_of_users), rng.randint(1, number_of_movies),
+                             f'Review {review_id}: ' + 'a fine film, ' * rng.randint(1, 20),
+                             (start + timedelta(seconds=review_id)).isoformat(' ')])
+
+
+def create_database(directory):
+    engine = database_repository.create_database_engine({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(directory, 'movies.db'),
+        'SQLALCHEMY_ECHO': False,
+        'SQLALCHEMY_POOL_CLASS': 'null',
+    })
+    orm.metadata.create_all(engine)
+    conn = engine.raw_connection()
+    csv_ingest.ingest_movies(os.path.join(DATA_PATH, 'Data1000Movies.csv'), csv_ingest.DatabaseMovieSink(conn))
+    conn.cursor().executemany("INSERT INTO users (id, username, password) VALUES (?, ?, ?)",
+                              [(user_id, f'user{user_id}', 'not a hash') for user_id in range(1, USERS + 1)])
+    conn.commit()
+    conn.close()
+    return engine
+
+
+def measure_repository(engine, filename):
+    orm.map_model_to_tables()
+    try:
+        repo = database_repository.SqlAlchemyRepository(sessionmaker(bind=engine))
+        records = list(islice(review_csv.read_review_records(filename), REPOSITORY_SAMPLE))
+        start = time.perf_counter()
+        for record in records:
+            user = repo.get_user(f'user{record.user_id}')
+            movie = repo.get_movie(record.movie_rank)
+            repo.add_review(make_review(record.review_text, user, movie, record.timestamp))
+        elapsed = time.perf_counter() - start
+        repo.close_session()
+        return len(records) / elapsed
+    finally:
+        clear_mappers()
+
+
+def measure(number_of_reviews, directory):
+    filename = os.path.join(directory, f'reviews-{number_of_reviews}.csv')
+    write_synthetic_reviews(filename, number_of_reviews)
+    engine = create_database(directory)
+
+    conn = engine.raw_connection()
+    start = time.perf_counter()
+    added, skipped = review_csv.ingest_reviews(filename, review_csv.DatabaseReviewSink(conn))
+    import_seconds = time.perf_counter() - start
+    max_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    start = time.perf_counter()
+    review_csv.export_reviews(conn, os.path.join(directory, 'exported.csv'))
+    export_seconds = time.perf_counter() - start
+    conn.close()
+
+    return {
+        'reviews': added,
+        'import_rows_per_second': added / import_seconds,
+        'export_rows_per_second': added / export_seconds,
+        'repository_rows_per_second': measure_repository(engine, filename),
+        'max_rss_mb': max_rss_mb,
+    }
+
+
+def run(sizes=SIZES):
+    results = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            results.append(measure(size, directory))
+    return results
+
+
+if __name__ == '__main__':
+    sizes = tuple(int(size) for size in sys.argv[1:]) or SIZES
+    for result in run(sizes):
+        print(f"{result['reviews']:>9} reviews: import {result['import_rows_per_second']:9.0f} rows/s  "
+              f"export {result['export_rows_per_second']:9.0f} rows/s  "
+              f"one at a time {result['repository_rows_per_second']:6.0f} rows/s  "
+              f"max RSS {result['max_rss_mb']:.0f} MB")
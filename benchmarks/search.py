@@ -0,0 +1,49 @@
+"""Benchmark top-20 SearchIndex queries on the bundled catalogue and on synthetic catalogues."""
+import os
+import random
+import sys
+import timeit
+
+from movie.adapters import memory_repository
+from movie.adapters.search_index import SearchIndex, tokenize
+
+DATA_PATH = os.path.join('movie', 'adapters', 'data')
+QUERIES = ('galaxy', 'love story', 'a young man must save the world', 'murder detective city', 'war')
+SYNTHETIC_SIZES = (10_000, 100_000, 1_000_000)
+
+
+def time_queries(index, queries=QUERIES, repeat=200):
+    elapsed = timeit.timeit(lambda: [index.search(query, 20) for query in queries], number=repeat)
+    return elapsed / (repeat * len(queries)) * 1e3
+
+
+def catalogue_index(data_path=DATA_PATH):
+    index = SearchIndex()
+    for row in memory_repository.read_csv_file(os.path.join(data_path, 'Data1000Movies.csv')):
+        index.add_document(int(row[0]), row[1], row[3])
+    return index
+
+
+def synthetic_index(size, data_path=DATA_PATH):
+    # Synthetic titles are drawn from the vocabulary of the real catalogue.
+    vocabulary = sorted({term for row in memory_repository.read_csv_file(os.path.join(data_path, 'Data1000Movies.csv'))
+                         for term in tokenize(row[1] + ' ' + row[3])})
+    rng = random.Random(size)
+    index = SearchIndex()
+    for document_id in range(size):
+        index.add_document(document_id, ' '.join(rng.choices(vocabulary, k=3)), '')
+    return index
+
+
+def run(sizes=SYNTHETIC_SIZES):
+    results = [{'documents': 1000, 'dataset': 'Data1000Movies.csv', 'ms_per_query': time_queries(catalogue_index())}]
+    for size in sizes:
+        results.append({'documents': size, 'dataset': 'synthetic',
+                        'ms_per_query': time_queries(synthetic_index(size), repeat=5)})
+    return results
+
+
+if __name__ == '__main__':
+    sizes = tuple(int(size) for size in sys.argv[1:]) or SYNTHETIC_SIZES
+    for result in run(sizes):
+        print(f"{result['documents']:>9} {result['dataset']:<18} {result['ms_per_query']:8.3f} ms/query (top 20)")
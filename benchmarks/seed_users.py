@@ -0,0 +1,51 @@
+"""Benchmark loading seed users: plaintext hashed serially, plaintext hashed in a process pool, and pre-hashed."""
+import os
+import sys
+import tempfile
+import time
+
+from movie.adapters import user_seed
+
+SIZES = (100, 1_000)
+
+
+def write_plaintext(filename, number_of_users):
+    with open(filename, 'w', encoding='utf-8') as outfile:
+        outfile.write('id,username,password\n')
+        for i in range(number_of_users):
+            outfile.write(f'{i},user{i},Password{i}\n')
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def measure(number_of_users, directory):
+    plaintext = os.path.join(directory, f'plaintext-{number_of_users}.csv')
+    hashed = os.path.join(directory, f'hashed-{number_of_users}.csv')
+    write_plaintext(plaintext, number_of_users)
+    user_seed.convert_seed_file(plaintext, hashed)
+
+    _, rows = user_seed.read_rows(plaintext)
+    passwords = [row[2] for row in rows]
+    return {
+        'users': number_of_users,
+        'serial_seconds': timed(lambda: [user_seed.generate_password_hash(password) for password in passwords]),
+        'parallel_seconds': timed(user_seed.hash_passwords, passwords),
+        'pre_hashed_seconds': timed(user_seed.load_user_records, hashed),
+    }
+
+
+def run(sizes=SIZES):
+    with tempfile.TemporaryDirectory() as directory:
+        return [measure(size, directory) for size in sizes]
+
+
+if __name__ == '__main__':
+    sizes = tuple(int(size) for size in sys.argv[1:]) or SIZES
+    for result in run(sizes):
+        print(f"{result['users']:>6} users: serial {result['serial_seconds']:7.3f}s  "
+              f"process pool ({os.cpu_count()} CPUs) {result['parallel_seconds']:7.3f}s  "
+              f"pre-hashed {result['pre_hashed_seconds']:7.4f}s")
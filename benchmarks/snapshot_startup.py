@@ -0,0 +1,39 @@
+"""Benchmark memory-repository cold start: populating from the CSV files versus loading a snapshot."""
+import os
+import tempfile
+import time
+
+from movie.adapters import memory_repository, repository_snapshot
+
+DATA_PATH = os.path.join('movie', 'adapters', 'data')
+
+
+def timed(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def run(data_path=DATA_PATH, repeat=5):
+    fingerprint = repository_snapshot.source_fingerprint(data_path)
+
+    def populate():
+        repo = memory_repository.MemoryRepository()
+        memory_repository.populate(data_path, repo)
+        return repo
+
+    with tempfile.TemporaryDirectory() as directory:
+        snapshot = os.path.join(directory, 'repository.snapshot')
+        repository_snapshot.save(populate(), snapshot, fingerprint)
+        return {
+            'csv_seconds': min(timed(populate) for _ in range(repeat)),
+            'snapshot_seconds': min(timed(lambda: repository_snapshot.load(snapshot, fingerprint))
+                                    for _ in range(repeat)),
+            'snapshot_bytes': os.path.getsize(snapshot),
+        }
+
+
+if __name__ == '__main__':
+    result = run()
+    print(f"populate from CSV {result['csv_seconds'] * 1e3:8.1f} ms")
+    print(f"load snapshot     {result['snapshot_seconds'] * 1e3:8.1f} ms ({result['snapshot_bytes'] / 1024:.0f} KiB)")
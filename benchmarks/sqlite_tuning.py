@@ -0,0 +1,100 @@
+"""Benchmark concurrent read/write throughput on SQLite before and after the pragma and index tuning."""
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from movie.adapters import database_repository, orm
+
+READERS = 4
+WRITERS = 2
+DURATION_SECONDS = 5.0
+NUMBER_OF_REVIEWS = 200_000
+
+UNTUNED = {'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL', 'SQLITE_MMAP_SIZE': 0,
+           'SQLITE_CACHE_SIZE_KB': 2000}
+TUNED = {'SQLITE_JOURNAL_MODE': 'WAL', 'SQLITE_SYNCHRONOUS': 'NORMAL', 'SQLITE_MMAP_SIZE': 256 * 1024 * 1024,
+         'SQLITE_CACHE_SIZE_KB': 64 * 1024}
+
+
+def build_database(path, settings, with_indexes):
+    engine = database_repository.create_database_engine(dict(
+        settings, SQLALCHEMY_DATABASE_URI='sqlite:///' + path, SQLALCHEMY_ECHO=False, SQLALCHEMY_POOL_CLASS='queue'))
+    orm.metadata.create_all(engine)
+    if not with_indexes:
+        for table in orm.metadata.sorted_tables:
+            for index in table.indexes:
+                index.drop(engine)
+
+    rng = random.Random(0)
+    conn = engine.raw_connection()
+    conn.executemany("INSERT INTO movies (rank, title, description, director, year, runtime, metascore, rating, genre, "
+                     "actors) VALUES (?, ?, '', ?, ?, 100, '50', ?, 'Drama', '')",
+                     [(rank, f'Movie {rank}', f'Director {rank % 300}', 2006 + rank % 11, rng.uniform(1, 10))
+                      for rank in range(1, 1001)])
+    conn.executemany("INSERT INTO users (id, username, password) VALUES (?, ?, 'x')",
+                     [(user, f'user{user}') for user in range(1, 1001)])
+    conn.executemany("INSERT INTO reviews (user, movie, review, timestamp) VALUES (?, ?, 'A review', ?)",
+                     [(rng.randint(1, 1000), rng.randint(1, 1000), datetime.now()) for _ in range(NUMBER_OF_REVIEWS)])
+    conn.commit()
+    conn.close()
+    return engine
+
+
+def measure(engine, readers=READERS, writers=WRITERS, duration=DURATION_SECONDS):
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def reader(seed):
+        rng = random.Random(seed)
+        done = 0
+        while time.perf_counter() < deadline:
+            with engine.connect() as conn:
+                conn.execute("SELECT * FROM reviews WHERE movie = ? ORDER BY timestamp", rng.randint(1, 1000)).fetchall()
+                conn.execute("SELECT rank FROM movies WHERE year = ? ORDER BY rating", rng.randint(2006, 2016)).fetchall()
+            done += 1
+        with lock:
+            counts['reads'] += done
+
+    def writer(seed):
+        rng = random.Random(seed)
+        done = errors = 0
+        while time.perf_counter() < deadline:
+            try:
+                with engine.begin() as conn:
+                    conn.execute("INSERT INTO reviews (user, movie, review, timestamp) VALUES (?, ?, 'New review', ?)",
+                                 rng.randint(1, 1000), rng.randint(1, 1000), datetime.now())
+                done += 1
+            except Exception:
+                errors += 1
+        with lock:
+            counts['writes'] += done
+            counts['errors'] += errors
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return {name: count / duration for name, count in counts.items()}
+
+
+def run(duration=DURATION_SECONDS):
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for name, settings, with_indexes in (('before', UNTUNED, False), ('after', TUNED, True)):
+            engine = build_database(os.path.join(directory, f'{name}.db'), settings, with_indexes)
+            results.append(dict(measure(engine, duration=duration), configuration=name))
+            engine.dispose()
+    return results
+
+
+if __name__ == '__main__':
+    for result in run():
+        print(f"{result['configuration']:<7} reads {result['reads']:9.1f}/s  writes {result['writes']:8.1f}/s  "
+              f"errors {result['errors']:6.1f}/s")
@@ -0,0 +1,140 @@
+"""Benchmark top-N queries: sorted indexes against sorting or heap-selecting every matching movie, memory and SQLite."""
+import heapq
+import os
+import sys
+import tempfile
+from typing import NamedTuple, Optional, Tuple
+
+from sqlalchemy.orm import sessionmaker, clear_mappers
+
+from benchmarks.bulk_load import write_synthetic_csv
+from benchmarks.facets import timed
+from movie.adapters import csv_ingest, database_repository, orm
+from movie.adapters.facet_index import FacetIndex, all_bitset_ranks
+from movie.adapters.ranking_index import RankingIndex, movie_value
+from movie.adapters.repository import MovieFilter
+from movie.domain.genre import Genre
+
+DATA_PATH = os.path.join('movie', 'adapters', 'data')
+MEMORY_SIZE = 1_000_000
+DATABASE_SIZE = 100_000
+LIMIT = 10
+FIELDS = ('rating', 'votes')
+
+FILTERS = (
+    MovieFilter(),
+    MovieFilter(genres=('Drama',)),
+    MovieFilter(genres=('Action', 'Sci-Fi'), min_year=2015),
+    MovieFilter(director='Ridley Scott'),
+)
+
+
+class IndexedMovie(NamedTuple):
+    # The fields FacetIndex and RankingIndex read, without the rest of a Movie.
+    rank: int
+    genres: Tuple[Genre, ...]
+    director: str
+    year: int
+    rating: Optional[float]
+    metascore: str
+    votes: Optional[int]
+    revenue: Optional[float]
+
+
+def measure_memory(size, data_path=DATA_PATH):
+    records = list(csv_ingest.read_movie_records(os.path.join(data_path, 'Data1000Movies.csv')))
+    genres = dict()
+    movies = []
+    facet_index = FacetIndex()
+    ranking_indexes = {field: RankingIndex(field) for field in FIELDS}
+    for rank in range(1, size + 1):
+        record = records[(rank - 1) % len(records)]
+        movie = IndexedMovie(rank, tuple(genres.setdefault(name, Genre(name)) for name in record.genres),
+                             record.director, record.year, record.rating, record.metascore, record.votes,
+                             record.revenue)
+        movies.append(movie)
+        facet_index.add_movie(movie)
+        for ranking_index in ranking_indexes.values():
+            ranking_index.add_movie(movie)
+    for ranking_index in ranking_indexes.values():
+        ranking_index.top(LIMIT)
+
+    def matching(movie_filter):
+        if movie_filter.is_empty():
+            return movies
+        matched = facet_index.filter(movie_filter)
+        return [movies[rank - 1] for rank in all_bitset_ranks(matched)]
+
+    def full_sort(field, movie_filter):
+        keyed = [(movie_value(movie, field), -movie.rank) for movie in matching(movie_filter)
+                 if movie_value(movie, field) is not None]
+        return sorted(keyed, reverse=True)[:LIMIT]
+
+    def heap(field, movie_filter):
+        keyed = ((movie_value(movie, field), -movie.rank) for movie in matching(movie_filter)
+                 if movie_value(movie, field) is not None)
+        return heapq.nlargest(LIMIT, keyed)
+
+    def index(field, movie_filter):
+        matched = None if movie_filter.is_empty() else facet_index.filter(movie_filter)
+        return ranking_indexes[field].top(LIMIT, matched)
+
+    rows = []
+    for field in FIELDS:
+        for movie_filter in FILTERS:
+            expected = [-negative_rank for value, negative_rank in full_sort(field, movie_filter)]
+            assert index(field, movie_filter) == expected
+            rows.append({
+                'field': field,
+                'filter': movie_filter,
+                'sort_seconds': timed(lambda: full_sort(field, movie_filter), 3),
+                'heap_seconds': timed(lambda: heap(field, movie_filter), 3),
+                'index_seconds': timed(lambda: index(field, movie_filter)),
+            })
+    return rows
+
+
+def measure_database(size, directory):
+    filename = os.path.join(directory, 'movies.csv')
+    write_synthetic_csv(filename, size)
+    engine = database_repository.create_database_engine({
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(directory, 'movies.db'),
+        'SQLALCHEMY_ECHO': False,
+        'SQLALCHEMY_POOL_CLASS': 'queue',
+    })
+    orm.metadata.create_all(engine)
+    conn = engine.raw_connection()
+    csv_ingest.ingest_movies(filename, csv_ingest.DatabaseMovieSink(conn))
+    conn.close()
+
+    orm.map_model_to_tables()
+    try:
+        repo = database_repository.SqlAlchemyRepository(sessionmaker(bind=engine))
+
+        def top(field, movie_filter):
+            repo.get_top_movies(field, LIMIT, movie_filter)
+            repo.reset_session()
+
+        return [timed(lambda: top(field, movie_filter), 5) for field in FIELDS for movie_filter in FILTERS]
+    finally:
+        clear_mappers()
+
+
+def run(memory_size=MEMORY_SIZE, database_size=DATABASE_SIZE):
+    rows = measure_memory(memory_size)
+    with tempfile.TemporaryDirectory() as directory:
+        database = measure_database(database_size, directory)
+    for row, database_seconds in zip(rows, database):
+        row['database_seconds'] = database_seconds
+    return {'memory_size': memory_size, 'database_size': database_size, 'limit': LIMIT, 'queries': rows}
+
+
+if __name__ == '__main__':
+    sizes = [int(size) for size in sys.argv[1:3]]
+    result = run(*sizes)
+    print(f"top {result['limit']} of {result['memory_size']} movies in memory, {result['database_size']} in SQLite")
+    for row in result['queries']:
+        described = {name: value for name, value in row['filter']._asdict().items() if value} or 'no filter'
+        print(f"{row['field']:<7} {str(described):<55} sort {row['sort_seconds'] * 1e3:8.1f} ms  "
+              f"heap {row['heap_seconds'] * 1e3:8.1f} ms  index {row['index_seconds'] * 1e3:7.3f} ms  "
+              f"SQLite {row['database_seconds'] * 1e3:7.2f} ms")
@@ -0,0 +1,35 @@
+"""Benchmark MemoryRepository.get_user latency as the number of users grows."""
+import random
+import timeit
+
+from movie.adapters.memory_repository import MemoryRepository
+from movie.domain.user import User
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+LOOKUPS = 10_000
+
+
+def build_repository(number_of_users):
+    repo = MemoryRepository()
+    for i in range(number_of_users):
+        repo.add_user(User(f'user{i}', 'password'))
+    return repo
+
+
+def run(sizes=SIZES, lookups=LOOKUPS):
+    results = []
+    for size in sizes:
+        repo = build_repository(size)
+        rng = random.Random(size)
+        usernames = [f'user{rng.randrange(size)}' for _ in range(lookups)]
+        # Half of the lookups miss, which is what a registration uniqueness check does.
+        usernames += [f'missing{i}' for i in range(lookups)]
+
+        elapsed = timeit.timeit(lambda: [repo.get_user(username) for username in usernames], number=1)
+        results.append({'users': size, 'ns_per_lookup': elapsed / len(usernames) * 1e9})
+    return results
+
+
+if __name__ == '__main__':
+    for result in run():
+        print(f"{result['users']:>9} users: {result['ns_per_lookup']:8.1f} ns/lookup")
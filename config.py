@@ -19,4 +19,78 @@ class Config:
     SQLALCHEMY_ECHO = True
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Connection pooling for the database repository: 'queue', 'singleton' (one connection per thread) or 'null'
+    # (a new connection for every checkout). Size applies to the queue and singleton pools - the latter must be at least
+    # the number of worker threads - and overflow to the queue pool only; recycle is in seconds.
+    SQLALCHEMY_POOL_CLASS = environ.get('SQLALCHEMY_POOL_CLASS', 'queue')
+    SQLALCHEMY_POOL_SIZE = int(environ.get('SQLALCHEMY_POOL_SIZE', 5))
+    SQLALCHEMY_MAX_OVERFLOW = int(environ.get('SQLALCHEMY_MAX_OVERFLOW', 10))
+    SQLALCHEMY_POOL_RECYCLE = int(environ.get('SQLALCHEMY_POOL_RECYCLE', 3600))
+
+    # SQLite pragmas applied to every new connection. WAL lets readers proceed while a review is being written; with
+    # WAL, synchronous=NORMAL is still safe against corruption. Sizes are in bytes (mmap) and KiB (cache).
+    SQLITE_JOURNAL_MODE = environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_MMAP_SIZE = int(environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    SQLITE_CACHE_SIZE_KB = int(environ.get('SQLITE_CACHE_SIZE_KB', 64 * 1024))
+
     REPOSITORY = environ.get('REPOSITORY')
+    # Optional snapshot file for the memory repository. When set, the first start writes it and later starts load it
+    # instead of parsing the CSV files, for as long as those files are unchanged.
+    REPOSITORY_SNAPSHOT = environ.get('REPOSITORY_SNAPSHOT')
+    # Read-through cache in front of the repository for movies by rank, the first and last movies, the number of movies
+    # and users, with REPOSITORY_CACHE = True. Entries expire after REPOSITORY_CACHE_TTL seconds, and beyond
+    # REPOSITORY_CACHE_MAX_ENTRIES per method the least recently used are evicted.
+    REPOSITORY_CACHE = environ.get('REPOSITORY_CACHE', 'False') == 'True'
+    REPOSITORY_CACHE_TTL = int(environ.get('REPOSITORY_CACHE_TTL', 60))
+    REPOSITORY_CACHE_MAX_ENTRIES = int(environ.get('REPOSITORY_CACHE_MAX_ENTRIES', 10000))
+
+    # Movie browsing
+    MOVIES_PER_PAGE = int(environ.get('MOVIES_PER_PAGE', 10))
+    # /top lists this many movies by default, and at most MAX_TOP_MOVIES when asked with ?limit=
+    TOP_MOVIES = int(environ.get('TOP_MOVIES', 10))
+    MAX_TOP_MOVIES = int(environ.get('MAX_TOP_MOVIES', 100))
+
+    # Cache of rendered /movies pages: 'memory' (per worker process), 'sqlite' (a file shared by the workers on this
+    # host, at PAGE_CACHE_PATH) or empty to disable. Pages expire after PAGE_CACHE_TTL seconds; beyond the entry and
+    # size limits the least recently used are evicted.
+    PAGE_CACHE = environ.get('PAGE_CACHE', 'memory')
+    PAGE_CACHE_PATH = environ.get('PAGE_CACHE_PATH', 'page-cache.db')
+    PAGE_CACHE_MAX_ENTRIES = int(environ.get('PAGE_CACHE_MAX_ENTRIES', 1024))
+    PAGE_CACHE_MAX_BYTES = int(environ.get('PAGE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+    PAGE_CACHE_TTL = int(environ.get('PAGE_CACHE_TTL', 300))
+
+    # Cache-Control sent with /movies pages, which also carry an ETag and (once a movie on them has reviews) a
+    # Last-Modified header, so clients and CDNs can revalidate with a cheap 304. Pages rendered for a logged-in user
+    # show their username and get the private policy.
+    MOVIES_CACHE_CONTROL = environ.get('MOVIES_CACHE_CONTROL', 'public, max-age=60')
+    MOVIES_CACHE_CONTROL_PRIVATE = environ.get('MOVIES_CACHE_CONTROL_PRIVATE', 'private, no-cache')
+
+    # Reviews are rejected if they contain a word or phrase from PROFANITY_WORDLIST, a file with one per line
+    # (better_profanity's list when unset), other than the comma-separated PROFANITY_WHITELIST.
+    PROFANITY_WORDLIST = environ.get('PROFANITY_WORDLIST')
+    PROFANITY_WHITELIST = environ.get('PROFANITY_WHITELIST', '')
+
+    # Write-behind reviews: with REVIEW_QUEUE = 'sqlite', submitted reviews are queued in the file at REVIEW_QUEUE_PATH
+    # and a background worker applies them in batches of up to REVIEW_QUEUE_BATCH_SIZE, waiting up to
+    # REVIEW_QUEUE_INTERVAL seconds for a batch to fill. A review that could not be applied in
+    # REVIEW_QUEUE_MAX_ATTEMPTS attempts is dropped as failed. Empty writes each review as it is submitted. The queue
+    # needs REPOSITORY = 'database' and SQLite 3.35 or later.
+    REVIEW_QUEUE = environ.get('REVIEW_QUEUE', '')
+    REVIEW_QUEUE_PATH = environ.get('REVIEW_QUEUE_PATH', 'review-queue.db')
+    REVIEW_QUEUE_BATCH_SIZE = int(environ.get('REVIEW_QUEUE_BATCH_SIZE', 100))
+    REVIEW_QUEUE_INTERVAL = float(environ.get('REVIEW_QUEUE_INTERVAL', 0.5))
+    REVIEW_QUEUE_MAX_ATTEMPTS = int(environ.get('REVIEW_QUEUE_MAX_ATTEMPTS', 3))
+
+    # Request instrumentation: with INSTRUMENTATION = True every request is timed as a tree of spans (repository calls,
+    # service functions, password hashing and templates) and histograms are served at /_metrics in the Prometheus text
+    # format. A fraction INSTRUMENTATION_PROFILE_RATE of requests is profiled with INSTRUMENTATION_PROFILER ('cprofile'
+    # or, when installed, 'pyinstrument') into the directory INSTRUMENTATION_PROFILE_PATH.
+    INSTRUMENTATION = environ.get('INSTRUMENTATION', 'False') == 'True'
+    INSTRUMENTATION_PROFILE_RATE = float(environ.get('INSTRUMENTATION_PROFILE_RATE', 0))
+    INSTRUMENTATION_PROFILE_PATH = environ.get('INSTRUMENTATION_PROFILE_PATH', 'profiles')
+    INSTRUMENTATION_PROFILER = environ.get('INSTRUMENTATION_PROFILER', 'cprofile')
+
+    # JSON API (/api/v1): movies per page by default, and the most a client may ask for with ?limit=
+    API_MOVIES_PER_PAGE = int(environ.get('API_MOVIES_PER_PAGE', 100))
+    API_MAX_MOVIES_PER_PAGE = int(environ.get('API_MAX_MOVIES_PER_PAGE', 1000))
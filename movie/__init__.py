@@ -4,13 +4,13 @@ import os
 
 from flask import Flask
 import movie.adapters.repository as repo
-from movie.adapters import memory_repository, database_repository
-from movie.adapters.orm import metadata, map_model_to_tables
+from movie.adapters import caching_repository, memory_repository, database_repository, repository_snapshot
+from movie.adapters.orm import map_model_to_tables
+from movie import instrumentation
+from movie.movies import page_cache, profanity_filter, review_queue, services
 
 
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, clear_mappers
-from sqlalchemy.pool import NullPool
 
 def create_app(test_config=None):
     """Construct the core application."""
@@ -26,31 +26,30 @@ def create_app(test_config=None):
         # Load test configuration, and override any configuration settings.
         app.config.from_mapping(test_config)
         data_path = app.config['TEST_DATA_PATH']
+    app.config['DATA_PATH'] = data_path
 
     if app.config['REPOSITORY'] == 'memory':
         # Create the MemoryRepository instance for a memory-based repository.
-        repo.repo_instance = memory_repository.MemoryRepository()
-        memory_repository.populate(data_path, repo.repo_instance)
+        if app.config['REPOSITORY_SNAPSHOT']:
+            repo.repo_instance = repository_snapshot.load_or_populate(
+                app.config['REPOSITORY_SNAPSHOT'], data_path, memory_repository.MemoryRepository,
+                memory_repository.populate)
+        else:
+            repo.repo_instance = memory_repository.MemoryRepository()
+            memory_repository.populate(data_path, repo.repo_instance)
 
     elif app.config['REPOSITORY'] == 'database':
         # Configure database.
-        database_uri = app.config['SQLALCHEMY_DATABASE_URI']
-
         # We create a comparatively simple SQLite database, which is based on a single file (see .env for URI).
         # For example the file database could be located locally and relative to the application in covid-19.db,
-        # leading to a URI of "sqlite:///covid-19.db".
-        # Note that create_engine does not establish any actual DB connection directly!
-        database_echo = app.config['SQLALCHEMY_ECHO']
-        database_engine = create_engine(database_uri, connect_args={"check_same_thread": False}, poolclass=NullPool,
-                                        echo=database_echo)
-
-        if app.config['TESTING'] == 'True' or len(database_engine.table_names()) == 0:
-            print("REPOPULATING DATABASE")
-            # For testing, or first-time use of the web application, reinitialise the database.
+        # leading to a URI of "sqlite:///covid-19.db". Connections are pooled as set by SQLALCHEMY_POOL_CLASS.
+        database_engine = database_repository.create_database_engine(app.config)
+
+        if app.config['TESTING']:
+            # For testing, build and load a fresh database.
             clear_mappers()
-            metadata.create_all(database_engine)  # Conditionally create database tables.
-            for table in reversed(metadata.sorted_tables):  # Remove any data from the tables.
-                database_engine.execute(table.delete())
+            database_repository.build_schema(database_engine)
+            database_repository.clear_tables(database_engine)
 
             # Generate mappings that map domain model classes to the database tables.
             map_model_to_tables()
@@ -58,14 +57,44 @@ def create_app(test_config=None):
             database_repository.populate(database_engine, data_path)
 
         else:
-            # Solely generate mappings that map domain model classes to the database tables.
+            # Solely generate mappings that map domain model classes to the database tables. The database is built and
+            # loaded beforehand with the flask db commands.
             map_model_to_tables()
-
-        # Create the database session factory using sessionmaker (this has to be done once, in a global manner)
-        session_factory = sessionmaker(autocommit=False, autoflush=True, bind=database_engine)
+            if not database_engine.has_table('movies'):
+                print(f"Database {app.config['SQLALCHEMY_DATABASE_URI']} has no tables: "
+                      f"run 'flask db init' and 'flask db load'")
+
+        # Create the database session factory using sessionmaker (this has to be done once, in a global manner). Objects
+        # kept by the repository cache are reused after their session commits, so their attributes must not expire.
+        session_factory = sessionmaker(autocommit=False, autoflush=True, bind=database_engine,
+                                       expire_on_commit=not app.config['REPOSITORY_CACHE'])
         # Create the SQLAlchemy DatabaseRepository instance for an sqlite3-based repository.
         repo.repo_instance = database_repository.SqlAlchemyRepository(session_factory)
 
+        # Each HTTP request works in its own session, whose connection goes back to the pool when the request ends.
+        @app.before_request
+        def before_flask_http_request_function():
+            repo.repo_instance.reset_session()
+
+        @app.teardown_appcontext
+        def shutdown_session(exception=None):
+            repo.repo_instance.close_session()
+
+    if app.config['REPOSITORY_CACHE']:
+        # Serve the most frequent reads from a cache in front of the repository.
+        repo.repo_instance = caching_repository.CachingRepository(
+            repo.repo_instance, ttl=app.config['REPOSITORY_CACHE_TTL'],
+            max_entries=app.config['REPOSITORY_CACHE_MAX_ENTRIES'])
+
+    page_cache.cache_instance = page_cache.create_page_cache(app.config)
+    profanity_filter.matcher_instance = profanity_filter.create_profanity_matcher(app.config)
+
+    if review_queue.queue_instance is not None:
+        review_queue.queue_instance.stop()
+    review_queue.queue_instance = review_queue.create_review_queue(app.config, apply_queued_reviews)
+    if review_queue.queue_instance is not None:
+        review_queue.queue_instance.start()
+
     # Build the application - these steps require an application context.
     with app.app_context():
         # Register blueprints.
@@ -78,5 +107,24 @@ def create_app(test_config=None):
         from .authentication import authentication
         app.register_blueprint(authentication.authentication_blueprint)
 
+        from .api import api
+        app.register_blueprint(api.api_blueprint)
+
+    # Wrap the application in the request instrumentation middleware when INSTRUMENTATION is set.
+    instrumentation.instrument_app(app)
+
+    # Register the flask db and flask bench commands.
+    from . import commands
+    app.cli.add_command(commands.db_cli)
+    app.cli.add_command(commands.bench_command)
+
 
     return app
+
+
+def apply_queued_reviews(pending_reviews):
+    # Runs on the review queue's worker thread, whose database session is closed after each batch.
+    try:
+        return services.apply_queued_reviews(pending_reviews, repo.repo_instance)
+    finally:
+        repo.repo_instance.close_session()
@@ -0,0 +1,235 @@
+"""Read-through cache in front of any repository.
+
+CachingRepository implements AbstractRepository by forwarding every call to a backend repository, and keeps the results
+of the reads every page makes - get_movie, get_first_movie, get_last_movie, get_number_of_movies and get_user - in a
+least recently used cache per method, whose entries expire after the method's TTL. Adding a movie, user or review
+evicts the entries it could have made stale, so a worker process always reads its own writes; writes made through
+other processes show once the entries expire.
+
+Movies and users cached from the database repository outlive the session that loaded them. They are attached to the
+session of the current request by the backend's attach before they are returned.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from movie.adapters.repository import AbstractRepository, MovieFilter
+
+CACHED_METHODS = ('get_movie', 'get_first_movie', 'get_last_movie', 'get_number_of_movies', 'get_user')
+
+# Returned by MethodCache.get for keys it does not hold, as None results are cached like any other.
+MISSING = object()
+
+
+class MethodCache:
+    """LRU cache of one repository method's results, keyed by its argument."""
+
+    def __init__(self, ttl=60, max_entries=10000):
+        self.__ttl = ttl
+        self.__max_entries = max_entries
+        self.__lock = threading.Lock()
+        # key -> (expiry time, result), least recently used first
+        self.__entries = OrderedDict()
+        # Counts invalidations, so that a result read before one is not cached after it.
+        self.__generation = 0
+        self.__hits = 0
+        self.__misses = 0
+
+    def __len__(self):
+        return len(self.__entries)
+
+    @property
+    def generation(self):
+        return self.__generation
+
+    def get(self, key):
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self.__entries[key]
+                entry = None
+            if entry is None:
+                self.__misses += 1
+                return MISSING
+            self.__hits += 1
+            self.__entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, result, generation):
+        with self.__lock:
+            if generation != self.__generation:
+                return
+            self.__entries[key] = (time.monotonic() + self.__ttl, result)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.__max_entries:
+                self.__entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self.__lock:
+            self.__generation += 1
+            self.__entries.pop(key, None)
+
+    def clear(self):
+        with self.__lock:
+            self.__generation += 1
+            self.__entries.clear()
+
+    def stats(self):
+        with self.__lock:
+            hits, misses = self.__hits, self.__misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / (hits + misses) if hits + misses else 0.0,
+            'entries': len(self.__entries),
+        }
+
+
+class CachingRepository(AbstractRepository):
+
+    def __init__(self, backend: AbstractRepository, ttl=60, max_entries=10000, policies=None):
+        """policies maps the name of a cached method to the (ttl, max_entries) it uses instead of the defaults."""
+        self.__backend = backend
+        policies = policies or {}
+        self.__caches = {method: MethodCache(*policies.get(method, (ttl, max_entries))) for method in CACHED_METHODS}
+
+    @property
+    def backend(self):
+        return self.__backend
+
+    @property
+    def engine(self):
+        # Only the database repository has an engine; hasattr is False for others.
+        return self.__backend.engine
+
+    def stats(self):
+        """Returns {method: {'hits', 'misses', 'hit_ratio', 'entries'}} for each cached method."""
+        return {method: cache.stats() for method, cache in self.__caches.items()}
+
+    def clear(self):
+        for cache in self.__caches.values():
+            cache.clear()
+
+    def __read(self, method, key, load, entity=True):
+        cache = self.__caches[method]
+        result = cache.get(key)
+        if result is MISSING:
+            generation = cache.generation
+            result = load()
+            cache.put(key, result, generation)
+            return result
+        if entity and result is not None:
+            return self.__backend.attach(result)
+        return result
+
+    def __invalidate_movie(self, rank):
+        self.__caches['get_movie'].invalidate(rank)
+        # The first and last movies are cached apart from their ranks.
+        self.__caches['get_first_movie'].clear()
+        self.__caches['get_last_movie'].clear()
+
+    def add_actor(self, actor):
+        self.__backend.add_actor(actor)
+
+    def get_actor(self, actor):
+        return self.__backend.get_actor(actor)
+
+    def add_director(self, director):
+        self.__backend.add_director(director)
+
+    def get_director(self, director):
+        return self.__backend.get_director(director)
+
+    def add_genre(self, genre):
+        self.__backend.add_genre(genre)
+
+    def get_genre(self, genre):
+        return self.__backend.get_genre(genre)
+
+    def add_movie(self, movie):
+        self.__backend.add_movie(movie)
+        self.__invalidate_movie(movie.rank)
+        self.__caches['get_number_of_movies'].clear()
+
+    def get_movie(self, rank):
+        return self.__read('get_movie', rank, lambda: self.__backend.get_movie(rank))
+
+    def get_first_movie(self):
+        return self.__read('get_first_movie', None, self.__backend.get_first_movie)
+
+    def get_last_movie(self):
+        return self.__read('get_last_movie', None, self.__backend.get_last_movie)
+
+    def get_number_of_movies(self):
+        return self.__read('get_number_of_movies', None, self.__backend.get_number_of_movies, entity=False)
+
+    def get_movie_by_rank(self, target_rank):
+        return self.__backend.get_movie_by_rank(target_rank)
+
+    def get_movies_page(self, after_rank, limit):
+        return self.__backend.get_movies_page(after_rank, limit)
+
+    def get_movie_versions(self, after_rank, limit):
+        return self.__backend.get_movie_versions(after_rank, limit)
+
+    def get_movies_by_filter(self, movie_filter: MovieFilter, after_rank, limit):
+        return self.__backend.get_movies_by_filter(movie_filter, after_rank, limit)
+
+    def get_facet_counts(self, movie_filter: MovieFilter):
+        return self.__backend.get_facet_counts(movie_filter)
+
+    def get_top_movies(self, field, limit, movie_filter: MovieFilter = None):
+        return self.__backend.get_top_movies(field, limit, movie_filter)
+
+    def get_statistics(self):
+        return self.__backend.get_statistics()
+
+    def get_director_statistics(self, director):
+        return self.__backend.get_director_statistics(director)
+
+    def get_genre_statistics(self):
+        return self.__backend.get_genre_statistics()
+
+    def get_most_reviewed_movies(self, limit):
+        return self.__backend.get_most_reviewed_movies(limit)
+
+    def get_rank_of_previous_movie(self, movie):
+        return self.__backend.get_rank_of_previous_movie(movie)
+
+    def get_rank_of_next_movie(self, movie):
+        return self.__backend.get_rank_of_next_movie(movie)
+
+    def search_movies(self, query, limit=20):
+        return self.__backend.search_movies(query, limit)
+
+    def add_user(self, user):
+        self.__backend.add_user(user)
+        # Backends may match usernames loosely (the memory repository ignores surrounding whitespace), so a miss cached
+        # for any spelling of the name could now be wrong. Users are added far less often than they are read.
+        self.__caches['get_user'].clear()
+
+    def get_user(self, username):
+        return self.__read('get_user', username, lambda: self.__backend.get_user(username))
+
+    def add_review(self, review):
+        self.__backend.add_review(review)
+        self.__invalidate_movie(review.movie.rank)
+        self.__caches['get_user'].invalidate(review.user.user_name)
+
+    def add_reviews(self, reviews):
+        self.__backend.add_reviews(reviews)
+        for review in reviews:
+            self.__invalidate_movie(review.movie.rank)
+            self.__caches['get_user'].invalidate(review.user.user_name)
+
+    def get_reviews(self):
+        return self.__backend.get_reviews()
+
+    def reset_session(self):
+        self.__backend.reset_session()
+
+    def close_session(self):
+        self.__backend.close_session()
+
+    def attach(self, entity):
+        return self.__backend.attach(entity)
@@ -0,0 +1,201 @@
+import csv
+import logging
+import time
+from typing import NamedTuple, Optional, Tuple
+
+from movie.domain.movie import Movie
+from movie.domain.actor import Actor
+from movie.domain.genre import Genre
+from movie.domain.director import Director
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 10_000
+
+# How the CSV marks a missing revenue or metascore.
+MISSING_VALUES = ('', 'N/A')
+
+
+class MovieRecord(NamedTuple):
+    rank: int
+    title: str
+    genres: Tuple[str, ...]
+    description: str
+    director: str
+    actors: Tuple[str, ...]
+    year: int
+    runtime_minutes: int
+    rating: float
+    votes: Optional[int]
+    revenue: Optional[float]
+    metascore: str
+
+
+def split_names(field):
+    return tuple(name.strip() for name in field.split(',') if name.strip())
+
+
+def optional_number(field, convert):
+    return None if field in MISSING_VALUES else convert(field)
+
+
+def read_movie_records(filename: str):
+    # Streams Data1000Movies.csv-formatted rows; nothing but the current row is held in memory.
+    with open(filename, mode='r', encoding='utf-8-sig', newline='') as infile:
+        reader = csv.reader(infile)
+
+        # Skip the header line.
+        next(reader)
+
+        for row in reader:
+            row = [item.strip() for item in row]
+            yield MovieRecord(
+                rank=int(row[0]),
+                title=row[1],
+                genres=split_names(row[2]),
+                description=row[3],
+                director=row[4],
+                actors=split_names(row[5]),
+                year=int(row[6]),
+                runtime_minutes=int(row[7]),
+                rating=float(row[8]),
+                votes=optional_number(row[9], int),
+                revenue=optional_number(row[10], float),
+                metascore=row[11]
+            )
+
+
+def ingest_movies(filename: str, sink):
+    """Parses the movie CSV once, feeding every record to sink, and reports how long it took."""
+    start = time.perf_counter()
+    count = 0
+    for record in read_movie_records(filename):
+        sink.add(record)
+        count += 1
+    sink.close()
+
+    elapsed = time.perf_counter() - start
+    logger.info('Ingested %d movies from %s in %.2fs (%.0f rows/s)', count, filename, elapsed,
+                count / elapsed if elapsed > 0 else float('inf'))
+    return count
+
+
+class MemoryMovieSink:
+    """Builds Movie objects, interning their Actors, Directors and Genres through the repository's name indexes.
+
+    Director names and the low-cardinality numeric fields are shared between movies as well, so a catalogue of millions
+    of movies holds one copy of each distinct year, runtime, rating, metascore and director rather than one per movie.
+    """
+
+    def __init__(self, repo):
+        self.__repo = repo
+        self.__values = dict()
+
+    def add(self, record: MovieRecord):
+        movie = Movie(
+            rank=record.rank,
+            title=record.title,
+            year=self.__shared(record.year),
+            description=record.description,
+            director=self.__shared(record.director),
+            runtime_minutes=self.__shared(record.runtime_minutes),
+            rating=self.__shared(record.rating),
+            metascore=self.__shared(record.metascore),
+            votes=record.votes,
+            revenue=record.revenue
+        )
+
+        if self.__repo.get_director(record.director) is None:
+            self.__repo.add_director(Director(record.director))
+
+        for name in record.genres:
+            genre = self.__repo.get_genre(name)
+            if genre is None:
+                genre = Genre(name)
+                self.__repo.add_genre(genre)
+            movie.add_genre(genre)
+
+        for name in record.actors:
+            actor = self.__repo.get_actor(name)
+            if actor is None:
+                actor = Actor(name)
+                self.__repo.add_actor(actor)
+            movie.add_actor(actor)
+
+        self.__repo.add_movie(movie)
+
+    def close(self):
+        pass
+
+    def __shared(self, value):
+        # Keyed on type too, so 7 and 7.0 stay distinct.
+        return self.__values.setdefault((type(value), value), value)
+
+
+class DatabaseMovieSink:
+    """Writes movies and their normalized actor and genre associations with batched executemany calls.
+
+    Everything is written through the given DB-API connection in a single transaction, committed by close(). Only the
+    name -> id tables for actors and genres grow with the input; row batches are flushed every batch_size movies.
+    """
+
+    def __init__(self, conn, batch_size=BATCH_SIZE):
+        self.__conn = conn
+        self.__cursor = conn.cursor()
+        self.__batch_size = batch_size
+        self.__actors = NameInterner(self.__existing_ids('actors'))
+        self.__genres = NameInterner(self.__existing_ids('genres'))
+        self.__movies = []
+        self.__movie_actors = []
+        self.__movie_genres = []
+
+    def add(self, record: MovieRecord):
+        self.__movies.append((
+            record.rank, record.title, record.description, record.director, record.year, record.runtime_minutes,
+            record.rating, record.votes, record.revenue, record.metascore
+        ))
+        for genre_id in {self.__genres.intern(name) for name in record.genres}:
+            self.__movie_genres.append((record.rank, genre_id))
+        for actor_id in {self.__actors.intern(name) for name in record.actors}:
+            self.__movie_actors.append((record.rank, actor_id))
+
+        if len(self.__movies) >= self.__batch_size:
+            self.flush()
+
+    def flush(self):
+        self.__cursor.executemany("""
+            INSERT INTO movies (rank, title, description, director, year, runtime, rating, votes, revenue, metascore)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", self.__movies)
+        self.__cursor.executemany("INSERT INTO genres (id, name) VALUES (?, ?)", self.__genres.new_rows)
+        self.__cursor.executemany("INSERT INTO actors (id, name) VALUES (?, ?)", self.__actors.new_rows)
+        self.__cursor.executemany("INSERT INTO movie_genres (movie, genre) VALUES (?, ?)", self.__movie_genres)
+        self.__cursor.executemany("INSERT INTO movie_actors (movie, actor) VALUES (?, ?)", self.__movie_actors)
+        for batch in (self.__movies, self.__genres.new_rows, self.__actors.new_rows, self.__movie_genres,
+                      self.__movie_actors):
+            batch.clear()
+
+    def close(self):
+        self.flush()
+        self.__conn.commit()
+
+    def __existing_ids(self, table):
+        self.__cursor.execute(f"SELECT name, id FROM {table}")
+        return dict(self.__cursor.fetchall())
+
+
+class NameInterner:
+    """Hands out one id per distinct name, remembering the (id, name) rows that still need inserting."""
+
+    def __init__(self, ids):
+        self.__ids = ids
+        self.__next_id = max(ids.values(), default=0) + 1
+        self.new_rows = []
+
+    def intern(self, name):
+        name_id = self.__ids.get(name)
+        if name_id is None:
+            name_id = self.__next_id
+            self.__next_id += 1
+            self.__ids[name] = name_id
+            self.new_rows.append((name_id, name))
+        return name_id
@@ -1,15 +1,17 @@
 import csv
 import os
+from contextlib import contextmanager
 
 from datetime import date
 from typing import List
 
-from sqlalchemy import desc, asc
+from sqlalchemy import and_, desc, asc, cast, event, exists, func, select, text, Integer
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
-from werkzeug.security import generate_password_hash
 
-from sqlalchemy.orm import scoped_session
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import scoped_session, selectinload
+from sqlalchemy.pool import NullPool, QueuePool, SingletonThreadPool
 from flask import _app_ctx_stack
 
 from movie.domain.movie import Movie
@@ -18,7 +20,115 @@ from movie.domain.genre import Genre
 from movie.domain.director import Director
 from movie.domain.user import User
 from movie.domain.review import Review, make_review
-from movie.adapters.repository import AbstractRepository, RepositoryException
+from movie.adapters import csv_ingest, orm, review_csv, user_seed
+from movie.adapters.repository import AbstractRepository, RepositoryException, MovieFilter, Statistics
+from movie.adapters.search_index import tokenize
+
+
+POOL_CLASSES = {
+    'null': NullPool,
+    'queue': QueuePool,
+    'singleton': SingletonThreadPool,
+}
+
+
+def create_database_engine(config) -> Engine:
+    pool_name = config.get('SQLALCHEMY_POOL_CLASS', 'queue')
+    try:
+        pool_class = POOL_CLASSES[pool_name]
+    except KeyError:
+        raise ValueError(f'Unknown SQLALCHEMY_POOL_CLASS {pool_name!r}, expected one of {sorted(POOL_CLASSES)}')
+
+    pool_options = dict()
+    if pool_class is QueuePool:
+        pool_options['pool_size'] = config.get('SQLALCHEMY_POOL_SIZE', 5)
+        pool_options['max_overflow'] = config.get('SQLALCHEMY_MAX_OVERFLOW', 10)
+    elif pool_class is SingletonThreadPool:
+        pool_options['pool_size'] = config.get('SQLALCHEMY_POOL_SIZE', 5)
+    if pool_class is not NullPool:
+        pool_options['pool_recycle'] = config.get('SQLALCHEMY_POOL_RECYCLE', -1)
+
+    # Note that create_engine does not establish any actual DB connection directly!
+    engine = create_engine(config['SQLALCHEMY_DATABASE_URI'], connect_args={"check_same_thread": False},
+                           poolclass=pool_class, echo=config['SQLALCHEMY_ECHO'], **pool_options)
+
+    if engine.dialect.name == 'sqlite':
+        pragmas = sqlite_pragmas(config)
+        event.listen(engine, 'connect', lambda dbapi_connection, connection_record:
+                     apply_sqlite_pragmas(dbapi_connection, pragmas))
+
+    return engine
+
+
+def sqlite_pragmas(config):
+    pragmas = [
+        ('journal_mode', config.get('SQLITE_JOURNAL_MODE')),
+        ('synchronous', config.get('SQLITE_SYNCHRONOUS')),
+        ('mmap_size', config.get('SQLITE_MMAP_SIZE')),
+        # A negative cache_size is a size in KiB rather than a number of pages.
+        ('cache_size', None if config.get('SQLITE_CACHE_SIZE_KB') is None else -config['SQLITE_CACHE_SIZE_KB']),
+    ]
+    return [(name, value) for name, value in pragmas if value is not None]
+
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas:
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+
+
+# What each top-N field is ordered by, matching the movies_*_top_idx indexes, and the condition for a movie to have a
+# value.
+TOP_N_COLUMNS = {
+    'rating': (orm.movies.c.rating, orm.movies.c.rating.isnot(None)),
+    'metascore': (cast(orm.movies.c.metascore, Integer), orm.movies.c.metascore.notin_(csv_ingest.MISSING_VALUES)),
+    'votes': (orm.movies.c.votes, orm.movies.c.votes.isnot(None)),
+    'revenue': (orm.movies.c.revenue, orm.movies.c.revenue.isnot(None)),
+}
+
+
+def movie_filter_conditions(movie_filter: MovieFilter, paging=False):
+    """WHERE clauses on the movies table selecting the movies matching movie_filter.
+
+    Genres are matched with a correlated EXISTS when paging, which stops as soon as a page of movies is found walking the
+    rank index, and with IN otherwise, which builds the set of the genre's movies once for a query that visits them all.
+    """
+    conditions = []
+    for genre in movie_filter.genres:
+        genre_id = select([orm.genres.c.id]).where(orm.genres.c.name == genre).as_scalar()
+        if paging:
+            conditions.append(exists().where(and_(orm.movie_genres.c.movie == orm.movies.c.rank,
+                                                  orm.movie_genres.c.genre == genre_id)))
+        else:
+            conditions.append(orm.movies.c.rank.in_(
+                select([orm.movie_genres.c.movie]).where(orm.movie_genres.c.genre == genre_id)))
+    if movie_filter.director is not None:
+        conditions.append(orm.movies.c.director == movie_filter.director)
+    if movie_filter.min_year is not None:
+        conditions.append(orm.movies.c.year >= movie_filter.min_year)
+    if movie_filter.max_year is not None:
+        conditions.append(orm.movies.c.year <= movie_filter.max_year)
+    if movie_filter.min_rating is not None:
+        conditions.append(orm.movies.c.rating >= movie_filter.min_rating)
+    if movie_filter.max_rating is not None:
+        conditions.append(orm.movies.c.rating <= movie_filter.max_rating)
+    return conditions
+
+
+def create_indexes(engine: Engine):
+    # Databases built before an index was declared in orm.py get it added; create_all only makes missing tables.
+    inspector = inspect(engine)
+    for table in orm.metadata.sorted_tables:
+        if engine.dialect.name == 'sqlite':
+            # The SQLite inspector leaves out indexes on expressions, such as movies_metascore_top_idx.
+            existing = {row[0] for row in engine.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ?", table.name)}
+        else:
+            existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(engine)
 
 
 class SessionContextManager:
@@ -44,13 +154,14 @@ class SessionContextManager:
 
     def reset_session(self):
         # this method can be used e.g. to allow Flask to start a new session for each http request,
-        # via the 'before_request' callback
+        # via the 'before_request' callback. Only the calling thread's session is discarded; the registry itself is
+        # shared by every worker thread and is never replaced.
         self.close_current_session()
-        self.__session = scoped_session(self.__session_factory, scopefunc=_app_ctx_stack.__ident_func__)
 
     def close_current_session(self):
+        # Closing returns the connection to the pool; the next use of the session starts a fresh one.
         if not self.__session is None:
-            self.__session.close()
+            self.__session.remove()
 
 
 class SqlAlchemyRepository(AbstractRepository):
@@ -58,17 +169,28 @@ class SqlAlchemyRepository(AbstractRepository):
     def __init__(self, session_factory):
         self._session_cm = SessionContextManager(session_factory)
 
+    @property
+    def engine(self) -> Engine:
+        return self._session_cm.session.get_bind()
+
     def close_session(self):
         self._session_cm.close_current_session()
 
     def reset_session(self):
         self._session_cm.reset_session()
 
+    def attach(self, entity):
+        # Copies the state of an object loaded in an earlier session into the current one without querying for it. The
+        # object must have been loaded with expire_on_commit off, or its attributes are gone once its session commits.
+        return self._session_cm.session.merge(entity, load=False)
+
     def add_actor(self, actor: Actor):
-        raise NotImplementedError
+        with self._session_cm as scm:
+            scm.session.add(actor)
+            scm.commit()
 
     def get_actor(self, actor) -> Actor:
-        raise NotImplementedError
+        return self._session_cm.session.query(Actor).filter(orm.actors.c.name == actor).one_or_none()
 
     def add_director(self, director: Director):
         raise NotImplementedError
@@ -77,10 +199,12 @@ class SqlAlchemyRepository(AbstractRepository):
         raise NotImplementedError
 
     def add_genre(self, genre: Genre):
-        raise NotImplementedError
+        with self._session_cm as scm:
+            scm.session.add(genre)
+            scm.commit()
 
     def get_genre(self, genre) -> Genre:
-        raise NotImplementedError
+        return self._session_cm.session.query(Genre).filter(orm.genres.c.name == genre).one_or_none()
 
     def add_user(self, user: User):
         with self._session_cm as scm:
@@ -90,7 +214,7 @@ class SqlAlchemyRepository(AbstractRepository):
     def get_user(self, username) -> User:
         user = None
         try:
-            user = self._session_cm.session.query(User).filter_by(user_name=username).one()
+            user = self._session_cm.session.query(User).filter(orm.users.c.username == username).one()
         except NoResultFound:
             # Ignore any exception and return None.
             pass
@@ -104,7 +228,7 @@ class SqlAlchemyRepository(AbstractRepository):
     def get_movie(self, rank) -> Movie:
         article = None
         try:
-            article = self._session_cm.session.query(Movie).filter(Movie.rank == rank).one()
+            article = self._query_movies().filter(orm.movies.c.rank == rank).one()
         except NoResultFound:
             # Ignore any exception and return None.
             pass
@@ -113,28 +237,44 @@ class SqlAlchemyRepository(AbstractRepository):
 
     def get_movie_by_rank(self, target_rank):
         if target_rank is None:
-            movies = self._session_cm.session.query(Movie).all()
+            movies = self._query_movies().all()
             return movies
         else:
             # Return articles matching target_date; return an empty list if there are no matches.
-            movies = self._session_cm.session.query(Movie).filter(Movie.rank == target_rank).all()
+            movies = self._query_movies().filter(orm.movies.c.rank == target_rank).all()
             return movies
 
+    def get_movies_page(self, after_rank, limit):
+        # Keyset pagination: the primary key index on rank serves both the filter and the ordering.
+        movies = self._query_movies().filter(orm.movies.c.rank > after_rank).order_by(
+            asc(orm.movies.c.rank)).limit(limit).all()
+        return movies
+
+    def get_movie_versions(self, after_rank, limit):
+        # Aggregated in SQL from the (movie, timestamp) index, without loading any Movie or Review.
+        page = select([orm.movies.c.rank]).where(orm.movies.c.rank > after_rank).order_by(
+            asc(orm.movies.c.rank)).limit(limit).alias('page')
+        query = select([page.c.rank, func.count(orm.reviews.c.id), func.max(orm.reviews.c.timestamp)]).select_from(
+            page.outerjoin(orm.reviews, orm.reviews.c.movie == page.c.rank)).group_by(page.c.rank).order_by(
+            asc(page.c.rank))
+        return [tuple(row) for row in self._session_cm.session.execute(query)]
+
     def get_number_of_movies(self):
         number_of_movies = self._session_cm.session.query(Movie).count()
         return number_of_movies
 
     def get_first_movie(self):
-        article = self._session_cm.session.query(Movie).first()
+        article = self._query_movies().order_by(asc(orm.movies.c.rank)).first()
         return article
 
     def get_last_movie(self):
-        article = self._session_cm.session.query(Movie).order_by(desc(Movie.rank)).first()
+        article = self._query_movies().order_by(desc(orm.movies.c.rank)).first()
         return article
 
     def get_rank_of_previous_movie(self, movie):
         result = None
-        prev = self._session_cm.session.query(Movie).filter(Movie.rank < movie.rank).order_by(desc(Movie.rank)).first()
+        prev = self._session_cm.session.query(orm.movies.c.rank).filter(
+            orm.movies.c.rank < movie.rank).order_by(desc(orm.movies.c.rank)).first()
 
         if prev is not None:
             result = prev.rank
@@ -143,23 +283,163 @@ class SqlAlchemyRepository(AbstractRepository):
 
     def get_rank_of_next_movie(self, movie):
         result = None
-        next = self._session_cm.session.query(Movie).filter(Movie.rank > movie.rank).order_by(asc(Movie.rank)).first()
+        next = self._session_cm.session.query(orm.movies.c.rank).filter(
+            orm.movies.c.rank > movie.rank).order_by(asc(orm.movies.c.rank)).first()
 
         if next is not None:
             result = next.rank
 
         return result
 
+    def search_movies(self, query, limit=20):
+        terms = tokenize(query)
+        if len(terms) == 0:
+            return []
+
+        # Quote every term so user input cannot inject FTS5 query syntax.
+        match = ' OR '.join(f'"{term}"' for term in terms)
+        ranks = [row[0] for row in self._session_cm.session.execute(
+            text("SELECT rowid FROM movies_fts WHERE movies_fts MATCH :match "
+                 "ORDER BY bm25(movies_fts, 2.0, 1.0) LIMIT :limit"),
+            {'match': match, 'limit': limit})]
+
+        movies = self._query_movies().filter(orm.movies.c.rank.in_(ranks)).all()
+        position = {rank: index for index, rank in enumerate(ranks)}
+        movies.sort(key=lambda movie: position[movie.rank])
+        return movies
+
+    def get_movies_by_filter(self, movie_filter: MovieFilter, after_rank, limit):
+        return self._query_movies().filter(*movie_filter_conditions(movie_filter, paging=True)).filter(
+            orm.movies.c.rank > after_rank).order_by(asc(orm.movies.c.rank)).limit(limit).all()
+
+    def get_top_movies(self, field, limit, movie_filter: MovieFilter = None):
+        if field not in TOP_N_COLUMNS:
+            raise RepositoryException(f'Cannot rank movies by {field}')
+        value, present = TOP_N_COLUMNS[field]
+        conditions = movie_filter_conditions(movie_filter, paging=True) if movie_filter is not None else []
+        # Matches the order of the field's top index, so SQLite reads it from the start and stops after limit matches.
+        return self._query_movies().filter(present, *conditions).order_by(
+            desc(value), asc(orm.movies.c.rank)).limit(limit).all()
+
+    def get_facet_counts(self, movie_filter: MovieFilter):
+        session = self._session_cm.session
+        conditions = movie_filter_conditions(movie_filter)
+        movies = orm.movies.c
+
+        # One pass over the (year, rating) covering index yields the total and both the year and rating counts.
+        bucket = cast(movies.rating, Integer)
+        total = 0
+        year_counts = dict()
+        rating_counts = dict()
+        for year, rating_bucket, count in session.execute(
+                select([movies.year, bucket, func.count()]).where(and_(*conditions)).group_by(movies.year, bucket)):
+            total += count
+            if year is not None:
+                year_counts[year] = year_counts.get(year, 0) + count
+            if rating_bucket is not None:
+                rating_counts[rating_bucket] = rating_counts.get(rating_bucket, 0) + count
+
+        # Grouped on the genre id straight from the (movie, genre) primary key; names are attached afterwards.
+        genre_query = select([orm.movie_genres.c.genre, func.count()])
+        if conditions:
+            genre_query = genre_query.where(orm.movie_genres.c.movie.in_(
+                select([movies.rank]).where(and_(*conditions))))
+        genre_counts = dict(tuple(row) for row in session.execute(genre_query.group_by(orm.movie_genres.c.genre)))
+        genre_names = dict(tuple(row) for row in session.execute(
+            select([orm.genres.c.id, orm.genres.c.name]).where(orm.genres.c.id.in_(list(genre_counts)))))
+        genre_counts = sorted(((genre_names[genre_id], count) for genre_id, count in genre_counts.items()),
+                              key=lambda item: (-item[1], item[0]))
+
+        return total, {
+            'genre': dict(genre_counts),
+            'year': dict(sorted(year_counts.items())),
+            'rating': dict(sorted(rating_counts.items())),
+        }
+
+    def get_statistics(self):
+        row = self._session_cm.session.execute(statistics_query(orm.catalogue_stats)).first()
+        return Statistics(*row) if row is not None else Statistics()
+
+    def get_director_statistics(self, director):
+        row = self._session_cm.session.execute(statistics_query(orm.director_stats).where(
+            orm.director_stats.c.director == director)).first()
+        return Statistics(*row) if row is not None else None
+
+    def get_genre_statistics(self):
+        query = statistics_query(orm.genre_stats, orm.genres.c.name).select_from(
+            orm.genre_stats.join(orm.genres, orm.genres.c.id == orm.genre_stats.c.genre)).order_by(
+            desc(orm.genre_stats.c.movies), asc(orm.genres.c.name))
+        return {row[0]: Statistics(*row[1:]) for row in self._session_cm.session.execute(query)}
+
+    def get_most_reviewed_movies(self, limit):
+        # Read from the start of the (reviews, movie) index on movie_stats.
+        ranks = [row[0] for row in self._session_cm.session.execute(
+            select([orm.movie_stats.c.movie]).where(orm.movie_stats.c.reviews > 0).order_by(
+                desc(orm.movie_stats.c.reviews), asc(orm.movie_stats.c.movie)).limit(limit))]
+
+        movies = self._query_movies().filter(orm.movies.c.rank.in_(ranks)).all()
+        position = {rank: index for index, rank in enumerate(ranks)}
+        movies.sort(key=lambda movie: position[movie.rank])
+        return movies
+
     def get_reviews(self):
         comments = self._session_cm.session.query(Review).all()
         return comments
 
     def add_review(self, review):
-        super().add_comment(review)
+        super().add_review(review)
         with self._session_cm as scm:
             scm.session.add(review)
             scm.commit()
 
+    def add_reviews(self, reviews):
+        # One transaction, and so one commit, for the whole batch.
+        for review in reviews:
+            AbstractRepository.add_review(self, review)
+        with self._session_cm as scm:
+            scm.session.add_all(reviews)
+            scm.commit()
+
+    def _query_movies(self):
+        # Movies are rendered together with every review and its author, so those are eagerly loaded: one SELECT
+        # for the reviews of all matched movies, joined to their users, instead of one query per review.
+        return self._session_cm.session.query(Movie).options(
+            selectinload('_Movie__reviews').joinedload('_Review__user'))
+
+
+def statistics_query(table, *columns):
+    # Selects the given columns followed by the fields of a Statistics, in order, from a summary table.
+    return select(list(columns) + [table.c[field] for field in Statistics._fields])
+
+
+class QueryCounter:
+    """Counts the SQL statements executed on an engine while the context is active.
+
+    Used to check that a request issues a bounded number of queries, e.g.
+
+        with QueryCounter(repo.engine) as counter:
+            client.get('/movies')
+        assert counter.count <= 3
+    """
+
+    def __init__(self, engine: Engine):
+        self.__engine = engine
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def __enter__(self):
+        event.listen(self.__engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *args):
+        event.remove(self.__engine, 'before_cursor_execute', self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
 
 def article_record_generator(filename: str):
     with open(filename, mode='r', encoding='utf-8-sig') as infile:
@@ -195,32 +475,197 @@ def generic_generator(filename, post_process=None):
             yield row
 
 
-def process_user(user_row):
-    user_row[2] = generate_password_hash(user_row[2])
-    return user_row
+def create_search_index(engine: Engine):
+    # SQLite FTS5 index over movie titles and descriptions, kept in step with the movies table by triggers. Its
+    # tokenizer folds case and diacritics like search_index.tokenize, which search_movies applies to queries.
+    if engine.has_table('movies_fts'):
+        return
+
+    with engine.begin() as conn:
+        conn.execute("""
+            CREATE VIRTUAL TABLE movies_fts USING fts5(
+            title, description, content='movies', content_rowid='rank',
+            tokenize='unicode61 remove_diacritics 2')""")
+        conn.execute("""
+            CREATE TRIGGER movies_fts_insert AFTER INSERT ON movies BEGIN
+            INSERT INTO movies_fts(rowid, title, description) VALUES (new.rank, new.title, new.description);
+            END""")
+        conn.execute("""
+            CREATE TRIGGER movies_fts_delete AFTER DELETE ON movies BEGIN
+            INSERT INTO movies_fts(movies_fts, rowid, title, description)
+            VALUES ('delete', old.rank, old.title, old.description);
+            END""")
+        conn.execute("""
+            CREATE TRIGGER movies_fts_update AFTER UPDATE ON movies BEGIN
+            INSERT INTO movies_fts(movies_fts, rowid, title, description)
+            VALUES ('delete', old.rank, old.title, old.description);
+            INSERT INTO movies_fts(rowid, title, description) VALUES (new.rank, new.title, new.description);
+            END""")
+        # Index any movies that were loaded before the search index existed.
+        conn.execute("INSERT INTO movies_fts(movies_fts) VALUES ('rebuild')")
+
+
+# Adds a movie, of the given rating and year and with the given number of reviews, to the aggregates in {table} that
+# match {where}. SQLite's min() and max() of a NULL are NULL, hence the coalesce.
+ADD_MOVIE_TO_AGGREGATES = """
+    UPDATE {table} SET
+    movies = movies + 1,
+    reviews = reviews + {reviews},
+    rated_movies = rated_movies + ({rating} IS NOT NULL),
+    rating_total = rating_total + coalesce({rating}, 0),
+    min_rating = coalesce(min(min_rating, {rating}), min_rating, {rating}),
+    max_rating = coalesce(max(max_rating, {rating}), max_rating, {rating}),
+    first_year = coalesce(min(first_year, {year}), first_year, {year}),
+    last_year = coalesce(max(last_year, {year}), last_year, {year})
+    WHERE {where};"""
+
+# The same aggregates computed from scratch, over movies joined to movie_stats.
+AGGREGATE_COLUMNS = "movies, reviews, rated_movies, rating_total, min_rating, max_rating, first_year, last_year"
+AGGREGATES = """
+    count(*), coalesce(sum(movie_stats.reviews), 0), count(movies.rating), coalesce(sum(movies.rating), 0),
+    min(movies.rating), max(movies.rating), min(movies.year), max(movies.year)"""
+
+
+STATISTICS_TRIGGERS = ('movies_stats_insert', 'movie_genres_stats_insert', 'reviews_stats_insert')
+
+
+def create_statistics_triggers(engine: Engine):
+    # Triggers keeping the summary tables in step with every insert, through the ORM or otherwise. Movies, genres and
+    # reviews are never deleted other than by clear_tables, which empties the summaries with them.
+    if engine.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = ?",
+                      STATISTICS_TRIGGERS[0]).first():
+        return
+
+    with engine.begin() as conn:
+        movie = dict(rating='new.rating', year='new.year', reviews='0')
+        conn.execute(f"""
+            CREATE TRIGGER movies_stats_insert AFTER INSERT ON movies BEGIN
+            INSERT INTO movie_stats (movie) VALUES (new.rank);
+            INSERT OR IGNORE INTO catalogue_stats (id) VALUES (1);
+            {ADD_MOVIE_TO_AGGREGATES.format(table='catalogue_stats', where='id = 1', **movie)}
+            INSERT OR IGNORE INTO director_stats (director) VALUES (new.director);
+            {ADD_MOVIE_TO_AGGREGATES.format(table='director_stats', where='director = new.director', **movie)}
+            END""")
+        # A movie's genres are inserted after it, so its rating, year and any reviews are looked up.
+        genre_movie = dict(rating='(SELECT rating FROM movies WHERE rank = new.movie)',
+                           year='(SELECT year FROM movies WHERE rank = new.movie)',
+                           reviews='coalesce((SELECT reviews FROM movie_stats WHERE movie = new.movie), 0)')
+        conn.execute(f"""
+            CREATE TRIGGER movie_genres_stats_insert AFTER INSERT ON movie_genres BEGIN
+            INSERT OR IGNORE INTO genre_stats (genre) VALUES (new.genre);
+            {ADD_MOVIE_TO_AGGREGATES.format(table='genre_stats', where='genre = new.genre', **genre_movie)}
+            END""")
+        conn.execute("""
+            CREATE TRIGGER reviews_stats_insert AFTER INSERT ON reviews BEGIN
+            UPDATE movie_stats SET reviews = reviews + 1 WHERE movie = new.movie;
+            UPDATE catalogue_stats SET reviews = reviews + 1 WHERE id = 1;
+            UPDATE director_stats SET reviews = reviews + 1
+            WHERE director = (SELECT director FROM movies WHERE rank = new.movie);
+            UPDATE genre_stats SET reviews = reviews + 1
+            WHERE genre IN (SELECT genre FROM movie_genres WHERE movie = new.movie);
+            END""")
+        # Summarize any movies and reviews that were loaded before the triggers existed.
+        rebuild_statistics(conn)
+
+
+@contextmanager
+def statistics_deferred(engine: Engine):
+    # Bulk loads run without the triggers, which would more than double their time, and summarize everything once at
+    # the end instead.
+    with engine.begin() as conn:
+        for trigger in STATISTICS_TRIGGERS:
+            conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    try:
+        yield
+    finally:
+        create_statistics_triggers(engine)
+
+
+def rebuild_statistics(conn):
+    # Recomputes every summary from the movies, genres and reviews, in the transaction of conn.
+    for table in ('movie_stats', 'catalogue_stats', 'director_stats', 'genre_stats'):
+        conn.execute(f"DELETE FROM {table}")
+    conn.execute("""
+        INSERT INTO movie_stats (movie, reviews)
+        SELECT movies.rank, count(reviews.id) FROM movies LEFT JOIN reviews ON reviews.movie = movies.rank
+        GROUP BY movies.rank""")
+    conn.execute(f"""
+        INSERT INTO catalogue_stats (id, {AGGREGATE_COLUMNS})
+        SELECT 1, {AGGREGATES} FROM movies JOIN movie_stats ON movie_stats.movie = movies.rank""")
+    conn.execute(f"""
+        INSERT INTO director_stats (director, {AGGREGATE_COLUMNS})
+        SELECT movies.director, {AGGREGATES} FROM movies JOIN movie_stats ON movie_stats.movie = movies.rank
+        GROUP BY movies.director""")
+    conn.execute(f"""
+        INSERT INTO genre_stats (genre, {AGGREGATE_COLUMNS})
+        SELECT movie_genres.genre, {AGGREGATES} FROM movie_genres
+        JOIN movies ON movies.rank = movie_genres.movie JOIN movie_stats ON movie_stats.movie = movie_genres.movie
+        GROUP BY movie_genres.genre""")
+
+
+def build_schema(engine: Engine):
+    # Creates whatever tables, indexes, search index and statistics triggers are missing, so it also brings an older
+    # database up to date.
+    orm.metadata.create_all(engine)
+    create_indexes(engine)
+    create_search_index(engine)
+    create_statistics_triggers(engine)
+
+
+def clear_tables(engine: Engine):
+    for table in reversed(orm.metadata.sorted_tables):
+        engine.execute(table.delete())
+
+
+def reindex(engine: Engine):
+    # Rebuilds every index, the search index and the summary tables, then refreshes the statistics the query planner
+    # chooses indexes by.
+    create_indexes(engine)
+    with engine.begin() as conn:
+        conn.execute("REINDEX")
+        conn.execute("INSERT INTO movies_fts(movies_fts) VALUES ('rebuild')")
+        rebuild_statistics(conn)
+        conn.execute("ANALYZE")
+
+
+def vacuum(engine: Engine):
+    # VACUUM cannot run inside a transaction, and would leave the pages it frees in an untruncated write-ahead log.
+    conn = engine.raw_connection()
+    try:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+
+
+def database_stats(engine: Engine):
+    """Returns the row count of each table and, for SQLite, the size of the database and the indexes it has."""
+    stats = {'tables': {table.name: engine.execute(select([func.count()]).select_from(table)).scalar()
+                        for table in orm.metadata.sorted_tables if engine.has_table(table.name)}}
+    if engine.dialect.name == 'sqlite':
+        page_size = engine.execute("PRAGMA page_size").scalar()
+        stats['size_bytes'] = engine.execute("PRAGMA page_count").scalar() * page_size
+        stats['free_bytes'] = engine.execute("PRAGMA freelist_count").scalar() * page_size
+        stats['indexes'] = [name for name, in engine.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL ORDER BY name")]
+    return stats
 
 
 def populate(engine: Engine, data_path: str):
-    conn = engine.raw_connection()
-    cursor = conn.cursor()
-
-    insert_movies = """
-        INSERT INTO movies (
-        rank, title, genre,description, director,actors, year, runtime, rating, votes, revenue, metascore)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
-    cursor.executemany(insert_movies, article_record_generator(os.path.join(data_path, 'Data1000Movies.csv')))
-
-    insert_users = """
-        INSERT INTO users (
-        id, username, password)
-        VALUES (?, ?, ?)"""
-    cursor.executemany(insert_users, generic_generator(os.path.join(data_path, 'users.csv'), process_user))
-
-    #insert_reviews = """
-    #   INSERT INTO reviews (
-    #   id, user, movie, review, timestamp)
-    #    VALUES (?, ?, ?, ?, ?)"""
-    #cursor.executemany(insert_reviews, generic_generator(os.path.join(data_path, 'reviews.csv')))
-
-    conn.commit()
-    conn.close()
+    with statistics_deferred(engine):
+        conn = engine.raw_connection()
+        cursor = conn.cursor()
+
+        # Movies, actors, genres and their associations are streamed in and committed as one transaction.
+        csv_ingest.ingest_movies(os.path.join(data_path, 'Data1000Movies.csv'), csv_ingest.DatabaseMovieSink(conn))
+
+        insert_users = """
+            INSERT INTO users (
+            id, username, password)
+            VALUES (?, ?, ?)"""
+        cursor.executemany(insert_users, user_seed.load_user_records(os.path.join(data_path, 'users.csv')))
+
+        # Reviews are streamed in after the users and movies they refer to, and committed with them.
+        review_csv.ingest_reviews(os.path.join(data_path, 'reviews.csv'), review_csv.DatabaseReviewSink(conn))
+        conn.close()
@@ -0,0 +1,196 @@
+"""Facet index for browsing the memory repository by genre, director, year and rating.
+
+Every facet value keeps a sorted array of the ranks of its movies. Filtering turns the arrays into bitsets - Python
+ints with bit r set for rank r - and intersects them, so a bitset is already in rank order and a page is read off by
+taking its lowest set bits. Bitsets of genres, years and ratings are cached per value until a movie with that value is
+added; there are few of those values, whereas directors are about as many as movies and are built afresh. Year and
+rating ranges are answered by bisecting the sorted distinct values and uniting the bitsets of those in range. Facet
+counts are the population counts of each value's bitset intersected with the matches.
+"""
+import re
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+
+from movie.adapters.repository import MovieFilter
+
+GENRE = 'genre'
+DIRECTOR = 'director'
+YEAR = 'year'
+RATING = 'rating'
+# Ratings are counted in whole-point buckets, 7 covering 7.0 up to 7.9, which have bitsets of their own so counting
+# takes one intersection per bucket rather than one per distinct rating.
+RATING_BUCKET = 'rating_bucket'
+
+# The positions of the set bits of each byte value, and a pattern finding the bytes that have any.
+BYTE_BITS = tuple(tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256))
+NONZERO_BYTE = re.compile(rb'[^\x00]')
+# The number of set bits of each byte value.
+BYTE_COUNTS = bytes(len(bits) for bits in BYTE_BITS)
+
+# Facets whose values are counted for a result set, and the index facet holding their bitsets. Directors are left out:
+# there are about as many as there are movies, so counting them would mean visiting every matching movie.
+COUNTED_FACETS = ((GENRE, GENRE), (YEAR, YEAR), (RATING, RATING_BUCKET))
+
+
+def movie_facet_values(movie):
+    """Yields the (facet, value) pairs a movie is indexed under."""
+    for genre in movie.genres:
+        yield GENRE, genre.genre_name
+    if movie.director is not None:
+        yield DIRECTOR, getattr(movie.director, 'director_full_name', movie.director)
+    if movie.year is not None:
+        yield YEAR, movie.year
+    if movie.rating is not None:
+        yield RATING, float(movie.rating)
+        yield RATING_BUCKET, int(float(movie.rating))
+
+
+class FacetIndex:
+
+    def __init__(self):
+        # (facet, value) -> sorted ranks
+        self.__ranks = dict()
+        # facet -> sorted distinct values, for range queries
+        self.__values = defaultdict(list)
+        self.__all_ranks = array('L')
+        self.__cache = dict()
+
+    def __getstate__(self):
+        # Cached bitsets are rebuilt on demand rather than stored in repository snapshots.
+        state = self.__dict__.copy()
+        state['_FacetIndex__cache'] = dict()
+        return state
+
+    def add_movie(self, movie):
+        self.__insert(self.__all_ranks, movie.rank)
+        self.__cache.pop(None, None)
+        for facet, value in movie_facet_values(movie):
+            key = (facet, value)
+            ranks = self.__ranks.get(key)
+            if ranks is None:
+                ranks = self.__ranks[key] = array('L')
+                insort(self.__values[facet], value)
+            self.__insert(ranks, movie.rank)
+            self.__cache.pop(key, None)
+
+    def filter(self, movie_filter: MovieFilter):
+        """Returns the bitset of the movies matching the filter."""
+        bitsets = [self.__bitset((GENRE, genre)) for genre in movie_filter.genres]
+        if movie_filter.director is not None:
+            bitsets.append(self.__bitset((DIRECTOR, movie_filter.director)))
+        if movie_filter.min_year is not None or movie_filter.max_year is not None:
+            bitsets.append(self.__range(YEAR, movie_filter.min_year, movie_filter.max_year))
+        if movie_filter.min_rating is not None or movie_filter.max_rating is not None:
+            bitsets.append(self.__range(RATING, movie_filter.min_rating, movie_filter.max_rating))
+
+        if not bitsets:
+            return self.__bitset(None)
+        # Intersect the sparsest first; once nothing is left the rest need not be built.
+        bitsets.sort(key=bitset_count)
+        matched = bitsets[0]
+        for bitset in bitsets[1:]:
+            matched &= bitset
+            if not matched:
+                break
+        return matched
+
+    def counts(self, matched):
+        """Returns {facet: {value: number of matched movies}} for the counted facets, leaving out zero counts."""
+        everything = matched == self.__bitset(None)
+        counts = dict()
+        for facet, index_facet in COUNTED_FACETS:
+            facet_counts = dict()
+            for value in self.__values[index_facet]:
+                if everything:
+                    count = len(self.__ranks[(index_facet, value)])
+                else:
+                    count = bitset_count(self.__bitset((index_facet, value)) & matched)
+                if count:
+                    facet_counts[value] = count
+            if facet == GENRE:
+                facet_counts = dict(sorted(facet_counts.items(), key=lambda item: (-item[1], item[0])))
+            counts[facet] = facet_counts
+        return counts
+
+    def __bitset(self, key):
+        bitset = self.__cache.get(key)
+        if bitset is None:
+            ranks = self.__all_ranks if key is None else self.__ranks.get(key)
+            if ranks is None:
+                # Values come from the query string, so one that no movie has is not cached.
+                return 0
+            bitset = ranks_to_bitset(ranks)
+            if key is None or key[0] != DIRECTOR:
+                self.__cache[key] = bitset
+        return bitset
+
+    def __range(self, facet, low, high):
+        values = self.__values[facet]
+        start = 0 if low is None else bisect_left(values, low)
+        stop = len(values) if high is None else bisect_right(values, high)
+        bitset = 0
+        for value in values[start:stop]:
+            bitset |= self.__bitset((facet, value))
+        return bitset
+
+    @staticmethod
+    def __insert(ranks, rank):
+        # Ranks normally arrive in increasing order, so this is an append.
+        if not ranks or ranks[-1] < rank:
+            ranks.append(rank)
+        else:
+            index = bisect_left(ranks, rank)
+            if index == len(ranks) or ranks[index] != rank:
+                ranks.insert(index, rank)
+
+
+def ranks_to_bitset(ranks):
+    if not ranks:
+        return 0
+    bits = bytearray(ranks[-1] // 8 + 1)
+    for rank in ranks:
+        bits[rank >> 3] |= 1 << (rank & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def bitset_ranks(bitset, after_rank, limit):
+    """Returns up to limit ranks set in bitset that are greater than after_rank, in increasing order."""
+    offset = max(after_rank + 1, 0)
+    remaining = bitset >> offset
+    ranks = []
+    # Shifting a bitset of a million movies costs as much as scanning it, so bits are read from windows of the low end
+    # instead, doubling the window each time one runs out.
+    width = 1024
+    while remaining and len(ranks) < limit:
+        window = remaining & ((1 << width) - 1)
+        while window and len(ranks) < limit:
+            lowest = window & -window
+            ranks.append(offset + lowest.bit_length() - 1)
+            window ^= lowest
+        remaining >>= width
+        offset += width
+        width *= 2
+    return ranks
+
+
+def byte_table_bitset_count(bitset):
+    """Returns the number of ranks set in bitset."""
+    # Translating each byte to its number of set bits keeps the loop over the bytes in C.
+    return sum(bitset_bytes(bitset).translate(BYTE_COUNTS))
+
+
+# int.bit_count needs Python 3.10; earlier versions count the bits of each byte from a table.
+bitset_count = getattr(int, 'bit_count', None) or byte_table_bitset_count
+
+
+def bitset_bytes(bitset):
+    return bitset.to_bytes((bitset.bit_length() + 7) // 8, 'little')
+
+
+def all_bitset_ranks(bitset):
+    """Returns every rank set in bitset, in increasing order."""
+    # Skipping the zero bytes is done by the regular expression engine, so the cost follows the number of ranks set
+    # rather than the highest one.
+    return [match.start() << 3 | bit
+            for match in NONZERO_BYTE.finditer(bitset_bytes(bitset)) for bit in BYTE_BITS[match.group()[0]]]
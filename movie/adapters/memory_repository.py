@@ -1,54 +1,73 @@
 import csv
 import os
-from datetime import date, datetime
+from datetime import date
 from typing import List
 
 from bisect import bisect, bisect_left, insort_left
 
-from werkzeug.security import generate_password_hash
-
-from movie.adapters.repository import AbstractRepository, RepositoryException
+from movie.adapters import csv_ingest, review_csv, user_seed
+from movie.adapters.facet_index import FacetIndex, bitset_count, bitset_ranks
+from movie.adapters.ranking_index import RankingIndex
+from movie.adapters.repository import AbstractRepository, RepositoryException, MovieFilter, TOP_N_FIELDS
+from movie.adapters.search_index import SearchIndex
+from movie.adapters.statistics_index import StatisticsIndex
 from movie.domain.movie import Movie
 from movie.domain.actor import Actor
 from movie.domain.genre import Genre
 from movie.domain.director import Director
 from movie.domain.user import User
-from movie.domain.review import Review, make_review
+from movie.domain.review import Review
 
 
 class MemoryRepository(AbstractRepository):
 
     def __init__(self):
+        # Movies are kept sorted by rank, with their ranks mirrored in a parallel list for bisection.
         self.__dataset_of_movies = []
-        self.__dataset_of_actors = []
-        self.__dataset_of_directors = []
-        self.__dataset_of_genres = []
+        self.__movie_ranks = []
         self.__dataset_of_movies_rank = dict()
-        self.__users = []
+        # Actors, directors, genres and users are indexed on their normalized name so lookups are O(1).
+        self.__dataset_of_actors = dict()
+        self.__dataset_of_directors = dict()
+        self.__dataset_of_genres = dict()
+        self.__users = dict()
         self.__reviews = []
+        self.__search_index = SearchIndex()
+        self.__facet_index = FacetIndex()
+        self.__ranking_indexes = {field: RankingIndex(field) for field in TOP_N_FIELDS}
+        self.__statistics_index = StatisticsIndex()
 
     def add_actor(self, actor: Actor):
-        self.__dataset_of_actors.append(actor)
+        self.__dataset_of_actors.setdefault(normalize_name(actor.actor_full_name), actor)
 
     def get_actor(self, actor) -> Actor:
-        return next((actor_holder for actor_holder in self.__dataset_of_actors if actor_holder.actor == actor), None)
+        return self.__dataset_of_actors.get(normalize_name(actor))
 
     def add_director(self, director: Director):
-        self.__dataset_of_directors.append(director)
+        self.__dataset_of_directors.setdefault(normalize_name(director.director_full_name), director)
 
     def get_director(self, director) -> Director:
-        return next((director_holder for director_holder in self.__dataset_of_directors if
-                     director_holder.director == director), None)
+        return self.__dataset_of_directors.get(normalize_name(director))
 
     def add_genre(self, genre: Genre):
-        self.__dataset_of_genres.append(genre)
+        self.__dataset_of_genres.setdefault(normalize_name(genre.genre_name), genre)
 
     def get_genre(self, genre) -> Genre:
-        return next((genre_holder for genre_holder in self.__dataset_of_genres if genre_holder.genre == genre), None)
+        return self.__dataset_of_genres.get(normalize_name(genre))
 
     def add_movie(self, movie: Movie):
-        self.__dataset_of_movies += [movie]
+        index = bisect(self.__movie_ranks, movie.rank)
+        self.__movie_ranks.insert(index, movie.rank)
+        self.__dataset_of_movies.insert(index, movie)
+        previous = self.__dataset_of_movies_rank.get(movie.rank)
+        if previous is not None:
+            self.__search_index.remove_document(previous.rank, previous.title, previous.description)
         self.__dataset_of_movies_rank[movie.rank] = movie
+        self.__search_index.add_document(movie.rank, movie.title, movie.description)
+        self.__facet_index.add_movie(movie)
+        for ranking_index in self.__ranking_indexes.values():
+            ranking_index.add_movie(movie)
+        self.__statistics_index.add_movie(movie)
 
     def get_movie(self, id: int) -> Movie:
         movie = None
@@ -79,6 +98,42 @@ class MemoryRepository(AbstractRepository):
             raise KeyError
         return [self.__dataset_of_movies_rank[target_rank]]
 
+    def get_movies_page(self, after_rank, limit):
+        start = bisect(self.__movie_ranks, after_rank)
+        return self.__dataset_of_movies[start:start + limit]
+
+    def get_movie_versions(self, after_rank, limit):
+        return [(movie.rank, movie.number_of_reviews, max((review.timestamp for review in movie.reviews), default=None))
+                for movie in self.get_movies_page(after_rank, limit)]
+
+    def get_movies_by_filter(self, movie_filter: MovieFilter, after_rank, limit):
+        matched = self.__facet_index.filter(movie_filter)
+        return [self.__dataset_of_movies_rank[rank] for rank in bitset_ranks(matched, after_rank, limit)]
+
+    def get_facet_counts(self, movie_filter: MovieFilter):
+        matched = self.__facet_index.filter(movie_filter)
+        return bitset_count(matched), self.__facet_index.counts(matched)
+
+    def get_top_movies(self, field, limit, movie_filter: MovieFilter = None):
+        if field not in self.__ranking_indexes:
+            raise RepositoryException(f'Cannot rank movies by {field}')
+        matched = None
+        if movie_filter is not None and not movie_filter.is_empty():
+            matched = self.__facet_index.filter(movie_filter)
+        return [self.__dataset_of_movies_rank[rank] for rank in self.__ranking_indexes[field].top(limit, matched)]
+
+    def get_statistics(self):
+        return self.__statistics_index.statistics()
+
+    def get_director_statistics(self, director):
+        return self.__statistics_index.director_statistics(normalize_name(director))
+
+    def get_genre_statistics(self):
+        return self.__statistics_index.genre_statistics()
+
+    def get_most_reviewed_movies(self, limit):
+        return [self.__dataset_of_movies_rank[rank] for rank in self.__statistics_index.most_reviewed(limit)]
+
     def get_rank_of_previous_movie(self, movie):
         previous_rank = None
 
@@ -101,11 +156,14 @@ class MemoryRepository(AbstractRepository):
 
         return next_rank
 
+    def search_movies(self, query, limit=20):
+        return [self.__dataset_of_movies_rank[rank] for rank in self.__search_index.search(query, limit)]
+
     def add_user(self, user):
-        self.__users.append(user)
+        self.__users.setdefault(normalize_name(user.user_name), user)
 
     def get_user(self, username):
-        return next((user for user in self.__users if user.user_name == username), None)
+        return self.__users.get(normalize_name(username))
 
     def movies_rank(self, movie):
         ranking = bisect_left(self.__dataset_of_movies, movie)
@@ -116,6 +174,9 @@ class MemoryRepository(AbstractRepository):
     def add_review(self, review):
         super().add_review(review)
         self.__reviews.append(review)
+        # Reviews of a movie added later are counted when it is.
+        if self.__dataset_of_movies_rank.get(review.movie.rank) is review.movie:
+            self.__statistics_index.add_review(review)
 
     def get_reviews(self):
         return self.__reviews
@@ -124,6 +185,13 @@ class MemoryRepository(AbstractRepository):
         return len(self.__dataset_of_movies)
 
 
+def normalize_name(name):
+    # Index key for actors, directors, genres and users; mirrors the stripping done by the domain constructors.
+    if isinstance(name, str):
+        return name.strip()
+    return None
+
+
 def read_csv_file(filename: str):
     with open(filename, encoding='utf-8-sig') as infile:
         reader = csv.reader(infile)
@@ -136,44 +204,23 @@ def read_csv_file(filename: str):
 
 
 def load_movies(data_path: str, repo: MemoryRepository):
-    for data_row in read_csv_file(os.path.join(data_path, 'Data1000Movies.csv')):
-        movie_rank = int(data_row[0])
-
-        movie = Movie(
-            rank=movie_rank,
-            title=data_row[1],
-            year=int(data_row[6]),
-            description=data_row[3],
-            director=data_row[4],
-            runtime_minutes=int(data_row[7]),
-            rating=float(data_row[8]),
-            metascore=data_row[11]
-        )
-        # add genre and actors later maybe.
-        repo.add_movie(movie)
+    csv_ingest.ingest_movies(os.path.join(data_path, 'Data1000Movies.csv'), csv_ingest.MemoryMovieSink(repo))
 
 
 def load_users(data_path: str, repo: MemoryRepository):
     users = dict()
-    for data_row in read_csv_file(os.path.join(data_path, 'users.csv')):
+    for user_id, user_name, password_hash in user_seed.load_user_records(os.path.join(data_path, 'users.csv')):
         user = User(
-            user_name=data_row[1],
-            password=generate_password_hash(data_row[2])
+            user_name=user_name,
+            password=password_hash
         )
         repo.add_user(user)
-        users[data_row[0]] = user
+        users[user_id] = user
 
     return users
 
 def load_reviews(data_path: str, repo: MemoryRepository, users):
-    for data_row in read_csv_file(os.path.join(data_path, 'reviews.csv')):
-        review = make_review(
-            review_text=data_row[3],
-            user=users[data_row[1]],
-            movie=repo.get_movie(int(data_row[2])),
-            timestamp=datetime.fromisoformat((data_row[4]))
-        )
-    repo.add_review(review)
+    review_csv.ingest_reviews(os.path.join(data_path, 'reviews.csv'), review_csv.MemoryReviewSink(repo, users))
 
 
 def populate(data_path, repo):
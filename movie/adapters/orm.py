@@ -1,6 +1,6 @@
 from sqlalchemy import (
-    Table, MetaData, Column, Integer, String, Date, DateTime,
-    ForeignKey
+    Table, MetaData, Column, Integer, Float, String, Date, DateTime,
+    ForeignKey, Index, cast
 )
 from sqlalchemy.orm import mapper, relationship
 
@@ -39,37 +39,131 @@ movies = Table(
     Column('runtime', Integer, autoincrement=True),
     Column('metascore', String(255), nullable=False),
     Column('rating', Integer, autoincrement=True),
-    Column('genre', String(255), nullable=False),
-    Column('actors', String(255), nullable=False),
     Column('votes', Integer),
-    Column('revenue', Integer)
+    Column('revenue', Float)
 
+)
+
+actors = Table(
+    'actors', metadata,
+    Column('id', Integer, primary_key=True, autoincrement=True),
+    Column('name', String(255), unique=True, nullable=False)
+)
+
+genres = Table(
+    'genres', metadata,
+    Column('id', Integer, primary_key=True, autoincrement=True),
+    Column('name', String(255), unique=True, nullable=False)
+)
 
+movie_actors = Table(
+    'movie_actors', metadata,
+    Column('movie', ForeignKey('movies.rank'), primary_key=True),
+    Column('actor', ForeignKey('actors.id'), primary_key=True)
 )
 
+movie_genres = Table(
+    'movie_genres', metadata,
+    Column('movie', ForeignKey('movies.rank'), primary_key=True),
+    Column('genre', ForeignKey('genres.id'), primary_key=True)
+)
+
+
+def aggregate_columns():
+    # The counts, sums and bounds of a repository.Statistics; means are worked out from the sums when read.
+    # Defaults are in the schema, as the rows are inserted by triggers.
+    return [
+        Column('movies', Integer, nullable=False, server_default='0'),
+        Column('reviews', Integer, nullable=False, server_default='0'),
+        Column('rated_movies', Integer, nullable=False, server_default='0'),
+        Column('rating_total', Float, nullable=False, server_default='0'),
+        Column('min_rating', Float),
+        Column('max_rating', Float),
+        Column('first_year', Integer),
+        Column('last_year', Integer)
+    ]
+
+
+# Summary tables kept up to date by triggers as movies, their genres and reviews are inserted (see
+# database_repository.create_statistics_triggers), so statistics are read without scanning movies or reviews.
+movie_stats = Table(
+    'movie_stats', metadata,
+    Column('movie', ForeignKey('movies.rank'), primary_key=True),
+    Column('reviews', Integer, nullable=False, server_default='0')
+)
+
+catalogue_stats = Table(
+    'catalogue_stats', metadata,
+    Column('id', Integer, primary_key=True),
+    *aggregate_columns()
+)
+
+director_stats = Table(
+    'director_stats', metadata,
+    Column('director', String(255), primary_key=True),
+    *aggregate_columns()
+)
+
+genre_stats = Table(
+    'genre_stats', metadata,
+    Column('genre', ForeignKey('genres.id'), primary_key=True),
+    *aggregate_columns()
+)
+
+# Secondary indexes for the lookups the repositories perform. users.username is already indexed by its UNIQUE
+# constraint; reviews are loaded per movie (newest last) and per user.
+Index('reviews_movie_timestamp_idx', reviews.c.movie, reviews.c.timestamp)
+Index('reviews_user_idx', reviews.c.user)
+Index('movies_year_idx', movies.c.year)
+Index('movies_director_idx', movies.c.director)
+Index('movies_rating_idx', movies.c.rating)
+# Covers browsing by year and rating, including counting both facets, without reading the movie rows.
+Index('movies_year_rating_idx', movies.c.year, movies.c.rating)
+# Top-N lists read these from the start: highest value first, ties in rank order, so no sort is needed. Metascores are
+# stored as the CSV has them and ranked as integers.
+Index('movies_rating_top_idx', movies.c.rating.desc(), movies.c.rank)
+Index('movies_metascore_top_idx', cast(movies.c.metascore, Integer).desc(), movies.c.rank)
+Index('movies_votes_top_idx', movies.c.votes.desc(), movies.c.rank)
+Index('movies_revenue_top_idx', movies.c.revenue.desc(), movies.c.rank)
+Index('movie_actors_actor_idx', movie_actors.c.actor)
+# Covers the movies of a genre, so filtering by genre never touches movie_genres itself.
+Index('movie_genres_genre_movie_idx', movie_genres.c.genre, movie_genres.c.movie)
+# The most reviewed movies are read from the start of this index.
+Index('movie_stats_reviews_idx', movie_stats.c.reviews.desc(), movie_stats.c.movie)
+
 
 def map_model_to_tables():
+    # Columns are mapped onto the name-mangled attributes that the domain classes' properties read from, so both
+    # objects loaded from the database and objects built through the constructors behave the same.
     mapper(User, users, properties={
-        'user_name': users.c.username,
-        'password': users.c.password,
-        'reviews': relationship(Review, backref='_user')
+        '_User__user_name': users.c.username,
+        '_User__password': users.c.password,
+        '_User__reviews': relationship(Review, backref='_Review__user')
     })
     mapper(Review, reviews, properties={
-        'review': reviews.c.review,
-        '_timestamp': reviews.c.timestamp
+        '_user_id': reviews.c.user,
+        '_movie_rank': reviews.c.movie,
+        '_Review__review': reviews.c.review,
+        '_Review__timestamp': reviews.c.timestamp
     })
     mapper(Movie, movies, properties={
-        'rank': movies.c.rank,
-        'title': movies.c.title,
-        'description': movies.c.description,
-        'director': movies.c.director,
-        'year': movies.c.year,
-        'runtime_minutes': movies.c.runtime,
-        'metascore': movies.c.metascore,
-        'rating': movies.c.rating,
-        'reviews': relationship(Review, backref='_movie')
+        '_Movie__rank': movies.c.rank,
+        '_Movie__title': movies.c.title,
+        '_Movie__description': movies.c.description,
+        '_Movie__director': movies.c.director,
+        '_Movie__year': movies.c.year,
+        '_Movie__runtime_minutes': movies.c.runtime,
+        '_Movie__metascore': movies.c.metascore,
+        '_Movie__rating': movies.c.rating,
+        '_Movie__votes': movies.c.votes,
+        '_Movie__revenue': movies.c.revenue,
+        '_Movie__actors': relationship(Actor, secondary=movie_actors),
+        '_Movie__genres': relationship(Genre, secondary=movie_genres),
+        '_Movie__reviews': relationship(Review, backref='_Review__movie')
+    })
+    mapper(Actor, actors, properties={
+        '_Actor__actor_full_name': actors.c.name
+    })
+    mapper(Genre, genres, properties={
+        '_Genre__genre_n': genres.c.name
     })
-
-
-
-
@@ -0,0 +1,103 @@
+"""Sorted indexes answering top-N queries on the memory repository.
+
+Each index keeps (value, -rank) keys in ascending order, so the best movies - highest value, then lowest rank - are at
+the end. New keys are insorted into an index that is already sorted; a batch of new keys, as when loading the
+catalogue, is sorted in once on the next query instead. The merge runs under a lock, as the first queries after a batch
+may come from several request threads at once.
+
+A filtered top-N either walks the index from the top, skipping movies outside the filter, or, when so few movies match
+that the walk would visit more movies than match, picks the best of the matches with a heap.
+"""
+import heapq
+import threading
+from bisect import insort
+
+from movie.adapters.csv_ingest import MISSING_VALUES
+from movie.adapters.facet_index import all_bitset_ranks, bitset_bytes, bitset_count
+
+# Up to this many keys waiting to be added are insorted one by one; more are merged with a sort.
+INSORT_LIMIT = 64
+
+
+def movie_value(movie, field):
+    """Returns the number a movie is ranked by on field, or None if it has none."""
+    if field == 'metascore':
+        # Metascores are kept as they appear in the CSV, where a missing one is blank or 'N/A'.
+        metascore = movie.metascore
+        if metascore is None or metascore in MISSING_VALUES:
+            return None
+        return int(metascore)
+    value = getattr(movie, field)
+    if value is None:
+        return None
+    return float(value) if field == 'rating' else value
+
+
+class RankingIndex:
+
+    def __init__(self, field):
+        self.__field = field
+        self.__keys = []
+        self.__pending = []
+        self.__values = dict()
+        self.__lock = threading.Lock()
+
+    def __getstate__(self):
+        # Locks cannot be pickled into repository snapshots; a fresh one is made on loading.
+        state = self.__dict__.copy()
+        del state['_RankingIndex__lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__lock = threading.Lock()
+
+    def add_movie(self, movie):
+        value = movie_value(movie, self.__field)
+        if value is not None:
+            with self.__lock:
+                self.__pending.append((value, -movie.rank))
+            self.__values[movie.rank] = value
+
+    def top(self, limit, matched=None):
+        """Returns the ranks of the best limit movies, best first, only considering those in the bitset matched."""
+        keys = self.__sorted_keys()
+        if matched is None:
+            return [-negative_rank for value, negative_rank in reversed(keys[-limit:])] if limit > 0 else []
+
+        number_matched = bitset_count(matched)
+        if number_matched == 0 or limit <= 0:
+            return []
+
+        # Walking from the top is expected to visit limit * len(keys) / number_matched keys, a heap of the matches
+        # visits number_matched. The walk is tried when it is expected to be shorter, and given up for the heap once it
+        # has visited as many keys as there are matches.
+        members = bitset_bytes(matched)
+        if number_matched * number_matched >= limit * len(keys):
+            ranks = []
+            for visited, (value, negative_rank) in enumerate(reversed(keys)):
+                if visited >= number_matched:
+                    break
+                rank = -negative_rank
+                if rank >> 3 < len(members) and members[rank >> 3] >> (rank & 7) & 1:
+                    ranks.append(rank)
+                    if len(ranks) == limit:
+                        return ranks
+            else:
+                return ranks
+
+        values = self.__values
+        candidates = ((values[rank], -rank) for rank in all_bitset_ranks(matched) if rank in values)
+        return [-negative_rank for value, negative_rank in heapq.nlargest(limit, candidates)]
+
+    def __sorted_keys(self):
+        if self.__pending:
+            with self.__lock:
+                if len(self.__pending) <= INSORT_LIMIT:
+                    for key in self.__pending:
+                        insort(self.__keys, key)
+                else:
+                    self.__keys.extend(self.__pending)
+                    self.__keys.sort()
+                self.__pending.clear()
+        return self.__keys
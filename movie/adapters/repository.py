@@ -1,9 +1,11 @@
 import abc
+from typing import NamedTuple, Optional, Tuple
 
 from movie.domain.movie import Movie
 from movie.domain.actor import Actor
 from movie.domain.genre import Genre
 from movie.domain.director import Director
+from movie.instrumentation import instrument_methods
 
 repo_instance = None
 
@@ -14,7 +16,50 @@ class RepositoryException(Exception):
         pass
 
 
+# Fields movies can be ranked by with get_top_movies.
+TOP_N_FIELDS = ('rating', 'metascore', 'votes', 'revenue')
+
+
+class MovieFilter(NamedTuple):
+    """Movies having every one of the genres, by the director, and within the (inclusive) year and rating bounds."""
+    genres: Tuple[str, ...] = ()
+    director: Optional[str] = None
+    min_year: Optional[int] = None
+    max_year: Optional[int] = None
+    min_rating: Optional[float] = None
+    max_rating: Optional[float] = None
+
+    def is_empty(self):
+        return self == MovieFilter()
+
+
+class Statistics(NamedTuple):
+    """Aggregates over a group of movies - the whole catalogue, a director's or a genre's - and their reviews."""
+    movies: int = 0
+    reviews: int = 0
+    rated_movies: int = 0
+    rating_total: float = 0.0
+    min_rating: Optional[float] = None
+    max_rating: Optional[float] = None
+    first_year: Optional[int] = None
+    last_year: Optional[int] = None
+
+    @property
+    def mean_rating(self):
+        return self.rating_total / self.rated_movies if self.rated_movies else None
+
+    @property
+    def reviews_per_movie(self):
+        return self.reviews / self.movies if self.movies else None
+
+
 class AbstractRepository(abc.ABC):
+
+    def __init_subclass__(cls, **kwargs):
+        # Calls to every repository implementation show up as spans when instrumentation is enabled.
+        super().__init_subclass__(**kwargs)
+        instrument_methods(cls)
+
     @abc.abstractmethod
     def add_actor(self, actor: Actor):
         raise NotImplementedError
@@ -59,6 +104,57 @@ class AbstractRepository(abc.ABC):
     def get_movie_by_rank(self):
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def get_movies_page(self, after_rank, limit):
+        # Returns up to limit Movies whose rank is greater than after_rank, in rank order.
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_movie_versions(self, after_rank, limit):
+        # Returns (rank, number of reviews, latest review timestamp or None) for the Movies get_movies_page would
+        # return. Whatever changes a movie's page changes its version.
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_movies_by_filter(self, movie_filter: MovieFilter, after_rank, limit):
+        # Returns up to limit Movies matching movie_filter whose rank is greater than after_rank, in rank order.
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_facet_counts(self, movie_filter: MovieFilter):
+        # Returns the number of Movies matching movie_filter, and for each of the genre, year and rating (in whole
+        # points) facets a dict of value -> number of those Movies, leaving out values with none.
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_top_movies(self, field, limit, movie_filter: MovieFilter = None):
+        # Returns the limit Movies with the highest value of field - one of 'rating', 'metascore', 'votes' and
+        # 'revenue' - among those matching movie_filter, best first; ties go to the better ranked movie. Movies without
+        # a value are left out.
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_statistics(self):
+        # Returns the Statistics of the whole catalogue. Statistics are kept up to date as movies and reviews are added,
+        # so reading them never visits every movie or review.
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_director_statistics(self, director):
+        # Returns the Statistics of the director's movies, or None if the director has none.
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_genre_statistics(self):
+        # Returns {genre name: Statistics of the movies having the genre}, the genres with most movies first.
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_most_reviewed_movies(self, limit):
+        # Returns the limit Movies with the most reviews, most first; ties go to the better ranked movie. Movies without
+        # reviews are left out.
+        raise NotImplementedError
+
     @abc.abstractmethod
     def get_rank_of_previous_movie(self):
         raise NotImplementedError
@@ -67,6 +163,11 @@ class AbstractRepository(abc.ABC):
     def get_rank_of_next_movie(self):
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def search_movies(self, query, limit=20):
+        # Returns up to limit Movies matching the free-text query, best match first.
+        raise NotImplementedError
+
     @abc.abstractmethod
     def add_user(self, user):
         raise NotImplementedError
@@ -82,6 +183,22 @@ class AbstractRepository(abc.ABC):
         if review.movie is None or review not in review.movie.reviews:
             raise RepositoryException('Comment not correctly attached to an Movie')
 
+    def add_reviews(self, reviews):
+        # Adds a batch of Reviews; repositories that can store them together override this.
+        for review in reviews:
+            self.add_review(review)
+
     @abc.abstractmethod
     def get_reviews(self):
         raise NotImplementedError
+
+    def reset_session(self):
+        # Repositories working in database sessions start a fresh one for each request and close it afterwards.
+        pass
+
+    def close_session(self):
+        pass
+
+    def attach(self, entity):
+        # Returns a domain object kept from an earlier session, such as a cached one, for use in the current session.
+        return entity
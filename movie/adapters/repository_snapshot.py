@@ -0,0 +1,101 @@
+"""Binary snapshots of a populated MemoryRepository, so worker processes can skip parsing the CSV files.
+
+File layout (all integers big-endian):
+
+    magic        8 bytes   b'MOVIEREP'
+    version      2 bytes   SNAPSHOT_VERSION; snapshots of any other version are ignored
+    source       32 bytes  SHA-256 fingerprint of the CSV files the repository was populated from
+    length       8 bytes   payload length
+    checksum     32 bytes  SHA-256 of the payload
+    payload      pickled MemoryRepository
+
+The file is memory-mapped when read, and the payload is checksummed and unpickled straight from the mapping.
+"""
+import hashlib
+import logging
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'MOVIEREP'
+# Bump whenever the domain classes or MemoryRepository change shape, or loading the data gives different contents, so
+# old snapshots are rebuilt.
+SNAPSHOT_VERSION = 7
+HEADER = struct.Struct('>8sH32sQ32s')
+
+SOURCE_FILES = ('Data1000Movies.csv', 'users.csv', 'reviews.csv')
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def source_fingerprint(data_path: str):
+    # Name, size and modification time of every source file; cheap to compute and changes whenever a file does.
+    digest = hashlib.sha256()
+    for name in SOURCE_FILES:
+        stat = os.stat(os.path.join(data_path, name))
+        digest.update(f'{name}:{stat.st_size}:{stat.st_mtime_ns};'.encode())
+    return digest.digest()
+
+
+def save(repo, filename: str, fingerprint: bytes):
+    payload = pickle.dumps(repo, protocol=pickle.HIGHEST_PROTOCOL)
+    header = HEADER.pack(MAGIC, SNAPSHOT_VERSION, fingerprint, len(payload), hashlib.sha256(payload).digest())
+
+    # Write to a temporary file and rename it into place so a concurrently starting worker never sees half a file.
+    directory = os.path.dirname(os.path.abspath(filename))
+    descriptor, temporary = tempfile.mkstemp(dir=directory, prefix='.snapshot-')
+    try:
+        with os.fdopen(descriptor, 'wb') as outfile:
+            outfile.write(header)
+            outfile.write(payload)
+        os.replace(temporary, filename)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def load(filename: str, fingerprint: bytes):
+    with open(filename, 'rb') as infile, mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+        if len(mapping) < HEADER.size:
+            raise SnapshotError('truncated header')
+        magic, version, source, length, checksum = HEADER.unpack_from(mapping)
+        if magic != MAGIC:
+            raise SnapshotError('not a repository snapshot')
+        if version != SNAPSHOT_VERSION:
+            raise SnapshotError(f'version {version}, expected {SNAPSHOT_VERSION}')
+        if source != fingerprint:
+            raise SnapshotError('source files have changed')
+        if len(mapping) != HEADER.size + length:
+            raise SnapshotError('truncated payload')
+
+        with memoryview(mapping)[HEADER.size:] as payload:
+            if hashlib.sha256(payload).digest() != checksum:
+                raise SnapshotError('checksum mismatch')
+            return pickle.loads(payload)
+
+
+def load_or_populate(filename: str, data_path: str, make_repository, populate):
+    """Returns the repository stored in the snapshot file, or populates a new one and snapshots it."""
+    start = time.perf_counter()
+    fingerprint = source_fingerprint(data_path)
+
+    if os.path.exists(filename):
+        try:
+            repo = load(filename, fingerprint)
+            logger.info('Loaded repository snapshot %s in %.3fs', filename, time.perf_counter() - start)
+            return repo
+        except (SnapshotError, pickle.UnpicklingError, AttributeError, EOFError, ValueError) as e:
+            logger.info('Ignoring repository snapshot %s: %s', filename, e)
+
+    repo = make_repository()
+    populate(data_path, repo)
+    save(repo, filename, fingerprint)
+    logger.info('Populated repository and wrote snapshot %s in %.3fs', filename, time.perf_counter() - start)
+    return repo
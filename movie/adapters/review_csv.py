@@ -0,0 +1,195 @@
+"""Streaming import and export of reviews as CSV, in the format of reviews.csv:
+
+    id,author-id,article-id,comment-text,timestamp
+
+The file is parsed in chunks, and authors and movies are resolved through lookup tables loaded once rather than a
+query per review. The database sink writes each chunk with one executemany and commits the whole import as a single
+transaction. From the command line, against an SQLite database file:
+
+    python -m movie.adapters.review_csv import movies.db reviews.csv [--reject-profanity]
+    python -m movie.adapters.review_csv export movies.db reviews.csv
+"""
+import argparse
+import csv
+import logging
+import sys
+import time
+from datetime import datetime
+from itertools import islice
+from typing import NamedTuple
+
+from movie.adapters.csv_ingest import BATCH_SIZE
+from movie.domain.review import make_review
+
+logger = logging.getLogger(__name__)
+
+HEADER = ['id', 'author-id', 'article-id', 'comment-text', 'timestamp']
+
+
+class ReviewRecord(NamedTuple):
+    id: str
+    user_id: str
+    movie_rank: int
+    review_text: str
+    timestamp: datetime
+
+
+def read_review_records(filename: str):
+    # Streams reviews.csv-formatted rows; review texts may span several lines.
+    with open(filename, mode='r', encoding='utf-8-sig', newline='') as infile:
+        reader = csv.reader(infile)
+
+        # Skip the header line.
+        next(reader)
+
+        for row in reader:
+            if not row:
+                continue
+            row = [item.strip() for item in row]
+            yield ReviewRecord(
+                id=row[0],
+                user_id=row[1],
+                movie_rank=int(row[2]),
+                review_text=row[3],
+                timestamp=datetime.fromisoformat(row[4])
+            )
+
+
+def ingest_reviews(filename: str, sink, matcher=None, chunk_size=BATCH_SIZE, progress=None):
+    """Parses the review CSV in chunks, feeding each record to sink, and returns (added, skipped).
+
+    With a ProfanityMatcher, reviews containing profanity are skipped. progress(rows read, seconds elapsed) is called
+    after each chunk.
+    """
+    start = time.perf_counter()
+    records = read_review_records(filename)
+    read = skipped = 0
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            break
+        read += len(chunk)
+        if matcher is not None:
+            profane = matcher.check_many(record.review_text for record in chunk)
+            skipped += sum(profane)
+            chunk = [record for record, is_profane in zip(chunk, profane) if not is_profane]
+        for record in chunk:
+            if not sink.add(record):
+                skipped += 1
+        sink.flush()
+        if progress is not None:
+            progress(read, time.perf_counter() - start)
+    sink.close()
+
+    elapsed = time.perf_counter() - start
+    logger.info('Ingested %d reviews from %s in %.2fs (%.0f rows/s), skipped %d', read - skipped, filename, elapsed,
+                read / elapsed if elapsed > 0 else float('inf'), skipped)
+    return read - skipped, skipped
+
+
+class MemoryReviewSink:
+    """Adds reviews to a MemoryRepository, resolving authors through the id -> User table load_users returns."""
+
+    def __init__(self, repo, users):
+        self.__repo = repo
+        self.__users = users
+        self.__reviews = []
+
+    def add(self, record: ReviewRecord):
+        user = self.__users.get(record.user_id)
+        movie = self.__repo.get_movie(record.movie_rank)
+        if user is None or movie is None:
+            return False
+        self.__reviews.append(make_review(record.review_text, user, movie, record.timestamp))
+        return True
+
+    def flush(self):
+        self.__repo.add_reviews(self.__reviews)
+        self.__reviews.clear()
+
+    def close(self):
+        self.flush()
+
+
+class DatabaseReviewSink:
+    """Inserts reviews through a DB-API connection in batches, as one transaction committed by close().
+
+    The ids of every user and movie are loaded up front; reviews by unknown users or of unknown movies are skipped.
+    Reviews get new ids, so a file can be imported into a database that already has reviews.
+    """
+
+    def __init__(self, conn):
+        self.__conn = conn
+        self.__cursor = conn.cursor()
+        self.__cursor.execute("SELECT id FROM users")
+        self.__user_ids = {str(user_id) for user_id, in self.__cursor.fetchall()}
+        self.__cursor.execute("SELECT rank FROM movies")
+        self.__movie_ranks = {rank for rank, in self.__cursor.fetchall()}
+        self.__rows = []
+
+    def add(self, record: ReviewRecord):
+        if record.user_id not in self.__user_ids or record.movie_rank not in self.__movie_ranks:
+            return False
+        # Stored as SQLAlchemy's DateTime type stores timestamps on SQLite.
+        self.__rows.append((int(record.user_id), record.movie_rank, record.review_text,
+                            record.timestamp.isoformat(' ')))
+        return True
+
+    def flush(self):
+        self.__cursor.executemany(
+            "INSERT INTO reviews (user, movie, review, timestamp) VALUES (?, ?, ?, ?)", self.__rows)
+        self.__rows.clear()
+
+    def close(self):
+        self.flush()
+        self.__conn.commit()
+
+
+def export_reviews(conn, filename: str, chunk_size=BATCH_SIZE, progress=None):
+    """Writes every review in the database to a CSV file, streaming chunk_size rows at a time. Returns the count."""
+    start = time.perf_counter()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, user, movie, review, timestamp FROM reviews ORDER BY id")
+    count = 0
+    with open(filename, 'w', encoding='utf-8', newline='') as outfile:
+        writer = csv.writer(outfile, lineterminator='\n')
+        writer.writerow(HEADER)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            writer.writerows(rows)
+            count += len(rows)
+            if progress is not None:
+                progress(count, time.perf_counter() - start)
+
+    logger.info('Exported %d reviews to %s in %.2fs', count, filename, time.perf_counter() - start)
+    return count
+
+
+def report_progress(rows, elapsed):
+    print(f'\r{rows} reviews, {rows / elapsed if elapsed > 0 else 0:.0f} rows/s', end='', file=sys.stderr, flush=True)
+
+
+if __name__ == '__main__':
+    import sqlite3
+
+    from movie.movies.profanity_filter import create_profanity_matcher
+
+    parser = argparse.ArgumentParser(prog='python -m movie.adapters.review_csv')
+    parser.add_argument('command', choices=['import', 'export'])
+    parser.add_argument('database', help='SQLite database file, or an sqlite:/// URI')
+    parser.add_argument('file', help='reviews CSV file')
+    parser.add_argument('--reject-profanity', action='store_true', help='skip reviews containing profanity')
+    arguments = parser.parse_args()
+
+    connection = sqlite3.connect(arguments.database.replace('sqlite:///', '', 1))
+    if arguments.command == 'import':
+        matcher = create_profanity_matcher({}) if arguments.reject_profanity else None
+        added, skipped = ingest_reviews(arguments.file, DatabaseReviewSink(connection), matcher,
+                                        progress=report_progress)
+        print(f'\nImported {added} reviews from {arguments.file}, skipped {skipped}')
+    else:
+        exported = export_reviews(connection, arguments.file, progress=report_progress)
+        print(f'\nExported {exported} reviews to {arguments.file}')
+    connection.close()
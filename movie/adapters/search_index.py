@@ -0,0 +1,91 @@
+import heapq
+import math
+import re
+import unicodedata
+from collections import defaultdict
+
+# Tokens are runs of Unicode letters and digits, as for SQLite's unicode61 tokenizer; underscores separate them.
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+# Title matches count for more than description matches.
+TITLE_WEIGHT = 2
+
+
+def fold(text):
+    # Lower case without diacritics, as unicode61 with remove_diacritics 2 folds text, so 'Monáe' matches 'monae'.
+    return ''.join(c for c in unicodedata.normalize('NFD', text.lower()) if not unicodedata.combining(c))
+
+
+def tokenize(text):
+    if not text:
+        return []
+    return TOKEN_PATTERN.findall(fold(text))
+
+
+def term_frequencies(title, description):
+    frequencies = defaultdict(int)
+    for term in tokenize(title):
+        frequencies[term] += TITLE_WEIGHT
+    for term in tokenize(description):
+        frequencies[term] += 1
+    return frequencies
+
+
+class SearchIndex:
+    """In-process inverted index over movie titles and descriptions, scored with Okapi BM25."""
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.__k1 = k1
+        self.__b = b
+        # term -> {document id: weighted term frequency}
+        self.__postings = defaultdict(dict)
+        self.__document_lengths = dict()
+        self.__total_length = 0
+
+    def __len__(self):
+        return len(self.__document_lengths)
+
+    def add_document(self, document_id, title, description):
+        """Indexes a document; one with the same id must be removed first."""
+        if document_id in self.__document_lengths:
+            raise ValueError(f'Document {document_id} is already indexed')
+        frequencies = term_frequencies(title, description)
+        for term, frequency in frequencies.items():
+            self.__postings[term][document_id] = frequency
+
+        length = sum(frequencies.values())
+        self.__document_lengths[document_id] = length
+        self.__total_length += length
+
+    def remove_document(self, document_id, title, description):
+        """Removes a document, given the title and description it was indexed with."""
+        length = self.__document_lengths.pop(document_id, None)
+        if length is None:
+            return
+        self.__total_length -= length
+        # Tokenizing the document again finds its postings without keeping its terms or scanning the vocabulary.
+        for term in term_frequencies(title, description):
+            posting = self.__postings[term]
+            del posting[document_id]
+            if not posting:
+                del self.__postings[term]
+
+    def search(self, query, limit=20):
+        number_of_documents = len(self.__document_lengths)
+        if number_of_documents == 0:
+            return []
+        average_length = self.__total_length / number_of_documents
+
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            posting = self.__postings.get(term)
+            if not posting:
+                continue
+            document_frequency = len(posting)
+            idf = math.log(1 + (number_of_documents - document_frequency + 0.5) / (document_frequency + 0.5))
+            for document_id, frequency in posting.items():
+                length_norm = 1 - self.__b + self.__b * self.__document_lengths[document_id] / average_length
+                scores[document_id] += idf * frequency * (self.__k1 + 1) / (frequency + self.__k1 * length_norm)
+
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [document_id for document_id, score in best]
@@ -0,0 +1,113 @@
+"""Aggregate statistics of the memory repository, kept up to date as movies and reviews are added.
+
+The catalogue, every director and every genre have an Aggregate of counts, sums and bounds, updated in constant time
+by each movie and review added to them; means are worked out from the sums when asked for. Movies are also grouped by
+their number of reviews, the distinct numbers kept sorted, so the most reviewed movies are read off from the top group
+down and a review moves its movie up one group.
+"""
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+from movie.adapters.ranking_index import movie_value
+from movie.adapters.repository import Statistics
+
+
+class Aggregate:
+    __slots__ = ('movies', 'reviews', 'rated_movies', 'rating_total', 'min_rating', 'max_rating', 'first_year',
+                 'last_year')
+
+    def __init__(self):
+        self.movies = 0
+        self.reviews = 0
+        self.rated_movies = 0
+        self.rating_total = 0.0
+        self.min_rating = None
+        self.max_rating = None
+        self.first_year = None
+        self.last_year = None
+
+    def add_movie(self, rating, year, reviews):
+        self.movies += 1
+        self.reviews += reviews
+        if rating is not None:
+            self.rated_movies += 1
+            self.rating_total += rating
+            self.min_rating = rating if self.min_rating is None else min(self.min_rating, rating)
+            self.max_rating = rating if self.max_rating is None else max(self.max_rating, rating)
+        if year is not None:
+            self.first_year = year if self.first_year is None else min(self.first_year, year)
+            self.last_year = year if self.last_year is None else max(self.last_year, year)
+
+    def statistics(self):
+        return Statistics(*(getattr(self, field) for field in self.__slots__))
+
+
+def director_name(movie):
+    # Movies loaded from the CSV files have the director's name; others may have a Director.
+    return getattr(movie.director, 'director_full_name', movie.director)
+
+
+class StatisticsIndex:
+
+    def __init__(self):
+        self.__catalogue = Aggregate()
+        self.__directors = defaultdict(Aggregate)
+        self.__genres = defaultdict(Aggregate)
+        # rank -> number of reviews, and number of reviews -> sorted ranks of the movies having that many
+        self.__review_counts = dict()
+        self.__ranks_by_count = defaultdict(list)
+        # Sorted distinct numbers of reviews that some movie has.
+        self.__counts = []
+
+    def __aggregates(self, movie):
+        yield self.__catalogue
+        if movie.director is not None:
+            yield self.__directors[director_name(movie)]
+        for genre in movie.genres:
+            yield self.__genres[genre.genre_name]
+
+    def add_movie(self, movie):
+        rating, reviews = movie_value(movie, 'rating'), movie.number_of_reviews
+        for aggregate in self.__aggregates(movie):
+            aggregate.add_movie(rating, movie.year, reviews)
+        for _ in range(reviews):
+            self.__count_review(movie.rank)
+
+    def add_review(self, review):
+        for aggregate in self.__aggregates(review.movie):
+            aggregate.reviews += 1
+        self.__count_review(review.movie.rank)
+
+    def __count_review(self, rank):
+        count = self.__review_counts.get(rank, 0)
+        if count:
+            ranks = self.__ranks_by_count[count]
+            del ranks[bisect_left(ranks, rank)]
+            if not ranks:
+                del self.__ranks_by_count[count]
+                del self.__counts[bisect_left(self.__counts, count)]
+        count += 1
+        self.__review_counts[rank] = count
+        if count not in self.__ranks_by_count:
+            insort(self.__counts, count)
+        insort(self.__ranks_by_count[count], rank)
+
+    def statistics(self):
+        return self.__catalogue.statistics()
+
+    def director_statistics(self, director):
+        aggregate = self.__directors.get(director)
+        return aggregate.statistics() if aggregate is not None else None
+
+    def genre_statistics(self):
+        genres = sorted(self.__genres.items(), key=lambda item: (-item[1].movies, item[0]))
+        return {genre: aggregate.statistics() for genre, aggregate in genres}
+
+    def most_reviewed(self, limit):
+        """Returns the ranks of the limit movies with the most reviews, most first and then by rank."""
+        ranks = []
+        for count in reversed(self.__counts):
+            if len(ranks) >= limit:
+                break
+            ranks.extend(self.__ranks_by_count[count][:limit - len(ranks)])
+        return ranks
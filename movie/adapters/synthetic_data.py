@@ -0,0 +1,216 @@
+"""Deterministic synthetic datasets for scale testing.
+
+Writes Data1000Movies.csv, users.csv and reviews.csv, in the formats the repositories load, to a directory that can be
+used as the data path of either repository or given to flask db load --data-path. Rows are generated and written one at
+a time, so datasets of tens of millions of rows take no more memory than small ones.
+
+The data is skewed the way real catalogues are: genres are as common as in the bundled catalogue, a few directors and
+actors make many movies, and reviews follow a Zipf distribution over movies - the best ranked get most of them - and
+over users. Every user's password is DEFAULT_PASSWORD. The same seed and counts always give the same files.
+
+    python -m movie.adapters.synthetic_data data/large --movies 1000000 --users 100000 --reviews 10000000
+"""
+import argparse
+import csv
+import hashlib
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+# Genres weighted by how many movies of the bundled catalogue have them, and how many genres those movies have.
+GENRE_WEIGHTS = {
+    'Drama': 513, 'Action': 303, 'Comedy': 279, 'Adventure': 259, 'Thriller': 195, 'Crime': 150, 'Romance': 141,
+    'Sci-Fi': 120, 'Horror': 119, 'Mystery': 106, 'Fantasy': 101, 'Biography': 81, 'Family': 51, 'Animation': 49,
+    'History': 29, 'Sport': 18, 'Music': 16, 'War': 13, 'Western': 7, 'Musical': 5,
+}
+GENRES_PER_MOVIE_WEIGHTS = {1: 105, 2: 235, 3: 660}
+ACTORS_PER_MOVIE = 4
+FIRST_YEAR, LAST_YEAR = 2006, 2016
+# Shares of movies whose revenue or metascore is 'N/A', as in the bundled catalogue.
+MISSING_REVENUE, MISSING_METASCORE = 0.128, 0.064
+
+FIRST_NAMES = (
+    'Ava', 'Ben', 'Chloe', 'Dev', 'Elena', 'Farid', 'Grace', 'Hiro', 'Ines', 'Jonah', 'Kemi', 'Liam', 'Maya', 'Nils',
+    'Olga', 'Pedro', 'Quinn', 'Rosa', 'Sami', 'Tara', 'Umar', 'Vera', 'Wes', 'Xiu', 'Yara', 'Zane',
+)
+LAST_NAMES = (
+    'Abbott', 'Baptiste', 'Chen', 'Dubois', 'Eriksen', 'Fischer', 'Garcia', 'Haddad', 'Ivanova', 'Jensen', 'Kowalski',
+    'Lindqvist', 'Moreno', 'Nakamura', 'Okafor', 'Petrov', 'Quispe', 'Rossi', 'Silva', 'Tanaka', 'Usman', 'Varga',
+    'Walsh', 'Xu', 'Yilmaz', 'Zielinski',
+)
+ADJECTIVES = (
+    'Silent', 'Broken', 'Last', 'Hidden', 'Golden', 'Dark', 'Lost', 'Frozen', 'Wild', 'Crimson', 'Distant', 'Final',
+    'Hollow', 'Electric', 'Secret', 'Burning', 'Quiet', 'Savage', 'Bright', 'Endless',
+)
+NOUNS = (
+    'Harbor', 'Kingdom', 'Signal', 'Garden', 'Frontier', 'Mirror', 'River', 'Empire', 'Witness', 'Machine', 'Island',
+    'Promise', 'Storm', 'Orbit', 'Station', 'Legacy', 'Winter', 'Circle', 'Voyage', 'Shadow',
+)
+VERBS = ('uncover', 'escape', 'protect', 'rebuild', 'outwit', 'survive', 'find', 'stop', 'win back', 'expose')
+OPINIONS = (
+    'An absolute triumph from start to finish.',
+    'The pacing drags in the middle, but the ending makes up for it.',
+    'I expected more, to be honest.',
+    'Beautifully shot, with a score that stays with you.',
+    'The "twist" was obvious from the first ten minutes.',
+    'Great performances all round; the {noun} scenes are the highlight.',
+    'Not for everyone, but I loved it.',
+    'Far too long, and the dialogue is clumsy.',
+    'A {adjective} take on a familiar story.',
+    'Would watch again, probably with friends.',
+)
+
+DEFAULT_PASSWORD = 'Synthetic1'
+PASSWORD_ITERATIONS = 150000
+FIRST_TIMESTAMP = datetime(2020, 1, 1)
+# Mean seconds between consecutive reviews.
+REVIEW_INTERVAL = 60
+
+
+def zipf_index(rng, n, exponent):
+    """Returns an index in [0, n), 0 the most likely, drawn from a continuous approximation of a Zipf distribution.
+
+    Sampling inverts the distribution's cumulative function, so it takes constant time and memory whatever n is.
+    """
+    u = rng.random()
+    if exponent == 1:
+        x = (n + 1) ** u
+    else:
+        a = 1 - exponent
+        x = (((n + 1) ** a - 1) * u + 1) ** (1 / a)
+    return min(int(x) - 1, n - 1)
+
+
+def person_name(index):
+    # Distinct for every index; once the first and last names run out, a number tells people apart.
+    first = FIRST_NAMES[index % len(FIRST_NAMES)]
+    last = LAST_NAMES[index // len(FIRST_NAMES) % len(LAST_NAMES)]
+    generation = index // (len(FIRST_NAMES) * len(LAST_NAMES))
+    return f'{first} {last}' if generation == 0 else f'{first} {last} {generation + 1}'
+
+
+def password_hash(password, seed):
+    # A pbkdf2 hash as werkzeug's generate_password_hash makes it, but with a salt derived from the seed rather than a
+    # random one, so that the output is reproducible.
+    salt = hashlib.sha256(f'{seed}'.encode()).hexdigest()[:8]
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), PASSWORD_ITERATIONS)
+    return f'pbkdf2:sha256:{PASSWORD_ITERATIONS}${salt}${digest.hex()}'
+
+
+def movie_rows(number_of_movies, seed=0):
+    rng = random.Random(f'{seed}-movies')
+    # Cumulative weights spare choices() from summing the weights on every call.
+    genres, genre_weights = list(GENRE_WEIGHTS), list(accumulate(GENRE_WEIGHTS.values()))
+    counts, count_weights = list(GENRES_PER_MOVIE_WEIGHTS), list(accumulate(GENRES_PER_MOVIE_WEIGHTS.values()))
+    # Pools about the size of the bundled catalogue's, relative to the number of movies.
+    directors = max(number_of_movies * 2 // 3, 1)
+    actors = max(number_of_movies * 2, ACTORS_PER_MOVIE)
+
+    for rank in range(1, number_of_movies + 1):
+        number_of_genres = rng.choices(counts, cum_weights=count_weights)[0]
+        movie_genres = []
+        while len(movie_genres) < number_of_genres:
+            genre = rng.choices(genres, cum_weights=genre_weights)[0]
+            if genre not in movie_genres:
+                movie_genres.append(genre)
+        movie_actors = []
+        while len(movie_actors) < ACTORS_PER_MOVIE:
+            actor = person_name(zipf_index(rng, actors, 0.6))
+            if actor not in movie_actors:
+                movie_actors.append(actor)
+        adjective, noun = rng.choice(ADJECTIVES), rng.choice(NOUNS)
+        rating = min(max(rng.gauss(6.72, 0.95), 1.9), 9.0)
+
+        yield [
+            rank,
+            f'The {adjective} {noun}' if rng.random() < 0.5 else f'{adjective} {noun}',
+            ','.join(movie_genres),
+            f'A {adjective.lower()} {rng.choice(NOUNS).lower()} must {rng.choice(VERBS)} the {noun.lower()} '
+            f'before the {rng.choice(NOUNS).lower()} falls.',
+            person_name(zipf_index(rng, directors, 0.6)),
+            ', '.join(movie_actors),
+            rng.randint(FIRST_YEAR, LAST_YEAR),
+            int(min(max(rng.gauss(113, 19), 66), 191)),
+            f'{rating:.1f}',
+            int(rng.lognormvariate(11.6, 1.4)) + 1,
+            'N/A' if rng.random() < MISSING_REVENUE else f'{rng.lognormvariate(3.8, 1.5):.2f}',
+            'N/A' if rng.random() < MISSING_METASCORE else int(min(max(rng.gauss(59, 17), 11), 100)),
+        ]
+
+
+def user_rows(number_of_users, seed=0):
+    hashed = password_hash(DEFAULT_PASSWORD, seed)
+    for user_id in range(1, number_of_users + 1):
+        yield [user_id, f'{FIRST_NAMES[user_id % len(FIRST_NAMES)].lower()}{user_id}', hashed]
+
+
+def review_rows(number_of_reviews, number_of_movies, number_of_users, seed=0, movie_skew=1.0, user_skew=1.0):
+    rng = random.Random(f'{seed}-reviews')
+    # Every sentence a review can have, filled in once rather than for each review. Each opinion is filled in with every
+    # noun and adjective, even those it does not use, so that all opinions stay equally likely.
+    sentences = [opinion.format(noun=noun.lower(), adjective=adjective.lower())
+                 for opinion in OPINIONS for noun in NOUNS for adjective in ADJECTIVES]
+    timestamp = FIRST_TIMESTAMP
+    for review_id in range(1, number_of_reviews + 1):
+        # Some reviews run to several paragraphs, as the bundled ones do.
+        separator = '\n\n' if rng.random() < 0.1 else ' '
+        timestamp += timedelta(seconds=int(rng.expovariate(1 / REVIEW_INTERVAL)))
+        yield [
+            review_id,
+            zipf_index(rng, number_of_users, user_skew) + 1,
+            zipf_index(rng, number_of_movies, movie_skew) + 1,
+            separator.join(rng.choices(sentences, k=1 + int(rng.random() * 4))),
+            timestamp.isoformat(' '),
+        ]
+
+
+def write_csv(filename, header, rows):
+    count = 0
+    with open(filename, 'w', encoding='utf-8', newline='') as outfile:
+        writer = csv.writer(outfile, lineterminator='\n')
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def generate(directory, number_of_movies, number_of_users, number_of_reviews, seed=0, movie_skew=1.0,
+             user_skew=1.0):
+    """Writes the three CSV files to directory and returns the number of rows written to each."""
+    if number_of_reviews and not (number_of_movies and number_of_users):
+        raise ValueError('Reviews need at least one movie and one user')
+    os.makedirs(directory, exist_ok=True)
+    return {
+        'movies': write_csv(os.path.join(directory, 'Data1000Movies.csv'), [
+            'Rank', 'Title', 'Genre', 'Description', 'Director', 'Actors', 'Year', 'Runtime (Minutes)', 'Rating',
+            'Votes', 'Revenue (Millions)', 'Metascore'], movie_rows(number_of_movies, seed)),
+        'users': write_csv(os.path.join(directory, 'users.csv'), ['id', 'username', 'password_hash'],
+                           user_rows(number_of_users, seed)),
+        'reviews': write_csv(os.path.join(directory, 'reviews.csv'),
+                             ['id', 'author-id', 'article-id', 'comment-text', 'timestamp'],
+                             review_rows(number_of_reviews, number_of_movies, number_of_users, seed, movie_skew,
+                                         user_skew)),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='python -m movie.adapters.synthetic_data')
+    parser.add_argument('directory', help='directory to write Data1000Movies.csv, users.csv and reviews.csv to')
+    parser.add_argument('--movies', type=int, default=100_000)
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--reviews', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--movie-skew', type=float, default=1.0, help='Zipf exponent of reviews over movies')
+    parser.add_argument('--user-skew', type=float, default=1.0, help='Zipf exponent of reviews over users')
+    arguments = parser.parse_args()
+
+    start = time.perf_counter()
+    written = generate(arguments.directory, arguments.movies, arguments.users, arguments.reviews, arguments.seed,
+                       arguments.movie_skew, arguments.user_skew)
+    elapsed = time.perf_counter() - start
+    print(f"Wrote {written['movies']} movies, {written['users']} users and {written['reviews']} reviews to "
+          f"{arguments.directory} in {elapsed:.1f}s ({sum(written.values()) / elapsed:.0f} rows/s); "
+          f"every password is {DEFAULT_PASSWORD}")
@@ -0,0 +1,83 @@
+"""Seed users from users.csv.
+
+Two formats are accepted, told apart by the header of the last column:
+
+    id,username,password_hash    credentials already hashed with werkzeug's generate_password_hash
+    id,username,password         plaintext passwords, hashed while loading
+
+Pre-hashed files load without any hashing. Convert a plaintext file once, offline, with
+
+    python -m movie.adapters.user_seed plaintext_users.csv hashed_users.csv
+"""
+import csv
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import generate_password_hash
+
+logger = logging.getLogger(__name__)
+
+HASHED_HEADER = 'password_hash'
+PLAINTEXT_HEADER = 'password'
+
+# Below this many plaintext passwords the cost of starting worker processes outweighs hashing in parallel.
+PARALLEL_HASH_THRESHOLD = 32
+
+
+def read_rows(filename: str):
+    with open(filename, encoding='utf-8-sig', newline='') as infile:
+        reader = csv.reader(infile)
+        header = [item.strip() for item in next(reader)]
+        rows = [[item.strip() for item in row] for row in reader if row]
+    return header, rows
+
+
+def hash_passwords(passwords, max_workers=None):
+    workers = max_workers or os.cpu_count() or 1
+    if workers == 1 or len(passwords) < PARALLEL_HASH_THRESHOLD:
+        return [generate_password_hash(password) for password in passwords]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunksize = max(1, len(passwords) // (workers * 4))
+        return list(executor.map(generate_password_hash, passwords, chunksize=chunksize))
+
+
+def load_user_records(filename: str):
+    """Returns (id, username, password_hash) tuples for every user in the seed file."""
+    start = time.perf_counter()
+    header, rows = read_rows(filename)
+
+    if header[2] == HASHED_HEADER:
+        records = [(row[0], row[1], row[2]) for row in rows]
+        how = 'pre-hashed'
+    elif header[2] == PLAINTEXT_HEADER:
+        password_hashes = hash_passwords([row[2] for row in rows])
+        records = [(row[0], row[1], password_hash) for row, password_hash in zip(rows, password_hashes)]
+        how = 'hashed plaintext'
+    else:
+        raise ValueError(f'{filename}: expected a {HASHED_HEADER!r} or {PLAINTEXT_HEADER!r} column, got {header[2]!r}')
+
+    logger.info('Loaded %d seed users (%s) from %s in %.3fs', len(records), how, filename,
+                time.perf_counter() - start)
+    return records
+
+
+def convert_seed_file(source: str, destination: str):
+    """Writes a pre-hashed copy of a seed file, hashing plaintext passwords in parallel."""
+    records = load_user_records(source)
+    with open(destination, 'w', encoding='utf-8', newline='') as outfile:
+        writer = csv.writer(outfile, lineterminator='\n')
+        writer.writerow(['id', 'username', HASHED_HEADER])
+        writer.writerows(records)
+    return len(records)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        sys.exit('usage: python -m movie.adapters.user_seed SOURCE.csv DESTINATION.csv')
+    if os.path.abspath(sys.argv[1]) == os.path.abspath(sys.argv[2]):
+        sys.exit('SOURCE and DESTINATION must be different files')
+    print(f'Wrote {convert_seed_file(sys.argv[1], sys.argv[2])} pre-hashed users to {sys.argv[2]}')
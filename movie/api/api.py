@@ -0,0 +1,91 @@
+from flask import Blueprint, Response, request, url_for, current_app, abort
+
+import movie.adapters.repository as repo
+import movie.movies.services as services
+from movie.api import encoders
+
+# Configure Blueprint.
+api_blueprint = Blueprint(
+    'api_bp', __name__, url_prefix='/api/v1')
+
+# Reviews can be long and many, so they are only serialized when asked for with ?fields=...,reviews
+DEFAULT_FIELDS = services.SUMMARY_FIELDS
+
+
+@api_blueprint.route('/movies', methods=['GET'])
+def movies():
+    mimetype = response_mimetype()
+    fields = requested_fields()
+    after_rank = request.args.get('after', 0, type=int)
+    limit = request.args.get('limit', current_app.config['API_MOVIES_PER_PAGE'], type=int)
+    limit = max(1, min(limit, current_app.config['API_MAX_MOVIES_PER_PAGE']))
+
+    movies, next_rank = services.get_movies_page(after_rank, limit, repo.repo_instance, fields)
+
+    next_url = None
+    if next_rank is not None:
+        next_url = url_for('api_bp.movies', after=next_rank - 1, limit=limit, fields=request.args.get('fields'))
+    return Response(encoders.encode_listing(mimetype, 'movies', movies, {'next': next_url}), mimetype=mimetype)
+
+
+@api_blueprint.route('/movies/<int:rank>', methods=['GET'])
+def movie(rank):
+    mimetype = response_mimetype()
+    fields = requested_fields()
+    try:
+        movie = services.get_movie(rank, repo.repo_instance, fields)
+    except services.NonExistentArticleException:
+        return error(404, f'No movie with rank {rank}')
+    return Response(encoders.encode(mimetype, movie), mimetype=mimetype)
+
+
+@api_blueprint.route('/movies/<int:rank>/reviews', methods=['GET'])
+def reviews(rank):
+    mimetype = response_mimetype()
+    try:
+        reviews = services.get_review_for_movie(rank, repo.repo_instance)
+    except services.NonExistentArticleException:
+        return error(404, f'No movie with rank {rank}')
+    return Response(encoders.encode_listing(mimetype, 'reviews', reviews, {}), mimetype=mimetype)
+
+
+@api_blueprint.route('/stats', methods=['GET'])
+def stats():
+    mimetype = response_mimetype()
+    limit = request.args.get('limit', current_app.config['TOP_MOVIES'], type=int)
+    limit = max(1, min(limit, current_app.config['MAX_TOP_MOVIES']))
+    return Response(encoders.encode(mimetype, services.get_statistics(limit, repo.repo_instance)), mimetype=mimetype)
+
+
+@api_blueprint.route('/stats/directors/<path:director>', methods=['GET'])
+def director_stats(director):
+    mimetype = response_mimetype()
+    limit = request.args.get('limit', current_app.config['API_MOVIES_PER_PAGE'], type=int)
+    limit = max(1, min(limit, current_app.config['API_MAX_MOVIES_PER_PAGE']))
+    try:
+        statistics, movies = services.get_director_statistics(director, limit, repo.repo_instance)
+    except services.UnknownDirectorException:
+        return error(404, f'No movies directed by {director}')
+    return Response(encoders.encode(mimetype, {'director': director, 'statistics': statistics, 'movies': movies}),
+                    mimetype=mimetype)
+
+
+def response_mimetype():
+    mimetype = encoders.negotiate(request.accept_mimetypes)
+    if mimetype is None:
+        abort(error(406, 'Acceptable types: ' + ', '.join(encoders.available_mimetypes())))
+    return mimetype
+
+
+def requested_fields():
+    if 'fields' not in request.args:
+        return DEFAULT_FIELDS
+    fields = tuple(field.strip() for field in request.args['fields'].split(',') if field.strip())
+    unknown = [field for field in fields if field not in services.MOVIE_FIELD_GETTERS]
+    if unknown or not fields:
+        abort(error(400, 'Unknown fields: ' + ', '.join(unknown) if unknown else 'No fields requested'))
+    return fields
+
+
+def error(status, message):
+    return Response(encoders.dumps_json({'error': message}), status=status, mimetype=encoders.JSON)
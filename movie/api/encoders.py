@@ -0,0 +1,74 @@
+"""Response encoders for the JSON API, chosen by content negotiation.
+
+JSON is always available and uses orjson when it is installed; MessagePack is offered only when msgpack is installed.
+Listings are encoded one item at a time and streamed, so a long page is never held as a single encoded string.
+"""
+import json
+from datetime import date, datetime
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+
+
+def serialize_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not serializable')
+
+
+def available_mimetypes():
+    if msgpack is None:
+        return [JSON]
+    return [JSON, MSGPACK]
+
+
+def negotiate(accept_mimetypes):
+    """Returns the best encoder mimetype for an Accept header, JSON when none is given, or None if none is acceptable."""
+    if not accept_mimetypes:
+        return JSON
+    return accept_mimetypes.best_match(available_mimetypes())
+
+
+def dumps_json(value):
+    if orjson is not None:
+        return orjson.dumps(value, default=serialize_value)
+    return json.dumps(value, default=serialize_value, separators=(',', ':')).encode('utf-8')
+
+
+def encode(mimetype, value):
+    if mimetype == MSGPACK:
+        return msgpack.packb(value, default=serialize_value, use_bin_type=True)
+    return dumps_json(value)
+
+
+def encode_listing(mimetype, name, items, extra):
+    """Yields {name: [items...], **extra} encoded in chunks, one item per chunk."""
+    if mimetype == MSGPACK:
+        packer = msgpack.Packer(default=serialize_value, use_bin_type=True)
+        items = list(items)
+        yield packer.pack_map_header(1 + len(extra)) + packer.pack(name) + packer.pack_array_header(len(items))
+        for item in items:
+            yield packer.pack(item)
+        for key, value in extra.items():
+            yield packer.pack(key) + packer.pack(value)
+        return
+
+    yield b'{' + dumps_json(name) + b':['
+    separator = b''
+    for item in items:
+        yield separator + dumps_json(item)
+        separator = b','
+    yield b']'
+    for key, value in extra.items():
+        yield b',' + dumps_json(key) + b':' + dumps_json(value)
+    yield b'}'
@@ -2,6 +2,7 @@ from werkzeug.security import generate_password_hash, check_password_hash
 
 from movie.adapters.repository import AbstractRepository
 from movie.domain.user import User
+from movie.instrumentation import span, timed
 
 
 class NameNotUniqueException(Exception):
@@ -16,12 +17,14 @@ class AuthenticationException(Exception):
     pass
 
 
+@timed
 def add_user(username: str, password: str, repo: AbstractRepository):
     user = repo.get_user(username)
     if user is not None:
         raise NameNotUniqueException
 
-    password_hash = generate_password_hash(password)
+    with span('authentication.generate_password_hash'):
+        password_hash = generate_password_hash(password)
 
     user = User(username, password_hash)
     repo.add_user(user)
@@ -35,12 +38,14 @@ def get_user(username: str, repo: AbstractRepository):
     return user_to_dict(user)
 
 
+@timed
 def authenticate_user(username: str, password: str, repo: AbstractRepository):
     authenticated = False
 
     user = repo.get_user(username)
     if user is not None:
-        authenticated = check_password_hash(user.password, password)
+        with span('authentication.check_password_hash'):
+            authenticated = check_password_hash(user.password, password)
     if not authenticated:
         raise AuthenticationException
 
@@ -0,0 +1,176 @@
+"""Commands run with the flask command line tool, for the application in FLASK_APP.
+
+The database of the database repository is built and loaded offline, so that starting the application only maps the
+domain model and opens the connection pool:
+
+    flask db init       create the tables and indexes, adding any missing from a database built by an older version
+    flask db load       replace the contents of the database with the CSV files in the data directory
+    flask db reindex    rebuild the indexes, the search index and the summary tables, and refresh the query
+                        planner's statistics
+    flask db vacuum     reclaim the space left by deleted rows
+    flask db stats      show the number of rows in each table, the size of the database and its indexes
+
+    flask bench         time the benchmark scenarios against the configured repository
+"""
+import random
+import statistics
+import time
+
+import click
+from flask import current_app
+from flask.cli import AppGroup, with_appcontext
+
+import movie.adapters.repository as repo
+from movie.adapters import database_repository, review_csv
+from movie.adapters.repository import MovieFilter
+from movie.movies import profanity_filter, services
+
+db_cli = AppGroup('db', help='Build and maintain the database of the database repository.')
+
+SEARCH_TERMS = ('the', 'love', 'war', 'dark', 'man')
+
+
+def database_engine():
+    if current_app.config['REPOSITORY'] != 'database':
+        raise click.ClickException("The flask db commands need REPOSITORY = 'database'")
+    # The commands report what they did themselves rather than echoing every statement.
+    return database_repository.create_database_engine(dict(current_app.config, SQLALCHEMY_ECHO=False))
+
+
+def require_tables(engine):
+    if not engine.has_table('movies'):
+        raise click.ClickException("The database has no tables: run 'flask db init' first")
+
+
+@db_cli.command('init')
+def init_command():
+    """Create the tables and indexes, adding any that are missing."""
+    engine = database_engine()
+    database_repository.build_schema(engine)
+    click.echo(f'Initialised {engine.url}')
+
+
+@db_cli.command('load')
+@click.option('--data-path', type=click.Path(exists=True, file_okay=False),
+              help='Directory of Data1000Movies.csv, users.csv and reviews.csv (the application data by default).')
+@click.option('--reviews', 'reviews_file', type=click.Path(exists=True, dir_okay=False),
+              help='A further file of reviews to import.')
+@click.option('--reject-profanity', is_flag=True, help='Skip further reviews that contain profanity.')
+def load_command(data_path, reviews_file, reject_profanity):
+    """Replace the movies, users and reviews with those in the CSV files."""
+    engine = database_engine()
+    require_tables(engine)
+    start = time.perf_counter()
+    database_repository.clear_tables(engine)
+    database_repository.populate(engine, data_path or current_app.config['DATA_PATH'])
+
+    if reviews_file is not None:
+        matcher = profanity_filter.matcher_instance if reject_profanity else None
+        conn = engine.raw_connection()
+        try:
+            with database_repository.statistics_deferred(engine):
+                added, skipped = review_csv.ingest_reviews(reviews_file, review_csv.DatabaseReviewSink(conn), matcher,
+                                                           progress=review_csv.report_progress)
+        finally:
+            conn.close()
+        click.echo(f'\nImported {added} reviews from {reviews_file}, skipped {skipped}')
+
+    rows = database_repository.database_stats(engine)['tables']
+    click.echo(f"Loaded {rows['movies']} movies, {rows['users']} users and {rows['reviews']} reviews "
+               f"in {time.perf_counter() - start:.1f}s")
+
+
+@db_cli.command('reindex')
+def reindex_command():
+    """Rebuild the indexes, the search index and the summary tables."""
+    engine = database_engine()
+    require_tables(engine)
+    start = time.perf_counter()
+    database_repository.reindex(engine)
+    click.echo(f'Reindexed in {time.perf_counter() - start:.1f}s')
+
+
+@db_cli.command('vacuum')
+def vacuum_command():
+    """Rewrite the database file without the space left by deleted rows."""
+    engine = database_engine()
+    size_before = database_repository.database_stats(engine)['size_bytes']
+    start = time.perf_counter()
+    database_repository.vacuum(engine)
+    size_after = database_repository.database_stats(engine)['size_bytes']
+    click.echo(f'Vacuumed in {time.perf_counter() - start:.1f}s: {megabytes(size_before)} -> {megabytes(size_after)}')
+
+
+@db_cli.command('stats')
+def stats_command():
+    """Show the number of rows in each table, the size of the database and its indexes."""
+    stats = database_repository.database_stats(database_engine())
+    for table, rows in stats['tables'].items():
+        click.echo(f'{table:<16}{rows:>12} rows')
+    if 'size_bytes' in stats:
+        click.echo(f"Size {megabytes(stats['size_bytes'])}, of which {megabytes(stats['free_bytes'])} free")
+        click.echo(f"Indexes: {', '.join(stats['indexes'])}")
+
+
+def megabytes(size):
+    return f'{size / 1024 / 1024:.1f} MB'
+
+
+def bench_scenarios(repository, movies_per_page, rng):
+    """Returns {name: function} for the reads the pages of the application make, each picking its own arguments."""
+    first_rank = repository.get_first_movie().rank
+    last_rank = repository.get_last_movie().rank
+    client = current_app.test_client()
+
+    def random_rank():
+        return rng.randint(first_rank, last_rank)
+
+    return {
+        'first page': lambda: services.get_movies_page(0, movies_per_page, repository),
+        'random page': lambda: services.get_movies_page(random_rank(), movies_per_page, repository),
+        'movie': lambda: services.get_movie_by_rank(random_rank(), repository),
+        'search': lambda: services.search_movies(rng.choice(SEARCH_TERMS), repository),
+        'browse': lambda: services.browse_movies(MovieFilter(genres=('Drama',)), 0, movies_per_page, repository),
+        'top': lambda: services.get_top_movies('rating', current_app.config['TOP_MOVIES'], repository),
+        'stats': lambda: services.get_statistics(current_app.config['TOP_MOVIES'], repository),
+        'GET /movies': lambda: client.get(f'/movies?rank={random_rank()}'),
+    }
+
+
+@click.command('bench')
+@with_appcontext
+@click.option('--repeat', default=100, show_default=True, help='Runs of each scenario.')
+@click.option('--scenario', 'scenarios', multiple=True, help='Scenario to run, all of them by default; repeatable.')
+@click.option('--seed', default=0, show_default=True, help='Seed of the movies and search terms picked.')
+def bench_command(repeat, scenarios, seed):
+    """Time the benchmark scenarios against the configured repository."""
+    repository = repo.repo_instance
+    if repository.get_number_of_movies() == 0:
+        raise click.ClickException('The repository has no movies')
+    if hasattr(repository, 'engine'):
+        # Logging every statement would be timed along with it.
+        repository.engine.echo = False
+    available = bench_scenarios(repository, current_app.config['MOVIES_PER_PAGE'], random.Random(seed))
+    unknown = set(scenarios) - set(available)
+    if unknown:
+        raise click.BadParameter(f"{', '.join(sorted(unknown))}: expected one of {', '.join(available)}",
+                                 param_hint='--scenario')
+
+    click.echo(f"{current_app.config['REPOSITORY']} repository, {repository.get_number_of_movies()} movies, "
+               f"{repeat} runs of each scenario")
+    click.echo(f"{'scenario':<14}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'per s':>10}")
+    for name, scenario in available.items():
+        if scenarios and name not in scenarios:
+            continue
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            scenario()
+            timings.append(time.perf_counter() - start)
+            # Like a request, each run starts with an empty database session.
+            repository.close_session()
+        mean = statistics.fmean(timings)
+        # Inclusive quantiles stay within the timings; the default method extrapolates beyond them for few repeats.
+        p95 = statistics.quantiles(timings, n=20, method='inclusive')[-1] if repeat > 1 else timings[0]
+        click.echo(f'{name:<14}{mean * 1000:>10.2f}{statistics.median(timings) * 1000:>10.2f}{p95 * 1000:>10.2f}'
+                   f'{max(timings) * 1000:>10.2f}{1 / mean:>10.0f}')
@@ -5,7 +5,11 @@ class Actor:
             self.__actor_full_name= None
         else:
             self.__actor_full_name = actor_full_name.strip()
-        self.__actor_colleague = list()
+        # Allocated by the first add_actor_colleague.
+
+    @property
+    def actor_full_name(self) -> str:
+        return self.__actor_full_name
 
     def __repr__(self):
         return f"<Actor {self.__actor_full_name}>"
@@ -23,10 +27,13 @@ class Actor:
         return hash(self.__actor_full_name)
         
     def add_actor_colleague(self, colleague):
-       self.__actor_colleague.append(colleague)
+        try:
+            self.__actor_colleague.append(colleague)
+        except AttributeError:
+            self.__actor_colleague = [colleague]
        
     def check_if_this_actor_worked_with(self, colleague):
-        if colleague in self.__actor_colleague:
+        if colleague in getattr(self, '_Actor__actor_colleague', ()):
             return True
         else:
             return False
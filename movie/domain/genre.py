@@ -6,6 +6,10 @@ class Genre:
         else:
             self.__genre_n = genre_n.strip()
 
+    @property
+    def genre_name(self) -> str:
+        return self.__genre_n
+
     def __repr__(self):
         return f"<Genre {self.__genre_n}>"
 
@@ -8,7 +8,8 @@ from typing import List, Iterable
 
 class Movie:
 
-    def __init__(self, rank, title: str, year: int, description, director, runtime_minutes, rating, metascore):
+    def __init__(self, rank, title: str, year: int, description, director, runtime_minutes, rating, metascore, votes=None,
+                 revenue=None):
         self.__rank = rank
         if title == "" or type(title) is not str:
             self.__title = None
@@ -27,15 +28,19 @@ class Movie:
         self.__runtime_minutes: int = runtime_minutes
         self.__rating: float = rating
         self.__metascore: str = metascore
-        self.__reviews: list[Review] = []
+        self.__votes: int = votes
+        self.__revenue: float = revenue
+        # The reviews list is only allocated by the first add_review; most movies in a large catalogue have none. Until
+        # then the attribute is missing, which getattr with a default finds without raising an exception. A class-level
+        # default would not do: clearing the database mappings deletes it.
 
     @property
     def reviews(self) -> Iterable[Review]:
-        return iter(self.__reviews)
+        return iter(self.__review_list())
 
     @property
     def number_of_reviews(self) -> int:
-        return len(self.__reviews)
+        return len(self.__review_list())
 
     @property
     def metascore(self):
@@ -45,6 +50,15 @@ class Movie:
     def rating(self):
         return self.__rating
 
+    @property
+    def votes(self):
+        return self.__votes
+
+    @property
+    def revenue(self):
+        # In millions of dollars, or None when unknown.
+        return self.__revenue
+
     @property
     def rank(self):
         return self.__rank
@@ -163,4 +177,11 @@ class Movie:
                 self.__genres.remove(genre)
 
     def add_review(self, review: Review):
-        self.__reviews.append(review)
+        reviews = getattr(self, '_Movie__reviews', None)
+        if reviews is None:
+            self.__reviews = [review]
+        else:
+            reviews.append(review)
+
+    def __review_list(self):
+        return getattr(self, '_Movie__reviews', ())
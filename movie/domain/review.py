@@ -32,7 +32,9 @@ class Review:
         return other.__user == self.__user and other.__movie == self.__movie and other.__review == self.__review and other.__timestamp == self.__timestamp
 
 
-def make_review(review_text, user, movie, timestamp: datetime = datetime.today()):
+def make_review(review_text, user, movie, timestamp: datetime = None):
+    if timestamp is None:
+        timestamp = datetime.today()
     review = Review(user, movie, review_text, timestamp)
     user.add_review(review)
     movie.add_review(review)
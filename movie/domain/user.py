@@ -5,7 +5,7 @@ class User:
         self.__user_name = user_name
         self.__password = password
         self.__watched_movies = []
-        self.__reviews = []
+        # Allocated by the first add_review.
         self.__time_spent_watching_movies_minutes = 0
         
     @property
@@ -22,7 +22,7 @@ class User:
 
     @property
     def reviews(self):
-        return iter(self.__reviews)
+        return iter(getattr(self, '_User__reviews', ()))
 
     @property
     def time_spent_watching_movies_minutes(self):
@@ -52,5 +52,8 @@ class User:
             self.__time_spent_watching_movies_minutes += movie.runtime_minutes
             
     def add_review(self, review):
-        if review not in self.__reviews:
+        reviews = getattr(self, '_User__reviews', None)
+        if reviews is None:
+            self.__reviews = [review]
+        elif review not in reviews:
             self.__reviews += [review]
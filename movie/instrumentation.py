@@ -0,0 +1,316 @@
+"""Opt-in request instrumentation.
+
+With INSTRUMENTATION enabled, InstrumentationMiddleware wraps the WSGI application and times every request as a tree
+of spans: the repository methods, service functions, password checks and templates run while handling it. Request and
+span durations are aggregated into histograms, served at /_metrics in the Prometheus text format together with the page
+cache, repository cache and review queue counters. A sampled fraction of requests is profiled, with cProfile or, when
+installed, pyinstrument, and the profile is written to disk next to the request's span tree.
+
+Spans are recorded through timed, a decorator, and span, a context manager. Both cost a single check while
+instrumentation is disabled.
+"""
+import cProfile
+import functools
+import inspect
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict, deque
+
+from flask import Blueprint, Response, request
+from jinja2 import Template
+
+from movie.movies import page_cache, review_queue
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+# The Metrics recorded by the web application, or None when instrumentation is disabled.
+metrics_instance = None
+
+# Upper bounds, in seconds, of the histogram buckets.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# The span open on each thread, if a request is being traced there.
+local = threading.local()
+
+
+class Span:
+    __slots__ = ('name', 'start', 'seconds', 'children')
+
+    def __init__(self, name):
+        self.name = name
+        self.start = time.perf_counter()
+        self.seconds = None
+        self.children = []
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self.start
+
+
+def format_span_tree(span, depth=0):
+    lines = [f"{span.seconds * 1000:10.3f} ms  {'  ' * depth}{span.name}"]
+    for child in span.children:
+        lines.append(format_span_tree(child, depth + 1))
+    return '\n'.join(lines)
+
+
+class Histogram:
+    __slots__ = ('counts', 'sum')
+
+    def __init__(self):
+        # One count per bucket and a last one for durations above every bound.
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+
+
+class Metrics:
+
+    def __init__(self, recent_traces=100):
+        self.__lock = threading.Lock()
+        # (method, endpoint) -> Histogram
+        self.__requests = defaultdict(Histogram)
+        # (method, endpoint, status) -> count
+        self.__responses = defaultdict(int)
+        self.__spans = defaultdict(Histogram)
+        self.__traces = deque(maxlen=recent_traces)
+        self.__profiles = 0
+
+    def record_span(self, name, seconds):
+        with self.__lock:
+            self.__spans[name].observe(seconds)
+
+    def record_request(self, method, endpoint, status, trace: Span):
+        with self.__lock:
+            self.__requests[(method, endpoint)].observe(trace.seconds)
+            self.__responses[(method, endpoint, status)] += 1
+            self.__traces.append(trace)
+
+    def record_profile(self):
+        with self.__lock:
+            self.__profiles += 1
+
+    def recent_traces(self):
+        """Returns the span trees of the latest requests, oldest first."""
+        with self.__lock:
+            return list(self.__traces)
+
+    def prometheus_text(self):
+        with self.__lock:
+            requests = {key: (list(histogram.counts), histogram.sum) for key, histogram in self.__requests.items()}
+            responses = dict(self.__responses)
+            spans = {key: (list(histogram.counts), histogram.sum) for key, histogram in self.__spans.items()}
+            profiles = self.__profiles
+
+        lines = []
+        write_histogram(lines, 'movie_request_duration_seconds', 'Time taken to handle requests.',
+                        (({'method': method, 'endpoint': endpoint}, histogram)
+                         for (method, endpoint), histogram in sorted(requests.items())))
+        write_metric(lines, 'movie_responses_total', 'counter', 'Responses sent, by status.',
+                     (({'method': method, 'endpoint': endpoint, 'status': status}, count)
+                      for (method, endpoint, status), count in sorted(responses.items())))
+        write_histogram(lines, 'movie_span_duration_seconds', 'Time spent in instrumented functions.',
+                        (({'span': name}, histogram) for name, histogram in sorted(spans.items())))
+        write_metric(lines, 'movie_profiles_total', 'counter', 'Requests profiled.', [({}, profiles)])
+
+        if page_cache.cache_instance is not None:
+            stats = page_cache.cache_instance.stats()
+            write_metric(lines, 'movie_page_cache_hits_total', 'counter', 'Page cache hits.', [({}, stats['hits'])])
+            write_metric(lines, 'movie_page_cache_misses_total', 'counter', 'Page cache misses.',
+                         [({}, stats['misses'])])
+            write_metric(lines, 'movie_page_cache_entries', 'gauge', 'Pages cached.', [({}, stats['entries'])])
+        if review_queue.queue_instance is not None:
+            stats = review_queue.queue_instance.stats()
+            write_metric(lines, 'movie_review_queue_depth', 'gauge', 'Reviews waiting to be applied.',
+                         [({}, stats['depth'])])
+            write_metric(lines, 'movie_review_queue_applied_total', 'counter', 'Queued reviews applied.',
+                         [({}, stats['applied'])])
+            write_metric(lines, 'movie_review_queue_failed_total', 'counter',
+                         'Queued reviews that could not be applied.', [({}, stats['failed'])])
+            write_metric(lines, 'movie_review_queue_max_latency_seconds', 'gauge',
+                         'Longest time from queueing a review to applying it.', [({}, stats['max_latency_seconds'])])
+        # Imported here, as the repository module imports this one.
+        import movie.adapters.repository as repo
+        if hasattr(repo.repo_instance, 'stats'):
+            stats = repo.repo_instance.stats()
+            write_metric(lines, 'movie_repository_cache_hits_total', 'counter', 'Repository cache hits.',
+                         (({'method': method}, method_stats['hits']) for method, method_stats in stats.items()))
+            write_metric(lines, 'movie_repository_cache_misses_total', 'counter', 'Repository cache misses.',
+                         (({'method': method}, method_stats['misses']) for method, method_stats in stats.items()))
+            write_metric(lines, 'movie_repository_cache_entries', 'gauge', 'Repository results cached.',
+                         (({'method': method}, method_stats['entries']) for method, method_stats in stats.items()))
+        return '\n'.join(lines) + '\n'
+
+
+def write_metric(lines, name, kind, description, samples):
+    lines.append(f'# HELP {name} {description}')
+    lines.append(f'# TYPE {name} {kind}')
+    for labels, value in samples:
+        lines.append(f'{name}{format_labels(labels)} {value}')
+
+
+def write_histogram(lines, name, description, samples):
+    lines.append(f'# HELP {name} {description}')
+    lines.append(f'# TYPE {name} histogram')
+    for labels, (counts, total) in samples:
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ('+Inf',), counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{format_labels(dict(labels, le=bound))} {cumulative}')
+        lines.append(f'{name}_sum{format_labels(labels)} {total}')
+        lines.append(f'{name}_count{format_labels(labels)} {cumulative}')
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+
+class span:
+    """Context manager timing a block as a span of the request being traced."""
+
+    def __init__(self, name):
+        self.__name = name
+        self.__metrics = None
+        self.__span = None
+        self.__parent = None
+
+    def __enter__(self):
+        self.__metrics = metrics_instance
+        if self.__metrics is not None:
+            self.__parent = getattr(local, 'current', None)
+            self.__span = local.current = Span(self.__name)
+        return self
+
+    def __exit__(self, *args):
+        if self.__span is not None:
+            self.__span.finish()
+            local.current = self.__parent
+            if self.__parent is not None:
+                self.__parent.children.append(self.__span)
+            self.__metrics.record_span(self.__name, self.__span.seconds)
+
+
+def timed(function=None, name=None):
+    """Decorator recording each call of a function as a span, named module.function unless a name is given."""
+    if function is None:
+        return functools.partial(timed, name=name)
+    if name is None:
+        name = f"{function.__module__.rsplit('.', 1)[-1]}.{function.__qualname__}"
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if metrics_instance is None:
+            return function(*args, **kwargs)
+        with span(name):
+            return function(*args, **kwargs)
+    return wrapper
+
+
+def instrument_methods(cls):
+    """Times the public methods cls defines, as spans named after the class."""
+    for attribute, value in list(vars(cls).items()):
+        if inspect.isfunction(value) and not attribute.startswith('_'):
+            setattr(cls, attribute, timed(value, name=f'{cls.__name__}.{attribute}'))
+    return cls
+
+
+class InstrumentedTemplate(Template):
+
+    def render(self, *args, **kwargs):
+        with span(f'template {self.name}'):
+            return super().render(*args, **kwargs)
+
+
+class InstrumentationMiddleware:
+    """WSGI middleware tracing each request and profiling a sample of them."""
+
+    def __init__(self, wsgi_app, metrics: Metrics, profile_rate=0.0, profile_path='profiles', profiler='cprofile'):
+        self.__wsgi_app = wsgi_app
+        self.__metrics = metrics
+        self.__profile_rate = profile_rate
+        self.__profile_path = profile_path
+        self.__profiler = profiler
+
+    def __call__(self, environ, start_response):
+        statuses = []
+
+        def recording_start_response(status, headers, exc_info=None):
+            statuses.append(status.split(' ', 1)[0])
+            return start_response(status, headers, exc_info)
+
+        trace = local.current = Span(f"{environ['REQUEST_METHOD']} {environ.get('PATH_INFO', '')}")
+        profiler = self.__start_profiler() if random.random() < self.__profile_rate else None
+        try:
+            # Flask responses other than streamed ones are rendered by the time the application returns.
+            return self.__wsgi_app(environ, recording_start_response)
+        finally:
+            trace.finish()
+            local.current = None
+            endpoint = environ.get('movie.endpoint') or 'unmatched'
+            self.__metrics.record_request(environ['REQUEST_METHOD'], endpoint, statuses[-1] if statuses else '500',
+                                          trace)
+            if profiler is not None:
+                self.__write_profile(profiler, endpoint, trace)
+
+    def __start_profiler(self):
+        if self.__profiler == 'pyinstrument' and pyinstrument is not None:
+            profiler = pyinstrument.Profiler()
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        return profiler
+
+    def __write_profile(self, profiler, endpoint, trace):
+        os.makedirs(self.__profile_path, exist_ok=True)
+        path = os.path.join(self.__profile_path, f'{time.time_ns()}-{endpoint}')
+        if isinstance(profiler, cProfile.Profile):
+            profiler.disable()
+            profiler.dump_stats(path + '.prof')
+        else:
+            profiler.stop()
+            with open(path + '.html', 'w', encoding='utf-8') as html:
+                html.write(profiler.output_html())
+        with open(path + '.spans.txt', 'w', encoding='utf-8') as spans:
+            spans.write(format_span_tree(trace) + '\n')
+        self.__metrics.record_profile()
+
+
+metrics_blueprint = Blueprint('metrics_bp', __name__)
+
+
+@metrics_blueprint.before_app_request
+def record_endpoint():
+    # The middleware labels requests by Flask endpoint, which is only known once the URL has been matched.
+    request.environ['movie.endpoint'] = request.endpoint
+
+
+@metrics_blueprint.route('/_metrics', methods=['GET'])
+def metrics():
+    return Response(metrics_instance.prometheus_text(), mimetype='text/plain; version=0.0.4')
+
+
+def instrument_app(app):
+    """Enables instrumentation for app when INSTRUMENTATION is set, and disables it otherwise."""
+    global metrics_instance
+    if not app.config.get('INSTRUMENTATION'):
+        metrics_instance = None
+        return
+    metrics_instance = Metrics()
+    app.wsgi_app = InstrumentationMiddleware(app.wsgi_app, metrics_instance,
+                                             profile_rate=app.config['INSTRUMENTATION_PROFILE_RATE'],
+                                             profile_path=app.config['INSTRUMENTATION_PROFILE_PATH'],
+                                             profiler=app.config['INSTRUMENTATION_PROFILER'])
+    app.jinja_env.template_class = InstrumentedTemplate
+    app.register_blueprint(metrics_blueprint)
@@ -1,16 +1,18 @@
-from datetime import date
+import hashlib
+from datetime import date, timezone
 
 from flask import Blueprint
-from flask import request, render_template, redirect, url_for, session
+from flask import request, render_template, redirect, url_for, session, current_app, make_response
 from movie.adapters.memory_repository import MemoryRepository
+from movie.adapters.repository import MovieFilter
 from movie.domain.movie import Movie
 from movie.domain.actor import Actor
 from movie.domain.genre import Genre
 from movie.domain.director import Director
 import movie.adapters.repository as repo
 import movie.movies.services as services
+from movie.movies import page_cache, profanity_filter
 
-from better_profanity import profanity
 from flask_wtf import FlaskForm
 from wtforms import TextAreaField, HiddenField, SubmitField
 from wtforms.validators import DataRequired, Length, ValidationError
@@ -26,12 +28,10 @@ movies_blueprint = Blueprint(
 def movies():
     target_rank = request.args.get('rank')
     movie_to_show_comments = request.args.get('view_reviews_for')
-
-    rank_one = services.get_first_movie(repo.repo_instance)
-    rank_hundread = services.get_last_movie(repo.repo_instance)
+    movies_per_page = current_app.config['MOVIES_PER_PAGE']
 
     if target_rank is None:
-        target_rank = rank_one['rank']
+        target_rank = 1
     else:
         target_rank = int(target_rank)
 
@@ -40,35 +40,235 @@ def movies():
     else:
         movie_to_show_comments = int(movie_to_show_comments)
 
-    movies, previous_rank, next_rank = services.get_movie_by_rank(target_rank, repo.repo_instance)
+    username = session.get('username')
+    # Reviews the user submitted that are still queued are shown to them as if already added.
+    pending_reviews = services.get_pending_reviews(username)
+
+    # Validators come from a cheap version query, so a client or CDN holding the current page gets a 304 without the
+    # page being fetched or rendered.
+    version, last_modified = services.get_movies_page_version(target_rank - 1, movies_per_page,
+                                                              repo.repo_instance)
+    pending_version = ','.join(f"{review['movie_rank']}:{review['timestamp']}" for review in pending_reviews)
+    etag = hashlib.sha1(
+        f'{version}|{pending_version}|{request.query_string.decode()}|{username}|{movies_per_page}'.encode()
+    ).hexdigest()
+    if username or not set(request.args) <= {'rank', 'view_reviews_for'}:
+        # The version says nothing of the user, their queued reviews or other query arguments, so only the ETag,
+        # which covers them all, validates such pages.
+        last_modified = None
+    if last_modified is not None:
+        # Review timestamps are local time; HTTP dates are UTC and have whole seconds.
+        last_modified = last_modified.astimezone(timezone.utc).replace(tzinfo=None, microsecond=0)
+
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    else:
+        not_modified = (last_modified is not None and request.if_modified_since is not None and
+                        last_modified <= request.if_modified_since)
+
+    if not_modified:
+        response = current_app.response_class(status=304)
+    else:
+        response = make_response(
+            movies_page(target_rank, movie_to_show_comments, movies_per_page, username, pending_reviews, version))
+
+    response.set_etag(etag)
+    if last_modified is not None:
+        # Werkzeug takes a None date to mean now.
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = current_app.config[
+        'MOVIES_CACHE_CONTROL_PRIVATE' if username else 'MOVIES_CACHE_CONTROL']
+    return response
+
+
+def movies_page(target_rank, movie_to_show_comments, movies_per_page, username, pending_reviews=(), version=''):
+    # Only the bare page is cached; any other query argument (e.g. a search term echoed by the navigation bar) renders
+    # afresh, as does a page showing the user's queued reviews. The page is cached under the version of its movies
+    # read for this request: it is rendered after that read, in the same database session, so it shows at least that
+    # version, and a page cached under an older version is never found once the version has moved on.
+    cache = page_cache.cache_instance
+    cache_key = None
+    if cache is not None and not pending_reviews and set(request.args) <= {'rank', 'view_reviews_for'}:
+        cache_key = page_cache.page_key(target_rank, movie_to_show_comments, username, version)
+        page = cache.get(cache_key)
+        if page is not None:
+            return page
+
+    # The page starts at target_rank; a single keyset query fetches it.
+    # Reviews are only converted for the movie whose reviews are shown; the others just need their count.
+    movies, next_rank = services.get_movies_page(target_rank - 1, movies_per_page, repo.repo_instance, lazy=True)
 
     first_movie_url = None
-    last_movie_url = None
-    next_movie_url = None
     prev_movie_url = None
+    next_movie_url = None
 
-    if previous_rank is not None:
-        prev_movie_url = url_for('movies_bp.movies', rank=previous_rank)
-        first_movie_url = url_for('movies_bp.movies', rank=1)
+    if target_rank > 1:
+        first_movie_url = url_for('movies_bp.movies')
+        prev_movie_url = url_for('movies_bp.movies', rank=max(1, target_rank - movies_per_page))
 
     if next_rank is not None:
         next_movie_url = url_for('movies_bp.movies', rank=next_rank)
-        last_movie_url = url_for('movies_bp.movies', rank=1000)
 
-    movies[0]['view_review_url'] = url_for('movies_bp.movies', rank=target_rank, view_reviews_for=movies[0]['rank'])
-    movies[0]["add_review_url"] = url_for('movies_bp.review_on_movie',movie=movies[0]['rank'])
+    for movie in movies:
+        movie['view_review_url'] = url_for('movies_bp.movies', rank=target_rank, view_reviews_for=movie['rank'])
+        movie['add_review_url'] = url_for('movies_bp.review_on_movie', movie=movie['rank'])
+        queued = [review for review in pending_reviews if review['movie_rank'] == movie['rank']]
+        if queued:
+            # A batch is only removed from the queue once applied, so a review may be in both for a moment.
+            queued = [review for review in queued if review not in movie['reviews']]
+        if queued:
+            movie['reviews'] = movie['reviews'] + queued
+            movie['review_count'] += len(queued)
 
-    return render_template(
+    page = render_template(
         'news/articles.html',
         title='Movie Rankings',
-        movies=movies[0],
+        movies=movies,
         first_movie_url=first_movie_url,
-        last_movie_url=last_movie_url,
         prev_movie_url=prev_movie_url,
         next_movie_url=next_movie_url,
         show_reviews_for_movies=movie_to_show_comments
     )
 
+    if cache_key is not None:
+        cache.put(cache_key, page, [movie['rank'] for movie in movies])
+    return page
+
+@movies_blueprint.route('/search', methods=['GET'])
+def search():
+    query = request.args.get('q', '').strip()
+
+    movies = []
+    if query:
+        movies = services.search_movies(query, repo.repo_instance)
+        for movie in movies:
+            movie['movie_url'] = url_for('movies_bp.movies', rank=movie['rank'])
+
+    return render_template(
+        'news/search.html',
+        title='Search',
+        query=query,
+        movies=movies
+    )
+
+@movies_blueprint.route('/browse', methods=['GET'])
+def browse():
+    movie_filter = requested_movie_filter()
+    after_rank = request.args.get('after', 0, type=int)
+    movies_per_page = current_app.config['MOVIES_PER_PAGE']
+
+    movies, next_rank, total, facets = services.browse_movies(
+        movie_filter, after_rank, movies_per_page, repo.repo_instance)
+
+    # Filter arguments without paging, to build links that narrow or widen the current filter.
+    arguments = request.args.to_dict(flat=False)
+    arguments.pop('after', None)
+
+    def browse_url(**changes):
+        changed = dict(arguments)
+        for name, value in changes.items():
+            if value is None:
+                changed.pop(name, None)
+            else:
+                changed[name] = value
+        return url_for('movies_bp.browse', **changed)
+
+    for movie in movies:
+        movie['movie_url'] = url_for('movies_bp.movies', rank=movie['rank'])
+
+    genre_links = [(genre, count, browse_url(genre=arguments.get('genre', []) + [genre]))
+                   for genre, count in facets['genre'].items() if genre not in movie_filter.genres]
+    year_links = [(year, count, browse_url(min_year=year, max_year=year)) for year, count in facets['year'].items()]
+    rating_links = [(bucket, count, browse_url(min_rating=bucket, max_rating=bucket + 0.9))
+                    for bucket, count in facets['rating'].items()]
+
+    return render_template(
+        'news/browse.html',
+        title='Browse',
+        movies=movies,
+        total=total,
+        movie_filter=movie_filter,
+        genre_links=genre_links,
+        year_links=year_links,
+        rating_links=rating_links,
+        clear_url=url_for('movies_bp.browse'),
+        next_url=browse_url(after=next_rank - 1) if next_rank is not None else None
+    )
+
+@movies_blueprint.route('/top', methods=['GET'])
+def top():
+    field = request.args.get('by', 'rating')
+    limit = request.args.get('limit', current_app.config['TOP_MOVIES'], type=int)
+    limit = max(1, min(limit, current_app.config['MAX_TOP_MOVIES']))
+    movie_filter = requested_movie_filter()
+
+    try:
+        movies = services.get_top_movies(field, limit, repo.repo_instance, movie_filter)
+    except services.UnknownRankingException:
+        return redirect(url_for('movies_bp.top'))
+
+    for movie in movies:
+        movie['movie_url'] = url_for('movies_bp.movies', rank=movie['rank'])
+
+    arguments = request.args.to_dict(flat=False)
+    ranking_links = [(ranking, url_for('movies_bp.top', **dict(arguments, by=ranking)))
+                     for ranking in services.TOP_N_FIELDS]
+
+    return render_template(
+        'news/top.html',
+        title='Top movies',
+        movies=movies,
+        field=field,
+        movie_filter=movie_filter,
+        ranking_links=ranking_links,
+        clear_url=url_for('movies_bp.top', by=field)
+    )
+
+@movies_blueprint.route('/stats', methods=['GET'])
+def stats():
+    limit = request.args.get('limit', current_app.config['TOP_MOVIES'], type=int)
+    limit = max(1, min(limit, current_app.config['MAX_TOP_MOVIES']))
+    statistics = services.get_statistics(limit, repo.repo_instance)
+
+    for movie in statistics['most_reviewed']:
+        movie['movie_url'] = url_for('movies_bp.movies', rank=movie['rank'], view_reviews_for=movie['rank'])
+        movie['director_url'] = url_for('movies_bp.director_stats', director=movie['director'])
+
+    return render_template(
+        'news/stats.html',
+        title='Statistics',
+        statistics=statistics
+    )
+
+@movies_blueprint.route('/stats/directors/<path:director>', methods=['GET'])
+def director_stats(director):
+    try:
+        statistics, movies = services.get_director_statistics(
+            director, current_app.config['MAX_TOP_MOVIES'], repo.repo_instance)
+    except services.UnknownDirectorException:
+        return redirect(url_for('movies_bp.stats'))
+
+    for movie in movies:
+        movie['movie_url'] = url_for('movies_bp.movies', rank=movie['rank'])
+
+    return render_template(
+        'news/director.html',
+        title=director,
+        director=director,
+        statistics=statistics,
+        movies=movies
+    )
+
+def requested_movie_filter():
+    return MovieFilter(
+        genres=tuple(request.args.getlist('genre')),
+        director=request.args.get('director') or None,
+        min_year=request.args.get('min_year', type=int),
+        max_year=request.args.get('max_year', type=int),
+        min_rating=request.args.get('min_rating', type=float),
+        max_rating=request.args.get('max_rating', type=float)
+    )
+
 @movies_blueprint.route('/review',methods=['GET', 'POST'])
 @login_required
 def review_on_movie():
@@ -78,8 +278,8 @@ def review_on_movie():
 
     if form.validate_on_submit():
         movie_rank = int(form.movie_rank.data)
-        services.add_review(movie_rank, form.review.data, username, repo.repo_instance)
-        movie = services.get_movie(movie_rank,repo.repo_instance)
+        services.submit_review(movie_rank, form.review.data, username, repo.repo_instance)
+        movie = services.get_movie(movie_rank, repo.repo_instance, services.RANK_FIELDS)
         return redirect(url_for('movies_bp.movies', rank=movie['rank'], view_reviews_for=movie['rank']))
 
     if request.method == 'GET':
@@ -105,7 +305,7 @@ class ProfanityFree:
         self.message = message
 
     def __call__(self, form, field):
-        if profanity.contains_profanity(field.data):
+        if profanity_filter.matcher_instance.contains_profanity(field.data):
             raise ValidationError(self.message)
 
 
@@ -0,0 +1,226 @@
+"""Cache of rendered /movies pages.
+
+A page is keyed by its starting rank, the movie whose reviews are expanded, the logged-in user (the navigation bar
+shows the username) and the version of the movies it lists - their ranks, numbers of reviews and latest review times,
+read from the repository for every request. A page rendered before any change to its movies, whether made by this
+process, another one or straight through the repository, is therefore never served once the change is visible. Pages
+also remember the ranks of the movies they list, so that adding a review evicts the pages showing that movie rather
+than leaving them to age out. Entries expire after a TTL and the least recently used are evicted beyond the size limits.
+
+Two stores are available: MemoryPageStore keeps pages in the worker process, SqlitePageStore keeps them in a local
+SQLite file shared by every worker on the host, so a review added through one worker invalidates the page for all.
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+# The PageCache used by the web application, or None when page caching is disabled.
+cache_instance = None
+
+
+def page_key(rank, view_reviews_for, username, version=''):
+    # Versions list every movie of the page, so only a digest of them goes into the key.
+    digest = hashlib.sha1(version.encode()).hexdigest()
+    return f'{rank}:{view_reviews_for}:{username or ""}:{digest}'
+
+
+class PageCache:
+    """Counts hits and misses in front of a page store."""
+
+    def __init__(self, store):
+        self.__store = store
+        self.__lock = threading.Lock()
+        self.__hits = 0
+        self.__misses = 0
+
+    @property
+    def store(self):
+        return self.__store
+
+    def get(self, key):
+        page = self.__store.get(key)
+        with self.__lock:
+            if page is None:
+                self.__misses += 1
+            else:
+                self.__hits += 1
+        return page
+
+    def put(self, key, page: str, movie_ranks):
+        self.__store.put(key, page, movie_ranks)
+
+    def invalidate_movie(self, movie_rank):
+        self.__store.invalidate_movie(movie_rank)
+
+    def clear(self):
+        self.__store.clear()
+
+    def stats(self):
+        with self.__lock:
+            hits, misses = self.__hits, self.__misses
+        return {'hits': hits, 'misses': misses, 'entries': len(self.__store)}
+
+
+class MemoryPageStore:
+    """LRU store in the worker process."""
+
+    def __init__(self, max_entries=1024, max_bytes=32 * 1024 * 1024, ttl=300):
+        self.__max_entries = max_entries
+        self.__max_bytes = max_bytes
+        self.__ttl = ttl
+        self.__lock = threading.Lock()
+        # key -> (expiry time, page, movie ranks), least recently used first
+        self.__pages = OrderedDict()
+        # movie rank -> keys of the pages listing it
+        self.__keys_by_movie = defaultdict(set)
+        self.__size = 0
+
+    def __len__(self):
+        return len(self.__pages)
+
+    def get(self, key):
+        with self.__lock:
+            entry = self.__pages.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self.__remove(key)
+                return None
+            self.__pages.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, page, movie_ranks):
+        if len(page) > self.__max_bytes:
+            return
+        with self.__lock:
+            if key in self.__pages:
+                self.__remove(key)
+            movie_ranks = tuple(movie_ranks)
+            self.__pages[key] = (time.monotonic() + self.__ttl, page, movie_ranks)
+            self.__size += len(page)
+            for rank in movie_ranks:
+                self.__keys_by_movie[rank].add(key)
+
+            while len(self.__pages) > self.__max_entries or self.__size > self.__max_bytes:
+                self.__remove(next(iter(self.__pages)))
+
+    def invalidate_movie(self, movie_rank):
+        with self.__lock:
+            for key in list(self.__keys_by_movie.get(movie_rank, ())):
+                self.__remove(key)
+
+    def clear(self):
+        with self.__lock:
+            self.__pages.clear()
+            self.__keys_by_movie.clear()
+            self.__size = 0
+
+    def __remove(self, key):
+        expiry, page, movie_ranks = self.__pages.pop(key)
+        self.__size -= len(page)
+        for rank in movie_ranks:
+            keys = self.__keys_by_movie[rank]
+            keys.discard(key)
+            if not keys:
+                del self.__keys_by_movie[rank]
+
+
+class SqlitePageStore:
+    """LRU store in a SQLite file shared between the worker processes on one host."""
+
+    def __init__(self, filename, max_entries=1024, max_bytes=32 * 1024 * 1024, ttl=300):
+        self.__filename = filename
+        self.__max_entries = max_entries
+        self.__max_bytes = max_bytes
+        self.__ttl = ttl
+        self.__local = threading.local()
+        with self.__connection() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS pages (
+                    key TEXT PRIMARY KEY,
+                    page TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires REAL NOT NULL,
+                    last_used REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS pages_last_used ON pages (last_used);
+                CREATE TABLE IF NOT EXISTS page_movies (
+                    movie INTEGER NOT NULL,
+                    key TEXT NOT NULL REFERENCES pages (key) ON DELETE CASCADE,
+                    PRIMARY KEY (movie, key)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS page_movies_key ON page_movies (key);
+            """)
+
+    def __len__(self):
+        return self.__connection().execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def get(self, key):
+        # Expiry and recency use wall-clock time, the only clock comparable between processes.
+        now = time.time()
+        with self.__connection() as conn:
+            row = conn.execute("SELECT page, expires FROM pages WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                conn.execute("DELETE FROM pages WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE pages SET last_used = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def put(self, key, page, movie_ranks):
+        size = len(page)
+        if size > self.__max_bytes:
+            return
+        now = time.time()
+        with self.__connection() as conn:
+            conn.execute("DELETE FROM pages WHERE key = ?", (key,))
+            conn.execute("INSERT INTO pages (key, page, size, expires, last_used) VALUES (?, ?, ?, ?, ?)",
+                         (key, page, size, now + self.__ttl, now))
+            conn.executemany("INSERT OR IGNORE INTO page_movies (movie, key) VALUES (?, ?)",
+                             [(rank, key) for rank in movie_ranks])
+
+            count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages").fetchone()
+            while count > self.__max_entries or total > self.__max_bytes:
+                oldest, oldest_size = conn.execute(
+                    "SELECT key, size FROM pages ORDER BY last_used LIMIT 1").fetchone()
+                conn.execute("DELETE FROM pages WHERE key = ?", (oldest,))
+                count -= 1
+                total -= oldest_size
+
+    def invalidate_movie(self, movie_rank):
+        with self.__connection() as conn:
+            conn.execute("DELETE FROM pages WHERE key IN (SELECT key FROM page_movies WHERE movie = ?)",
+                         (movie_rank,))
+
+    def clear(self):
+        with self.__connection() as conn:
+            conn.execute("DELETE FROM pages")
+
+    def __connection(self):
+        # sqlite3 connections may not be shared between threads, so each thread opens its own.
+        conn = getattr(self.__local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.__filename, timeout=5)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute("PRAGMA foreign_keys = ON")
+            self.__local.conn = conn
+        return conn
+
+
+def create_page_cache(config):
+    """Builds the PageCache selected by PAGE_CACHE ('memory', 'sqlite' or empty to disable), or returns None."""
+    kind = config.get('PAGE_CACHE')
+    if not kind:
+        return None
+
+    limits = dict(max_entries=config['PAGE_CACHE_MAX_ENTRIES'], max_bytes=config['PAGE_CACHE_MAX_BYTES'],
+                  ttl=config['PAGE_CACHE_TTL'])
+    if kind == 'memory':
+        return PageCache(MemoryPageStore(**limits))
+    if kind == 'sqlite':
+        return PageCache(SqlitePageStore(config['PAGE_CACHE_PATH'], **limits))
+    raise ValueError(f'Unknown PAGE_CACHE {kind!r}: expected memory or sqlite')
@@ -0,0 +1,170 @@
+"""Profanity matching for reviews with compiled regular expressions.
+
+Matches what better_profanity's contains_profanity does - whole words and phrases from a wordlist, ignoring case, with
+leet-speak substitutions such as '4' or '@' for 'a' - without its character-by-character scan of the text or its set of
+every spelling of every word. Each letter of a listed word becomes a character class of its substitutions, and the
+words are merged into a prefix tree so that an expression tries each distinct prefix once.
+
+The text is split into words in one pass and each distinct word is matched against the single-word expression. Words
+that begin a listed word are joined with the words after them, as better_profanity does to catch spaced-out spellings,
+and the phrase expression only searches texts containing a word a phrase starts with. The words of a phrase may be
+separated by any run of characters that are not part of words, so 'blow job' also catches 'blow-job' and 'blow  job'.
+"""
+import re
+from functools import lru_cache
+
+from better_profanity.utils import get_complete_path_of_file
+
+# The ProfanityMatcher used by the web application.
+matcher_instance = None
+
+DEFAULT_WORDLIST = get_complete_path_of_file('profanity_wordlist.txt')
+
+# Substitutions better_profanity recognises for each letter.
+LEET_SUBSTITUTIONS = {
+    'a': 'a@*4',
+    'i': 'i*l1',
+    'o': 'o*0@',
+    'u': 'u*v',
+    'v': 'v*u',
+    'l': 'l1',
+    'e': 'e*3',
+    's': 's$5',
+    't': 't7',
+}
+
+# Characters that make up words; anything else separates them. Like better_profanity, this includes the characters
+# standing in for letters but not the underscore, which is replaced by a space before words are found.
+WORD_CHARACTER = r'''[\w@$*"']'''
+WORD = re.compile(WORD_CHARACTER + '+')
+SEPARATORS = re.compile(r'''[^\w@$*"']+''')
+
+
+class ProfanityMatcher:
+
+    def __init__(self, words, whitelist=()):
+        whitelist = {word.lower() for word in whitelist}
+        words = {word.strip().lower() for word in words} - whitelist - {''}
+        phrases = {word for word in words if WORD.fullmatch(word) is None}
+        single_words = words - phrases
+
+        self.__word_pattern = compile_tree(single_words)
+        self.__prefix_pattern = compile_tree(single_words, every_prefix=True)
+        # Like better_profanity, a word may be followed by as many words as the most separators in a listed phrase.
+        self.__max_following = max([len(phrase) - sum(map(len, WORD.findall(phrase))) for phrase in phrases] + [1])
+        self.__phrase_start_pattern = compile_tree(WORD.match(phrase).group() for phrase in phrases
+                                                   if WORD.match(phrase))
+        self.__phrase_pattern = None
+        if phrases:
+            # Separators in a phrase come down to one space, which word_tree turns into a run of separators.
+            phrases = {SEPARATORS.sub(' ', phrase) for phrase in phrases}
+            self.__phrase_pattern = re.compile(
+                f'(?<!{WORD_CHARACTER})(?:{tree_pattern(word_tree(phrases))})(?!{WORD_CHARACTER})', re.IGNORECASE)
+
+    def contains_profanity(self, text):
+        return self.__contains_profanity(text, self.__word_pattern.fullmatch, self.__prefix_pattern.fullmatch)
+
+    def check_many(self, texts):
+        """Returns, for each of the texts, whether it contains profanity, matching each distinct word only once."""
+        is_profane = memoized(self.__word_pattern.fullmatch)
+        is_prefix = memoized(self.__prefix_pattern.fullmatch)
+        return [self.__contains_profanity(text, is_profane, is_prefix) for text in texts]
+
+    def __contains_profanity(self, text, is_profane, is_prefix):
+        text = text.replace('_', ' ')
+        words = WORD.findall(text.lower())
+        distinct_words = set(words)
+        # Most words fail the prefix expression within a character or two; only those that pass can be listed words.
+        prefixes = {word for word in distinct_words if is_prefix(word)}
+        if any(is_profane(word) for word in prefixes):
+            return True
+
+        # Words spaced out or split, as in 's h i t', are joined with the words that follow while they still spell the
+        # start of a listed word.
+        for index, word in enumerate(words):
+            if word in prefixes:
+                joined = word
+                for following in words[index + 1:index + 1 + self.__max_following]:
+                    joined += following
+                    if is_profane(joined):
+                        return True
+                    if not is_prefix(joined):
+                        break
+
+        return (self.__phrase_pattern is not None and
+                any(self.__phrase_start_pattern.fullmatch(word) for word in distinct_words) and
+                self.__phrase_pattern.search(text) is not None)
+
+
+def memoized(match):
+    results = dict()
+
+    def matches(word):
+        result = results.get(word)
+        if result is None:
+            result = results[word] = match(word) is not None
+        return result
+    return matches
+
+
+def word_tree(words):
+    tree = dict()
+    for word in words:
+        node = tree
+        for char in word:
+            node = node.setdefault(char_pattern(char), dict())
+        # The empty key marks the end of a word.
+        node[''] = dict()
+    return tree
+
+
+def compile_tree(words, every_prefix=False):
+    # Matches nothing when there are no words.
+    return re.compile(tree_pattern(word_tree(words), every_prefix) or '(?!)', re.IGNORECASE)
+
+
+def char_pattern(char):
+    if char == ' ':
+        return SEPARATORS.pattern
+    substitutions = LEET_SUBSTITUTIONS.get(char)
+    if substitutions is None:
+        return re.escape(char)
+    return '[' + re.escape(substitutions) + ']'
+
+
+def tree_pattern(tree, every_prefix=False):
+    """Returns an expression matching the words in tree or, with every_prefix, any non-empty prefix of them."""
+    alternatives = []
+    optional = False
+    for prefix, subtree in sorted(tree.items()):
+        if prefix == '':
+            optional = True
+        else:
+            rest = tree_pattern(subtree, every_prefix)
+            if rest and every_prefix:
+                rest = f'(?:{rest})?'
+            alternatives.append(prefix + rest)
+    if not alternatives:
+        return ''
+    if len(alternatives) == 1 and not optional:
+        return alternatives[0]
+    # A word that is a prefix of others ends here or carries on; the longer match is tried first, and the word-boundary
+    # check after the expression falls back to the shorter one.
+    return f"(?:{'|'.join(alternatives)})" + ('?' if optional else '')
+
+
+def read_wordlist(filename):
+    with open(filename, encoding='utf-8') as wordlist:
+        return [line.strip() for line in wordlist if line.strip()]
+
+
+def create_profanity_matcher(config):
+    """Returns a ProfanityMatcher for PROFANITY_WORDLIST (better_profanity's list by default) less PROFANITY_WHITELIST."""
+    whitelist = tuple(word.strip() for word in (config.get('PROFANITY_WHITELIST') or '').split(',') if word.strip())
+    return load_profanity_matcher(config.get('PROFANITY_WORDLIST') or DEFAULT_WORDLIST, whitelist)
+
+
+@lru_cache(maxsize=8)
+def load_profanity_matcher(filename, whitelist):
+    # Compiling the expressions takes tens of milliseconds, so apps created with the same settings share a matcher.
+    return ProfanityMatcher(read_wordlist(filename), whitelist)
@@ -0,0 +1,216 @@
+"""Write-behind queue for submitted reviews.
+
+With REVIEW_QUEUE set, a validated review is appended to a local SQLite file and the request returns straight away; a
+background worker applies queued reviews to the repository in batches. Until its review is applied, the submitting
+user sees it merged into the pages they view, read back from the queue.
+
+Several worker processes may share the queue file. A worker claims a batch by stamping it with a lease, applies it
+outside any queue lock, then deletes it; a batch whose worker died is claimed again once its lease runs out. Reviews
+are therefore applied at least once. A batch that fails is retried one review at a time, so that one bad review does not
+hold back the others, and a review is given up as failed once it has been claimed max_attempts times. Claiming a batch takes UPDATE ... RETURNING, which needs SQLite 3.35 or later.
+
+The worker writes to the repository from its own thread, which only the database repository allows: the memory
+repository's indexes are read by request threads without a lock.
+"""
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+# The ReviewQueue used by the web application, or None when reviews are written synchronously.
+queue_instance = None
+
+MIN_SQLITE_VERSION = (3, 35, 0)
+
+
+class PendingReview(NamedTuple):
+    id: int
+    movie_rank: int
+    username: str
+    review_text: str
+    timestamp: datetime
+    enqueued_at: float
+
+
+class ReviewQueue:
+
+    def __init__(self, filename, apply_batch, batch_size=100, interval=0.5, lease=60, max_attempts=3):
+        # apply_batch(reviews) applies a list of PendingReviews and returns the number it could not apply.
+        if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+            raise RuntimeError(f'The review queue needs SQLite {".".join(map(str, MIN_SQLITE_VERSION))} or later, '
+                               f'found {sqlite3.sqlite_version}')
+        self.__filename = filename
+        self.__apply_batch = apply_batch
+        self.__batch_size = batch_size
+        self.__interval = interval
+        self.__lease = lease
+        self.__max_attempts = max_attempts
+        self.__local = threading.local()
+        self.__lock = threading.Lock()
+        self.__stopping = threading.Event()
+        self.__worker = None
+        self.__applied = 0
+        self.__failed = 0
+        self.__batches = 0
+        self.__total_latency = 0.0
+        self.__max_latency = 0.0
+        self.__last_batch_seconds = 0.0
+        with self.__connection() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS pending_reviews (
+                    id INTEGER PRIMARY KEY,
+                    movie_rank INTEGER NOT NULL,
+                    username TEXT NOT NULL,
+                    review_text TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    enqueued_at REAL NOT NULL,
+                    claimed_until REAL NOT NULL DEFAULT 0,
+                    attempts INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS pending_reviews_username ON pending_reviews (username);
+            """)
+            columns = [column[1] for column in conn.execute("PRAGMA table_info(pending_reviews)")]
+            if 'attempts' not in columns:
+                # Queue files written before attempts were counted.
+                conn.execute("ALTER TABLE pending_reviews ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+
+    def enqueue(self, movie_rank, username, review_text, timestamp: datetime = None):
+        if timestamp is None:
+            timestamp = datetime.today()
+        with self.__connection() as conn:
+            cursor = conn.execute(
+                "INSERT INTO pending_reviews (movie_rank, username, review_text, timestamp, enqueued_at) "
+                "VALUES (?, ?, ?, ?, ?)", (movie_rank, username, review_text, timestamp.isoformat(), time.time()))
+        return cursor.lastrowid
+
+    def pending(self, username):
+        """Returns the reviews of the user still in the queue, oldest first.
+
+        A claimed batch stays in the queue until it has been applied, so some of these may already be in the repository.
+        """
+        rows = self.__connection().execute(
+            "SELECT id, movie_rank, username, review_text, timestamp, enqueued_at FROM pending_reviews "
+            "WHERE username = ? ORDER BY id", (username,)).fetchall()
+        return [pending_review(row) for row in rows]
+
+    def __len__(self):
+        return self.__connection().execute("SELECT COUNT(*) FROM pending_reviews").fetchone()[0]
+
+    def apply_pending(self):
+        """Applies one batch of queued reviews and returns how many it took from the queue."""
+        now = time.time()
+        with self.__connection() as conn:
+            given_up = conn.execute(
+                "DELETE FROM pending_reviews WHERE claimed_until < ? AND attempts >= ? "
+                "RETURNING id, movie_rank, username, review_text, timestamp, enqueued_at",
+                (now, self.__max_attempts)).fetchall()
+            # Reviews that have failed before come first, one at a time.
+            first = conn.execute("SELECT attempts FROM pending_reviews WHERE claimed_until < ? "
+                                 "ORDER BY attempts = 0, id LIMIT 1", (now,)).fetchone()
+            rows = conn.execute(
+                "UPDATE pending_reviews SET claimed_until = ?, attempts = attempts + 1 WHERE id IN ("
+                "SELECT id FROM pending_reviews WHERE claimed_until < ? ORDER BY attempts = 0, id LIMIT ?) "
+                "RETURNING id, movie_rank, username, review_text, timestamp, enqueued_at",
+                (now + self.__lease, now, 1 if first and first[0] else self.__batch_size)).fetchall()
+        if given_up:
+            for review in given_up:
+                logger.error('Gave up queued review %d of %s on movie %d after %d attempts', review[0], review[2],
+                             review[1], self.__max_attempts)
+            with self.__lock:
+                self.__failed += len(given_up)
+                self.__total_latency += sum(now - review[5] for review in given_up)
+                self.__max_latency = max(self.__max_latency, *(now - review[5] for review in given_up))
+        if not rows:
+            return len(given_up)
+
+        reviews = sorted((pending_review(row) for row in rows), key=lambda review: review.id)
+        start = time.perf_counter()
+        failed = self.__apply_batch(reviews)
+        applied_at = time.time()
+        with self.__connection() as conn:
+            conn.executemany("DELETE FROM pending_reviews WHERE id = ?", [(review.id,) for review in reviews])
+
+        latencies = [applied_at - review.enqueued_at for review in reviews]
+        with self.__lock:
+            self.__batches += 1
+            self.__applied += len(reviews) - failed
+            self.__failed += failed
+            self.__total_latency += sum(latencies)
+            self.__max_latency = max(self.__max_latency, *latencies)
+            self.__last_batch_seconds = time.perf_counter() - start
+        return len(given_up) + len(reviews)
+
+    def drain(self):
+        while self.apply_pending():
+            pass
+
+    def start(self):
+        if self.__worker is None:
+            self.__stopping.clear()
+            self.__worker = threading.Thread(target=self.__run, name='review-queue', daemon=True)
+            self.__worker.start()
+
+    def stop(self, timeout=None):
+        if self.__worker is not None:
+            self.__stopping.set()
+            self.__worker.join(timeout)
+            self.__worker = None
+
+    def stats(self):
+        with self.__lock:
+            taken = self.__applied + self.__failed
+            return {
+                'depth': len(self),
+                'applied': self.__applied,
+                'failed': self.__failed,
+                'batches': self.__batches,
+                'mean_latency_seconds': self.__total_latency / taken if taken else 0.0,
+                'max_latency_seconds': self.__max_latency,
+                'last_batch_seconds': self.__last_batch_seconds,
+            }
+
+    def __run(self):
+        while not self.__stopping.is_set():
+            # Full batches are applied back to back; otherwise reviews are left to gather for up to interval seconds.
+            try:
+                taken = self.apply_pending()
+            except Exception:
+                logger.exception('Applying queued reviews failed')
+                taken = 0
+            if taken < self.__batch_size:
+                self.__stopping.wait(self.__interval)
+
+    def __connection(self):
+        # sqlite3 connections may not be shared between threads, so each thread opens its own.
+        conn = getattr(self.__local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.__filename, timeout=5)
+            conn.execute("PRAGMA journal_mode = WAL")
+            # A queued review has been acknowledged to its author, so it must survive a crash of the host too.
+            conn.execute("PRAGMA synchronous = FULL")
+            self.__local.conn = conn
+        return conn
+
+
+def pending_review(row):
+    id, movie_rank, username, review_text, timestamp, enqueued_at = row
+    return PendingReview(id, movie_rank, username, review_text, datetime.fromisoformat(timestamp), enqueued_at)
+
+
+def create_review_queue(config, apply_batch):
+    """Builds the ReviewQueue selected by REVIEW_QUEUE ('sqlite' or empty to disable), or returns None."""
+    kind = config.get('REVIEW_QUEUE')
+    if not kind:
+        return None
+    if config['REPOSITORY'] != 'database':
+        raise ValueError('REVIEW_QUEUE needs the database repository: the memory repository cannot be written by the '
+                         'queue worker while requests read it')
+    if kind == 'sqlite':
+        return ReviewQueue(config['REVIEW_QUEUE_PATH'], apply_batch, batch_size=config['REVIEW_QUEUE_BATCH_SIZE'],
+                           interval=config['REVIEW_QUEUE_INTERVAL'],
+                           max_attempts=config['REVIEW_QUEUE_MAX_ATTEMPTS'])
+    raise ValueError(f'Unknown REVIEW_QUEUE {kind!r}: expected sqlite')
@@ -1,11 +1,14 @@
+from collections.abc import Mapping
 from typing import List, Iterable
 
-from movie.adapters.repository import AbstractRepository
+from movie.adapters.repository import AbstractRepository, MovieFilter, TOP_N_FIELDS
 from movie.domain.movie import Movie
 from movie.domain.actor import Actor
 from movie.domain.genre import Genre
 from movie.domain.director import Director
 from movie.domain.review import make_review
+from movie.instrumentation import timed
+from movie.movies import page_cache, review_queue
 
 class NonExistentArticleException(Exception):
     pass
@@ -15,6 +18,39 @@ class UnknownUserException(Exception):
     pass
 
 
+class UnknownRankingException(Exception):
+    pass
+
+
+class UnknownDirectorException(Exception):
+    pass
+
+
+# How each field of a movie dict is read from a Movie. Reviews are the only costly field, so callers that do not show
+# them can leave them out.
+MOVIE_FIELD_GETTERS = {
+    'rank': lambda movie: movie.rank,
+    'title': lambda movie: movie.title,
+    'year': lambda movie: movie.year,
+    'description': lambda movie: movie.description,
+    'director': lambda movie: movie.director,
+    'runtime': lambda movie: movie.runtime_minutes,
+    'rating': lambda movie: movie.rating,
+    'metascore': lambda movie: movie.metascore,
+    'votes': lambda movie: movie.votes,
+    'revenue': lambda movie: movie.revenue,
+    'review_count': lambda movie: movie.number_of_reviews,
+    'reviews': lambda movie: reviews_to_dict(movie.reviews),
+}
+MOVIE_FIELDS = tuple(MOVIE_FIELD_GETTERS)
+
+# Projections, cheapest first: enough to link to a movie, enough to list it, and everything including its reviews.
+RANK_FIELDS = ('rank',)
+SUMMARY_FIELDS = tuple(field for field in MOVIE_FIELDS if field != 'reviews')
+FULL_FIELDS = MOVIE_FIELDS
+
+
+@timed
 def add_review(movie_rank, review_text, username, repo):
     movie = repo.get_movie(movie_rank)
     if movie is None:
@@ -25,19 +61,69 @@ def add_review(movie_rank, review_text, username, repo):
     comment = make_review(review_text, user, movie)
     repo.add_review(comment)
 
-def get_first_movie(repo):
+    if page_cache.cache_instance is not None:
+        page_cache.cache_instance.invalidate_movie(movie_rank)
+
+@timed
+def submit_review(movie_rank, review_text, username, repo):
+    # Reviews go through the write-behind queue when one is configured, and are added straight away otherwise.
+    queue = review_queue.queue_instance
+    if queue is None:
+        add_review(movie_rank, review_text, username, repo)
+        return
+    if repo.get_movie(movie_rank) is None:
+        raise NonExistentArticleException
+    if repo.get_user(username) is None:
+        raise UnknownUserException
+    queue.enqueue(movie_rank, username, review_text)
+
+@timed
+def apply_queued_reviews(pending_reviews, repo):
+    # Returns the number of queued reviews that could not be applied, because the movie or user no longer exists.
+    reviews = []
+    for pending in pending_reviews:
+        movie = repo.get_movie(pending.movie_rank)
+        user = repo.get_user(pending.username)
+        if movie is not None and user is not None:
+            reviews.append(make_review(pending.review_text, user, movie, pending.timestamp))
+    repo.add_reviews(reviews)
+
+    if page_cache.cache_instance is not None:
+        for movie_rank in {review.movie.rank for review in reviews}:
+            page_cache.cache_instance.invalidate_movie(movie_rank)
+    return len(pending_reviews) - len(reviews)
+
+def get_pending_reviews(username):
+    # The user's reviews still waiting in the queue, so they see them before they are applied.
+    queue = review_queue.queue_instance
+    if queue is None or username is None:
+        return []
+    return [{
+        'username': pending.username,
+        'movie_rank': pending.movie_rank,
+        'review_text': pending.review_text,
+        'timestamp': pending.timestamp
+    } for pending in queue.pending(username)]
+
+@timed
+def get_first_movie(repo, fields=MOVIE_FIELDS):
     movie = repo.get_first_movie()
-    return movie_to_dict(movie)
+    return movie_to_dict(movie, fields)
 
-def get_last_movie(repo):
+@timed
+def get_last_movie(repo, fields=MOVIE_FIELDS):
     movie = repo.get_last_movie()
-    return movie_to_dict(movie)
+    return movie_to_dict(movie, fields)
 
-def get_movie(movie_rank: int,repo: AbstractRepository):
+@timed
+def get_movie(movie_rank: int,repo: AbstractRepository, fields=MOVIE_FIELDS):
     movie = repo.get_movie(movie_rank)
+    if movie is None:
+        raise NonExistentArticleException
 
-    return movie_to_dict(movie)
+    return movie_to_dict(movie, fields)
 
+@timed
 def get_movie_by_rank(rank,repo):
 
     movie = repo.get_movie_by_rank(rank)
@@ -53,6 +139,75 @@ def get_movie_by_rank(rank,repo):
         movies_ranked = movies_to_dict(movie)
     return movies_ranked, previous_movie, next_movie
 
+@timed
+def get_movies_page(after_rank, movies_per_page, repo, fields=MOVIE_FIELDS, lazy=False):
+    # One extra movie is fetched so we know whether there is a next page without another query.
+    movies = repo.get_movies_page(after_rank, movies_per_page + 1)
+
+    next_rank = None
+    if len(movies) > movies_per_page:
+        next_rank = movies[movies_per_page].rank
+        movies = movies[:movies_per_page]
+
+    return movies_to_dict(movies, fields, lazy), next_rank
+
+@timed
+def get_movies_page_version(after_rank, movies_per_page, repo):
+    # Covers the same movies_per_page + 1 movies as get_movies_page, since the extra one decides the next link.
+    versions = repo.get_movie_versions(after_rank, movies_per_page + 1)
+    last_modified = max((timestamp for rank, count, timestamp in versions if timestamp is not None), default=None)
+    version = ';'.join(f'{rank}:{count}:{timestamp}' for rank, count, timestamp in versions)
+    return version, last_modified
+
+@timed
+def browse_movies(movie_filter, after_rank, movies_per_page, repo):
+    # Returns the page of matching movies, the rank the next page starts at, the number of matches and facet counts.
+    movies = repo.get_movies_by_filter(movie_filter, after_rank, movies_per_page + 1)
+
+    next_rank = None
+    if len(movies) > movies_per_page:
+        next_rank = movies[movies_per_page].rank
+        movies = movies[:movies_per_page]
+
+    total, facets = repo.get_facet_counts(movie_filter)
+    return movies_to_dict(movies, SUMMARY_FIELDS), next_rank, total, facets
+
+@timed
+def get_top_movies(field, limit, repo, movie_filter=None):
+    if field not in TOP_N_FIELDS:
+        raise UnknownRankingException
+    movies = repo.get_top_movies(field, limit, movie_filter)
+    return movies_to_dict(movies, SUMMARY_FIELDS)
+
+@timed
+def get_statistics(most_reviewed, repo):
+    # Statistics of the catalogue and of each genre, and the most_reviewed movies with the most reviews.
+    return {
+        'catalogue': statistics_to_dict(repo.get_statistics()),
+        'genres': {genre: statistics_to_dict(statistics)
+                   for genre, statistics in repo.get_genre_statistics().items()},
+        'most_reviewed': movies_to_dict(repo.get_most_reviewed_movies(most_reviewed), SUMMARY_FIELDS),
+    }
+
+@timed
+def get_director_statistics(director, limit, repo):
+    # Returns the statistics of the director's movies and the first limit of them in rank order.
+    statistics = repo.get_director_statistics(director)
+    if statistics is None:
+        raise UnknownDirectorException
+    movies = repo.get_movies_by_filter(MovieFilter(director=director), 0, limit)
+    return statistics_to_dict(statistics), movies_to_dict(movies, SUMMARY_FIELDS)
+
+def statistics_to_dict(statistics):
+    return dict(statistics._asdict(), mean_rating=statistics.mean_rating,
+                reviews_per_movie=statistics.reviews_per_movie)
+
+@timed
+def search_movies(query, repo, limit=20):
+    movies = repo.search_movies(query, limit)
+    return movies_to_dict(movies)
+
+@timed
 def get_review_for_movie(rank,repo):
     movie = repo.get_movie(rank)
 
@@ -60,21 +215,51 @@ def get_review_for_movie(rank,repo):
         raise NonExistentArticleException
     return reviews_to_dict(movie.reviews)
 
-def movie_to_dict(movie):
-    movie_dict = {
-        'rank': movie.rank,
-        'title': movie.title,
-        'year': movie.year,
-        'description': movie.description,
-        'director': movie.director,
-        "runtime": movie.runtime_minutes,
-        "rating": movie.rating,
-        "metascore": movie.metascore,
-        "reviews": reviews_to_dict(movie.reviews)}
-    return movie_dict
-
-def movies_to_dict(movies):
-    return [movie_to_dict(movie) for movie in movies]
+@timed
+def movie_to_dict(movie, fields=MOVIE_FIELDS):
+    return {field: MOVIE_FIELD_GETTERS[field](movie) for field in fields}
+
+@timed
+def movies_to_dict(movies, fields=MOVIE_FIELDS, lazy=False):
+    if lazy:
+        return [LazyMovieDict(movie, fields) for movie in movies]
+    return [movie_to_dict(movie, fields) for movie in movies]
+
+
+class LazyMovieDict(Mapping):
+    """A movie dict whose reviews are only converted when they are read, e.g. by a template showing them.
+
+    Every other field is read from the Movie straight away. Keys can be added, as views do for URLs.
+    """
+
+    LAZY_FIELDS = ('reviews',)
+
+    def __init__(self, movie, fields=MOVIE_FIELDS):
+        self.__movie = movie
+        self.__values = {field: MOVIE_FIELD_GETTERS[field](movie) for field in fields if field not in self.LAZY_FIELDS}
+        self.__pending = [field for field in fields if field in self.LAZY_FIELDS]
+
+    def __getitem__(self, key):
+        if key in self.__pending:
+            self.__values[key] = MOVIE_FIELD_GETTERS[key](self.__movie)
+            self.__pending.remove(key)
+        return self.__values[key]
+
+    def __setitem__(self, key, value):
+        if key in self.__pending:
+            self.__pending.remove(key)
+        self.__values[key] = value
+
+    def __iter__(self):
+        yield from self.__values
+        yield from list(self.__pending)
+
+    def __len__(self):
+        return len(self.__values) + len(self.__pending)
+
+    @property
+    def materialized(self):
+        return [field for field in self.LAZY_FIELDS if field in self.__values]
 
 def review_to_dict(review):
     review_dict = {
@@ -85,5 +270,6 @@ def review_to_dict(review):
     }
     return review_dict
 
+@timed
 def reviews_to_dict(reviews):
     return[review_to_dict(review) for review in reviews]
\ No newline at end of file
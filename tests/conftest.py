@@ -4,10 +4,18 @@ import pytest
 from movie import create_app
 from movie.adapters import memory_repository
 from movie.adapters.memory_repository import MemoryRepository
+from movie.movies import review_queue
+
+from sqlalchemy.orm import clear_mappers
 
 TEST_DATA_PATH = os.path.join('C:', os.sep, 'Users', 'edwar', 'Desktop', 'Movie-Web-app', 'tests', 'data')
 
 
+@pytest.fixture
+def data_path():
+    return TEST_DATA_PATH
+
+
 @pytest.fixture
 def in_memory_repo():
     repo = MemoryRepository()
@@ -23,7 +31,47 @@ def client():
         'WTF_CSRF_ENABLED': False  # test_client will not send a CSRF token, so disable validation.
     })
 
-    return my_app.test_client()
+    yield my_app.test_client()
+
+    # A database-backed app maps the domain classes; undo that so other tests see plain domain objects.
+    clear_mappers()
+
+
+@pytest.fixture
+def database_app(tmp_path):
+    my_app = create_app({
+        'TESTING': True,
+        'TEST_DATA_PATH': TEST_DATA_PATH,
+        'WTF_CSRF_ENABLED': False,
+        'REPOSITORY': 'database',
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'movies.db'),
+        'SQLALCHEMY_ECHO': False
+    })
+
+    yield my_app
+
+    clear_mappers()
+
+
+@pytest.fixture
+def queued_client(tmp_path):
+    my_app = create_app({
+        'TESTING': True,
+        'TEST_DATA_PATH': TEST_DATA_PATH,
+        'WTF_CSRF_ENABLED': False,
+        'REPOSITORY': 'database',
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'movies.db'),
+        'SQLALCHEMY_ECHO': False,
+        'REVIEW_QUEUE': 'sqlite',
+        'REVIEW_QUEUE_PATH': str(tmp_path / 'reviews.db')
+    })
+    # Tests apply queued reviews themselves rather than racing the worker.
+    review_queue.queue_instance.stop()
+
+    yield my_app.test_client()
+
+    review_queue.queue_instance = None
+    clear_mappers()
 
 
 class AuthenticationManager:
@@ -1,6 +1,17 @@
 import pytest
 
 from flask import session
+from sqlalchemy.orm import clear_mappers
+
+import movie.adapters.repository as repo
+from movie import create_app, apply_queued_reviews
+from movie.adapters.repository import MovieFilter
+from movie.adapters import database_repository
+from movie.adapters.database_repository import QueryCounter
+from movie.domain.review import make_review
+from movie.domain.user import User
+from movie import instrumentation
+from movie.movies import page_cache, review_queue
 
 
 def test_register(client):
@@ -133,6 +144,102 @@ def test_movies_with_rank(client):
     assert b'Split' in response.data
 
 
+def test_movies_page_lists_several_movies(client):
+    response = client.get('/movies?rank=2')
+    assert response.status_code == 200
+
+    # The page starts at the requested rank and continues in rank order.
+    assert b'Guardians of the Galaxy' not in response.data
+    assert b'Prometheus' in response.data
+    assert b'Split' in response.data
+    assert b'/movies?rank=12' in response.data
+
+
+def test_movies_page_issues_constant_number_of_queries(database_app):
+    client = database_app.test_client()
+
+    with QueryCounter(repo.repo_instance.engine) as counter:
+        client.get('/movies?rank=1&view_reviews_for=1')
+    queries_without_reviews = counter.count
+
+    with database_app.app_context():
+        for i in range(20):
+            user = User(f'reviewer{i}', 'password')
+            repo.repo_instance.add_user(user)
+            movie = repo.repo_instance.get_movie(1 + i % 3)
+            repo.repo_instance.add_review(make_review(f'Review number {i}', user, movie))
+        repo.repo_instance.close_session()
+
+    with QueryCounter(repo.repo_instance.engine) as counter:
+        response = client.get('/movies?rank=1&view_reviews_for=1')
+
+    assert b'Review number 18' in response.data
+    assert counter.count == queries_without_reviews
+    assert counter.count <= 3
+
+
+def test_database_connections_are_pooled_and_returned_after_each_request(database_app):
+    pool = repo.repo_instance.engine.pool
+    assert type(pool).__name__ == 'QueuePool'
+
+    client = database_app.test_client()
+    for rank in (1, 11, 21):
+        assert client.get(f'/movies?rank={rank}').status_code == 200
+        assert pool.checkedout() == 0
+
+
+def test_sqlite_connections_are_tuned_and_indexed(database_app):
+    engine = repo.repo_instance.engine
+
+    assert engine.execute('PRAGMA journal_mode').scalar() == 'wal'
+    assert engine.execute('PRAGMA synchronous').scalar() == 1  # NORMAL
+    index_names = {row[1] for row in engine.execute("SELECT * FROM sqlite_master WHERE type = 'index'")}
+    assert {'reviews_movie_timestamp_idx', 'reviews_user_idx', 'movies_year_idx'} <= index_names
+
+
+def test_database_is_built_offline_by_flask_db_commands(tmp_path, data_path):
+    app = create_app({
+        'TEST_DATA_PATH': data_path,
+        'REPOSITORY': 'database',
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'movies.db'),
+        'SQLALCHEMY_ECHO': False
+    })
+    try:
+        # Starting the application leaves the database alone.
+        assert repo.repo_instance.engine.table_names() == []
+        runner = app.test_cli_runner()
+
+        assert 'no tables' in runner.invoke(args=['db', 'load']).output
+        assert runner.invoke(args=['db', 'init']).exit_code == 0
+        result = runner.invoke(args=['db', 'load'])
+        assert 'Loaded 1000 movies, 3 users and 3 reviews' in result.output
+        for command in ('reindex', 'vacuum'):
+            assert runner.invoke(args=['db', command]).exit_code == 0
+        assert 'movies_year_idx' in runner.invoke(args=['db', 'stats']).output
+
+        assert b'Guardians of the Galaxy' in app.test_client().get('/movies').data
+    finally:
+        clear_mappers()
+
+
+def test_flask_bench_times_scenarios_against_the_repository(client):
+    result = client.application.test_cli_runner().invoke(args=['bench', '--repeat', '2', '--scenario', 'movie'])
+    assert result.exit_code == 0
+    assert 'repository, 1000 movies' in result.output
+    assert 'movie ' in result.output and 'search' not in result.output
+    mean, p50, p95, slowest = map(float, result.output.splitlines()[-1].split()[1:5])
+    assert p95 <= slowest
+
+
+def test_database_stores_normalized_genres_and_actors(database_app):
+    with database_app.app_context():
+        movie = repo.repo_instance.get_movie(1)
+
+        assert [genre.genre_name for genre in movie.genres] == ['Action', 'Adventure', 'Sci-Fi']
+        assert 'Chris Pratt' in [actor.actor_full_name for actor in movie.actors]
+        assert repo.repo_instance.get_genre('Sci-Fi') is movie.genres[2]
+
+
 def test_movies_with_review(client):
     # Check that we can retrieve the movie page.
     response = client.get('/movies?rank=1&view_reviews_for=1')
@@ -143,5 +250,293 @@ def test_movies_with_review(client):
     assert b'The movie was recommended to me by a friend who saw the reviews and somehow believed those' in response.data
 
 
+def test_search(client):
+    response = client.get('/search?q=kidnapped+personalities')
+    assert response.status_code == 200
+    assert b'Split' in response.data
+
+
+def test_search_ignores_diacritics(client):
+    response = client.get('/search', query_string={'q': 'MATHÉMATICIANS'})
+    assert b'Hidden Figures' in response.data
+
+
+def test_search_without_matches(client):
+    response = client.get('/search?q=zzzzzz')
+    assert response.status_code == 200
+    assert b'No movies matched your search.' in response.data
+
+
+def test_movies_page_is_cached_until_a_review_is_added(client, auth):
+    auth.login()
+    first = client.get('/movies?rank=1&view_reviews_for=1')
+    second = client.get('/movies?rank=1&view_reviews_for=1')
+    assert second.data == first.data
+    assert page_cache.cache_instance.stats()['hits'] == 1
+
+    client.post('/review', data={'review': 'Cached pages are evicted on review', 'movie_rank': 1})
+    response = client.get('/movies?rank=1&view_reviews_for=1')
+    assert b'Cached pages are evicted on review' in response.data
+    assert page_cache.cache_instance.stats()['hits'] == 1
+
+    # Pages are cached per user, since the navigation bar shows who is logged in.
+    assert b'bmarshall7688' in client.get('/movies?rank=11').data
+    client.get('/authentication/logout')
+    assert b'bmarshall7688' not in client.get('/movies?rank=11').data
+
+
+def test_movies_page_honours_conditional_requests(client, auth):
+    response = client.get('/movies?rank=1')
+    etag = response.headers['ETag']
+    assert response.headers['Cache-Control'] == 'public, max-age=60'
+
+    response = client.get('/movies?rank=1', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+
+    auth.login()
+    client.post('/review', data={'review': 'Worth revalidating for', 'movie_rank': 2})
+    client.get('/authentication/logout')
+
+    response = client.get('/movies?rank=1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    last_modified = response.headers['Last-Modified']
+
+    response = client.get('/movies?rank=1', headers={'If-Modified-Since': last_modified})
+    assert response.status_code == 304
+
+    # Pages further on do not list the reviewed movie, so their validators still hold.
+    response = client.get('/movies?rank=21')
+    assert client.get('/movies?rank=21', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+
+def test_movies_page_for_logged_in_user_is_private(client, auth):
+    auth.login()
+    response = client.get('/movies?rank=1')
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+    assert 'Last-Modified' not in response.headers
+
+    # A page for an anonymous visitor is no proof that the user's page is unchanged.
+    client.get('/authentication/logout')
+    last_modified = client.get('/movies?rank=1').headers['Last-Modified']
+    auth.login()
+    assert client.get('/movies?rank=1', headers={'If-Modified-Since': last_modified}).status_code == 200
+
+
+def test_movies_page_reflects_reviews_added_outside_the_web_app(database_app):
+    client = database_app.test_client()
+    etag = client.get('/movies?rank=1&view_reviews_for=2').headers['ETag']
+
+    with database_app.app_context():
+        user = User('outsider', 'password')
+        repo.repo_instance.add_user(user)
+        repo.repo_instance.add_review(make_review('Written straight to the database', user,
+                                                  repo.repo_instance.get_movie(2)))
+        repo.repo_instance.close_session()
+
+    response = client.get('/movies?rank=1&view_reviews_for=2', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert b'Written straight to the database' in response.data
+    assert client.get('/movies?rank=1&view_reviews_for=2',
+                      headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+
+def test_api_movies_page(client):
+    response = client.get('/api/v1/movies?limit=2')
+    assert response.mimetype == 'application/json'
+    page = response.get_json()
+    assert [movie['rank'] for movie in page['movies']] == [1, 2]
+    assert 'reviews' not in page['movies'][0]
+
+    page = client.get(page['next']).get_json()
+    assert [movie['rank'] for movie in page['movies']] == [3, 4]
+
+
+def test_api_movie_with_selected_fields(client):
+    movie = client.get('/api/v1/movies/1?fields=rank,title,reviews').get_json()
+    assert set(movie) == {'rank', 'title', 'reviews'}
+    assert movie['title'] == 'Guardians of the Galaxy'
+
+    reviews = client.get('/api/v1/movies/1/reviews').get_json()['reviews']
+    assert [review['review_text'] for review in reviews] == [review['review_text'] for review in movie['reviews']]
+
+
+def test_api_errors(client):
+    assert client.get('/api/v1/movies/5000').status_code == 404
+    assert client.get('/api/v1/movies?fields=rank,budget').get_json() == {'error': 'Unknown fields: budget'}
+    assert client.get('/api/v1/movies', headers={'Accept': 'text/html'}).status_code == 406
+
 
+def test_api_msgpack(client):
+    msgpack = pytest.importorskip('msgpack')
+    response = client.get('/api/v1/movies?limit=3&fields=rank', headers={'Accept': 'application/msgpack'})
+    assert response.mimetype == 'application/msgpack'
+    assert msgpack.unpackb(response.data)['movies'] == [{'rank': 1}, {'rank': 2}, {'rank': 3}]
+
+
+def test_browse_by_facets(client):
+    response = client.get('/browse?genre=Action&genre=Sci-Fi&min_year=2015')
+    assert b'21 movies' in response.data
+    assert b'Genres: Action, Sci-Fi. ' in response.data and b'Years: 2015-. ' in response.data
+    assert b'Rogue One' in response.data
+    assert b'/browse?genre=Action&amp;genre=Sci-Fi&amp;min_year=2016&amp;max_year=2016' in response.data
 
+    response = client.get('/browse?director=Ridley+Scott')
+    assert b'Prometheus' in response.data
+    assert b'Guardians of the Galaxy' not in response.data
+
+
+def test_database_browse_matches_memory(database_app, in_memory_repo):
+    movie_filter = MovieFilter(genres=('Action',), min_rating=7.0, max_year=2012)
+    with database_app.app_context():
+        assert [movie.rank for movie in repo.repo_instance.get_movies_by_filter(movie_filter, 10, 5)] == \
+               [movie.rank for movie in in_memory_repo.get_movies_by_filter(movie_filter, 10, 5)]
+        assert repo.repo_instance.get_facet_counts(movie_filter) == in_memory_repo.get_facet_counts(movie_filter)
+
+
+def test_top_movies(client):
+    response = client.get('/top?by=rating')
+    assert b'Top movies by rating' in response.data
+    assert b'The Dark Knight' in response.data
+
+    response = client.get('/top?by=revenue&genre=Sci-Fi&min_year=2016&max_year=2016&limit=1')
+    assert b'Rogue One' in response.data
+    assert b'Genres: Sci-Fi. ' in response.data and b'Years: 2016-2016. ' in response.data
+    assert b'Star Wars: Episode VII' not in response.data
+
+    assert client.get('/top?by=runtime').headers['Location'] == 'http://localhost/top'
+
+
+def test_database_top_movies_match_memory(database_app, in_memory_repo):
+    movie_filter = MovieFilter(genres=('Action',), min_rating=7.0)
+    with database_app.app_context():
+        for field in repo.TOP_N_FIELDS:
+            assert repo.repo_instance.get_top_movies(field, 10, movie_filter) == \
+                   in_memory_repo.get_top_movies(field, 10, movie_filter)
+
+
+def test_database_statistics_match_memory(database_app, in_memory_repo):
+    def statistics(repository):
+        # Sums of ratings are rounded, as the database adds them up in a different order.
+        rounded = lambda value: value._replace(rating_total=round(value.rating_total, 6))
+        return (rounded(repository.get_statistics()), rounded(repository.get_director_statistics('James Gunn')),
+                {genre: rounded(value) for genre, value in repository.get_genre_statistics().items()},
+                [movie.rank for movie in repository.get_most_reviewed_movies(10)])
+
+    with database_app.app_context():
+        for repository in (repo.repo_instance, in_memory_repo):
+            user = repository.get_user('kilic20')
+            for rank in (5, 2, 5):
+                repository.add_review(make_review('Meh, could be better', user, repository.get_movie(rank)))
+
+        expected = statistics(in_memory_repo)
+        assert expected[0].reviews == 6 and expected[3] == [1, 5, 2]
+        assert statistics(repo.repo_instance) == expected
+
+        # The summary tables rebuilt from scratch hold what the triggers kept.
+        database_repository.reindex(repo.repo_instance.engine)
+        assert statistics(repo.repo_instance) == expected
+
+
+def test_statistics_page_and_api(client):
+    response = client.get('/stats')
+    assert b'Statistics' in response.data
+    assert b'Guardians of the Galaxy</a> (2014)' in response.data
+    assert b'href="/stats/directors/James%20Gunn"' in response.data
+
+    response = client.get('/stats/directors/James Gunn')
+    assert b'Slither' in response.data and b'7.13 on average' in response.data
+    assert client.get('/stats/directors/Nobody').headers['Location'] == 'http://localhost/stats'
+
+    statistics = client.get('/api/v1/stats?limit=1').get_json()
+    assert statistics['catalogue']['movies'] == 1000 and statistics['catalogue']['reviews'] == 3
+    assert statistics['genres']['Drama']['movies'] == 513
+    assert [movie['rank'] for movie in statistics['most_reviewed']] == [1]
+
+    director = client.get('/api/v1/stats/directors/James Gunn').get_json()
+    assert director['statistics']['movies'] == len(director['movies']) == 3
+    assert client.get('/api/v1/stats/directors/Nobody').status_code == 404
+
+
+def test_metrics_are_served_when_instrumentation_is_enabled(data_path):
+    app = create_app({
+        'TESTING': True,
+        'TEST_DATA_PATH': data_path,
+        'INSTRUMENTATION': True
+    })
+    try:
+        client = app.test_client()
+        assert client.get('/movies').status_code == 200
+        response = client.get('/_metrics')
+        assert response.mimetype == 'text/plain'
+        assert b'movie_responses_total{method="GET",endpoint="movies_bp.movies",status="200"} 1' in response.data
+        assert b'span="template news/articles.html"' in response.data
+        assert b'movie_page_cache_misses_total 1' in response.data
+    finally:
+        instrumentation.metrics_instance = None
+        clear_mappers()
+
+    assert create_app({'TESTING': True, 'TEST_DATA_PATH': data_path}).test_client().get('/_metrics').status_code == 404
+    clear_mappers()
+
+
+def test_queued_review_is_shown_to_its_author_until_applied(queued_client):
+    client = queued_client
+    client.post('authentication/login', data={'username': 'bmarshall7688', 'password': 'cLQ^C#oFXloS'})
+    response = client.post('/review', data={'review': 'Queued before it is saved', 'movie_rank': 2})
+    assert response.headers['Location'] == 'http://localhost/movies?rank=2&view_reviews_for=2'
+    assert repo.repo_instance.get_movie(2).number_of_reviews == 0
+    assert review_queue.queue_instance.stats()['depth'] == 1
+    assert b'Queued before it is saved' in client.get('/movies?rank=2&view_reviews_for=2').data
+
+    client.get('/authentication/logout')
+    assert b'Queued before it is saved' not in client.get('/movies?rank=2&view_reviews_for=2').data
+
+    # Between applying a batch and removing it from the queue, the author still sees the review only once.
+    client.post('authentication/login', data={'username': 'bmarshall7688', 'password': 'cLQ^C#oFXloS'})
+    apply_queued_reviews(review_queue.queue_instance.pending('bmarshall7688'))
+    assert client.get('/movies?rank=2&view_reviews_for=2').data.count(b'Queued before it is saved') == 1
+
+    review_queue.queue_instance.drain()
+    client.get('/authentication/logout')
+    assert b'Queued before it is saved' in client.get('/movies?rank=2&view_reviews_for=2').data
+
+
+def test_review_queue_needs_the_database_repository(tmp_path, data_path):
+    with pytest.raises(ValueError):
+        create_app({'TESTING': True, 'TEST_DATA_PATH': data_path, 'REPOSITORY': 'memory', 'REVIEW_QUEUE': 'sqlite',
+                    'REVIEW_QUEUE_PATH': str(tmp_path / 'reviews.db')})
+
+
+def test_repository_cache_serves_reads_across_requests(tmp_path, data_path):
+    app = create_app({
+        'TESTING': True,
+        'TEST_DATA_PATH': data_path,
+        'WTF_CSRF_ENABLED': False,
+        'REPOSITORY': 'database',
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'movies.db'),
+        'SQLALCHEMY_ECHO': False,
+        'PAGE_CACHE': '',
+        'REPOSITORY_CACHE': True,
+        'INSTRUMENTATION': True
+    })
+    try:
+        client = app.test_client()
+        client.post('authentication/login', data={'username': 'bmarshall7688', 'password': 'cLQ^C#oFXloS'})
+        for _ in range(2):
+            assert client.get('/review?movie=2').status_code == 200
+        assert repo.repo_instance.stats()['get_movie'] == {'hits': 1, 'misses': 1, 'hit_ratio': 0.5, 'entries': 1}
+
+        # Movies and users cached in earlier requests' sessions are written to in this one.
+        response = client.post('/review', data={'review': 'Cached but not stale', 'movie_rank': 2})
+        assert response.status_code == 302
+        assert b'Cached but not stale' in client.get('/movies?rank=2&view_reviews_for=2').data
+        with app.app_context():
+            assert repo.repo_instance.backend.get_movie(2).number_of_reviews == 1
+
+        assert b'movie_repository_cache_hits_total{method="get_movie"}' in client.get('/_metrics').data
+    finally:
+        instrumentation.metrics_instance = None
+        clear_mappers()
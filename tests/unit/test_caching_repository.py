@@ -0,0 +1,62 @@
+import time
+
+import pytest
+
+from movie.adapters.caching_repository import CachingRepository
+from movie.domain.movie import Movie
+from movie.domain.review import make_review
+from movie.domain.user import User
+
+
+@pytest.fixture
+def caching_repo(in_memory_repo):
+    return CachingRepository(in_memory_repo)
+
+
+def test_reads_are_served_from_the_cache_once_loaded(caching_repo, in_memory_repo):
+    movie = caching_repo.get_movie(1)
+    assert caching_repo.get_movie(1) is movie is in_memory_repo.get_movie(1)
+    assert caching_repo.get_user('prince') is None
+    assert caching_repo.get_user('prince') is None
+    assert caching_repo.get_number_of_movies() == in_memory_repo.get_number_of_movies()
+
+    stats = caching_repo.stats()
+    assert stats['get_movie'] == {'hits': 1, 'misses': 1, 'hit_ratio': 0.5, 'entries': 1}
+    assert stats['get_user']['hits'] == 1 and stats['get_user']['entries'] == 1
+    assert stats['get_number_of_movies']['misses'] == 1
+
+
+def test_entries_expire_and_are_evicted_beyond_the_method_bound(in_memory_repo, monkeypatch):
+    caching_repo = CachingRepository(in_memory_repo, policies={'get_movie': (60, 2)})
+    for rank in (1, 2, 3):
+        caching_repo.get_movie(rank)
+    caching_repo.get_movie(2)
+    assert caching_repo.stats()['get_movie']['entries'] == 2
+    caching_repo.get_movie(1)
+    assert caching_repo.stats()['get_movie']['hits'] == 1
+
+    now = time.monotonic()
+    monkeypatch.setattr('movie.adapters.caching_repository.time.monotonic', lambda: now + 61)
+    caching_repo.get_movie(2)
+    assert caching_repo.stats()['get_movie']['hits'] == 1
+
+
+def test_writes_evict_the_entries_they_make_stale(caching_repo):
+    assert caching_repo.get_user('Dave') is None
+    user = User('Dave', '123456789')
+    caching_repo.add_user(user)
+    assert caching_repo.get_user('Dave') is user
+
+    number_of_movies = caching_repo.get_number_of_movies()
+    last_movie = caching_repo.get_last_movie()
+    movie = Movie(last_movie.rank + 1, 'A Movie', 2014, 'Blah blah blah blah', 'Director', 121, '6.9', '69')
+    caching_repo.add_movie(movie)
+    assert caching_repo.get_number_of_movies() == number_of_movies + 1
+    assert caching_repo.get_last_movie() is movie
+
+    caching_repo.get_movie(1)
+    hits = caching_repo.stats()['get_movie']['hits']
+    caching_repo.add_review(make_review('Great', user, caching_repo.get_movie(1)))
+    caching_repo.get_movie(1)
+    assert caching_repo.stats()['get_movie']['hits'] == hits + 1
+    assert caching_repo.get_reviews()[-1].review == 'Great'
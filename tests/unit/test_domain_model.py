@@ -70,3 +70,21 @@ def test_make_review_establishes_relationships(movie, user):
 
 
 
+
+
+def test_movie_reviews_are_empty_until_first_review(movie, user):
+    assert list(movie.reviews) == []
+    assert movie.number_of_reviews == 0
+
+    make_review('Loved it', user, movie)
+    make_review('Still love it', user, movie)
+    assert movie.number_of_reviews == 2
+    assert [review.review for review in movie.reviews] == ['Loved it', 'Still love it']
+
+
+def test_actor_colleagues():
+    actor = Actor('Chris Pratt')
+    assert not actor.check_if_this_actor_worked_with(Actor('Zoe Saldana'))
+
+    actor.add_actor_colleague(Actor('Zoe Saldana'))
+    assert actor.check_if_this_actor_worked_with(Actor('Zoe Saldana'))
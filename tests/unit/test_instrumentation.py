@@ -0,0 +1,57 @@
+import pytest
+
+from movie import instrumentation
+from movie.instrumentation import InstrumentationMiddleware, Metrics, format_span_tree, span, timed
+from movie.movies import services
+
+
+@pytest.fixture
+def metrics():
+    instrumentation.metrics_instance = Metrics()
+    yield instrumentation.metrics_instance
+    instrumentation.metrics_instance = None
+
+
+def test_requests_are_traced_as_span_trees(metrics, in_memory_repo, tmp_path):
+    def application(environ, start_response):
+        environ['movie.endpoint'] = 'movies_bp.movies'
+        services.get_movies_page(0, 3, in_memory_repo)
+        with span('render'):
+            pass
+        start_response('200 OK', [])
+        return [b'']
+
+    middleware = InstrumentationMiddleware(application, metrics, profile_rate=1.0, profile_path=str(tmp_path))
+    middleware({'REQUEST_METHOD': 'GET', 'PATH_INFO': '/movies'}, lambda status, headers, exc_info=None: None)
+
+    trace, = metrics.recent_traces()
+    assert [child.name for child in trace.children] == ['services.get_movies_page', 'render']
+    assert [child.name for child in trace.children[0].children] == ['MemoryRepository.get_movies_page',
+                                                                   'services.movies_to_dict']
+    assert format_span_tree(trace).splitlines()[0].endswith(' ms  GET /movies')
+    assert sorted(path.suffix for path in tmp_path.iterdir()) == ['.prof', '.txt']
+
+    text = metrics.prometheus_text()
+    assert 'movie_responses_total{method="GET",endpoint="movies_bp.movies",status="200"} 1' in text
+    assert 'movie_span_duration_seconds_count{span="render"} 1' in text
+    assert 'movie_request_duration_seconds_bucket{method="GET",endpoint="movies_bp.movies",le="+Inf"} 1' in text
+
+
+def test_timed_functions_record_spans_only_while_enabled():
+    calls = []
+
+    @timed
+    def function(value):
+        calls.append(value)
+        return value
+
+    assert function(1) == 1 and calls == [1]
+    assert function.__name__ == 'function'
+
+    metrics = instrumentation.metrics_instance = Metrics()
+    try:
+        function(2)
+    finally:
+        instrumentation.metrics_instance = None
+    assert 'span="test_instrumentation.test_timed_functions_record_spans_only_while_enabled.<locals>.function"' in \
+           metrics.prometheus_text()
@@ -1,3 +1,4 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime
 from typing import List
 
@@ -9,7 +10,12 @@ from movie.domain.genre import Genre
 from movie.domain.movie import Movie
 from movie.domain.review import Review, make_review
 
-from movie.adapters.repository import RepositoryException
+from movie.adapters.repository import RepositoryException, MovieFilter, Statistics
+from movie.adapters import memory_repository, repository_snapshot, user_seed
+from movie.adapters.memory_repository import MemoryRepository
+from movie.adapters.search_index import SearchIndex
+from movie.adapters.facet_index import bitset_count, byte_table_bitset_count
+from werkzeug.security import check_password_hash
 
 
 def test_repository_can_add_a_user(in_memory_repo):
@@ -29,6 +35,25 @@ def test_repository_does_not_retrieve_a_non_existent_user(in_memory_repo):
     assert user is None
 
 
+def test_repository_retrieves_user_ignoring_surrounding_whitespace(in_memory_repo):
+    user = in_memory_repo.get_user(' bmarshall7688 ')
+    assert user.user_name == 'bmarshall7688'
+
+
+def test_repository_can_add_and_retrieve_actor_director_and_genre(in_memory_repo):
+    actor = Actor('Jane Doe')
+    director = Director('John Doe')
+    genre = Genre('Mockumentary')
+    in_memory_repo.add_actor(actor)
+    in_memory_repo.add_director(director)
+    in_memory_repo.add_genre(genre)
+
+    assert in_memory_repo.get_actor('Jane Doe') is actor
+    assert in_memory_repo.get_director('John Doe') is director
+    assert in_memory_repo.get_genre('Mockumentary') is genre
+    assert in_memory_repo.get_actor('Nobody') is None
+
+
 def test_repository_can_retrieve_movie_count(in_memory_repo):
     number_of_articles = in_memory_repo.get_number_of_movies()
 
@@ -57,6 +82,17 @@ def test_repository_can_retrieve_movie(in_memory_repo):
 
 
 
+def test_repository_loads_shared_genres_and_actors(in_memory_repo):
+    guardians = in_memory_repo.get_movie(1)
+    prometheus = in_memory_repo.get_movie(2)
+
+    assert guardians.genres == [Genre('Action'), Genre('Adventure'), Genre('Sci-Fi')]
+    assert Actor('Chris Pratt') in guardians.actors
+    # Genres and actors are interned, so movies share a single instance per name.
+    assert guardians.genres[2] is prometheus.genres[2] is in_memory_repo.get_genre('Sci-Fi')
+    assert in_memory_repo.get_director('Ridley Scott') == 'Ridley Scott'
+
+
 def test_repository_does_not_retrieve_a_non_existent_movie(in_memory_repo):
     movie = in_memory_repo.get_movie(1001)
     assert movie is None
@@ -78,6 +114,57 @@ def test_repository_can_get_last_movie(in_memory_repo):
     assert movie.title == 'Nine Lives'
 
 
+def test_repository_can_get_movies_page(in_memory_repo):
+    movies = in_memory_repo.get_movies_page(2, 3)
+
+    assert [movie.rank for movie in movies] == [3, 4, 5]
+
+
+def test_repository_returns_short_last_page(in_memory_repo):
+    movies = in_memory_repo.get_movies_page(998, 10)
+
+    assert [movie.rank for movie in movies] == [999, 1000]
+    assert in_memory_repo.get_movies_page(1000, 10) == []
+
+
+def test_repository_can_search_movies(in_memory_repo):
+    movies = in_memory_repo.search_movies('guardians galaxy')
+
+    assert movies[0].title == 'Guardians of the Galaxy'
+    assert len(movies) <= 20
+
+
+def test_repository_search_includes_added_movie(in_memory_repo):
+    movie = Movie(1001, 'Zxqv Returns', 2014, 'Blah blah blah blah', 'Director', 121, '6.9', '69')
+    in_memory_repo.add_movie(movie)
+
+    assert in_memory_repo.search_movies('zxqv') == [movie]
+    assert in_memory_repo.search_movies('qqqq wwww') == []
+
+
+def test_search_index_removes_only_the_documents_postings():
+    index = SearchIndex()
+    index.add_document(1, 'Alien', 'A crew meets an alien')
+    index.add_document(2, 'Aliens', 'The crew returns')
+    with pytest.raises(ValueError):
+        index.add_document(1, 'Alien', '')
+
+    index.remove_document(1, 'Alien', 'A crew meets an alien')
+    assert len(index) == 1
+    assert index.search('alien crew') == [2]
+    index.add_document(1, 'Alien', 'Director\'s cut')
+    assert index.search('cut') == [1]
+
+
+def test_repository_search_folds_case_and_diacritics(in_memory_repo):
+    movie = Movie(1001, 'Amélie', 2001, 'Une fille timide à Montmartre', 'Director', 122, '8.3', '69')
+    in_memory_repo.add_movie(movie)
+
+    assert in_memory_repo.search_movies('amelie') == [movie]
+    assert in_memory_repo.search_movies('AMÉLIE') == [movie]
+    assert in_memory_repo.search_movies('montmartre_') == [movie]
+
+
 def test_repository_returns_rank_of_previous_movie(in_memory_repo):
     movie = in_memory_repo.get_movie(6)
     previous_rank = in_memory_repo.get_rank_of_previous_movie(movie)
@@ -124,7 +211,160 @@ def test_repository_does_not_add_a_review_without_a_user(in_memory_repo):
         in_memory_repo.add_review(review)
 
 def test_repository_can_retrieve_reviews(in_memory_repo):
-    assert len(in_memory_repo.get_reviews()) == 1
+    assert len(in_memory_repo.get_reviews()) == 3
+
+
+def test_repository_keeps_statistics_as_movies_and_reviews_are_added(in_memory_repo):
+    assert in_memory_repo.get_statistics()[:2] == (1000, 3)
+    assert [movie.rank for movie in in_memory_repo.get_most_reviewed_movies(5)] == [1]
+
+    user = in_memory_repo.get_user('kilic20')
+    for rank in (3, 2, 3):
+        in_memory_repo.add_review(make_review('Meh, could be better', user, in_memory_repo.get_movie(rank)))
+    assert [movie.rank for movie in in_memory_repo.get_most_reviewed_movies(5)] == [1, 3, 2]
+    assert [movie.rank for movie in in_memory_repo.get_most_reviewed_movies(2)] == [1, 3]
+
+    movie = Movie(1001, 'A Movie', 2020, 'Blah blah blah blah', 'New Director', 121, '9.5', '69')
+    movie.add_genre(Genre('Drama'))
+    in_memory_repo.add_movie(movie)
+    assert in_memory_repo.get_director_statistics('New Director') == Statistics(1, 0, 1, 9.5, 9.5, 9.5, 2020, 2020)
+    assert in_memory_repo.get_director_statistics('Nobody') is None
 
+    statistics = in_memory_repo.get_statistics()
+    assert (statistics.movies, statistics.reviews, statistics.max_rating, statistics.last_year) == (1001, 6, 9.5, 2020)
+    assert statistics.reviews_per_movie == 6 / 1001
 
+    genres = in_memory_repo.get_genre_statistics()
+    assert list(genres)[:3] == ['Drama', 'Action', 'Comedy']
+    assert genres['Drama'].movies == 514 and genres['Drama'].max_rating == 9.5
 
+
+def test_seed_users_can_be_pre_hashed(tmp_path):
+    plaintext = tmp_path / 'plaintext.csv'
+    plaintext.write_text('id,username,password\n1,dbowie,Ziggy1972\n')
+    hashed = tmp_path / 'hashed.csv'
+
+    assert user_seed.convert_seed_file(str(plaintext), str(hashed)) == 1
+    assert hashed.read_text().startswith('id,username,password_hash\n1,dbowie,pbkdf2:sha256:')
+
+    [(user_id, user_name, password_hash)] = user_seed.load_user_records(str(hashed))
+    assert (user_id, user_name) == ('1', 'dbowie')
+    assert check_password_hash(password_hash, 'Ziggy1972')
+
+
+def test_plaintext_seed_users_are_hashed_while_loading(tmp_path):
+    plaintext = tmp_path / 'plaintext.csv'
+    number_of_users = user_seed.PARALLEL_HASH_THRESHOLD
+    plaintext.write_text('id,username,password\n' + ''.join(f'{i},user{i},secret{i}\n' for i in range(number_of_users)))
+
+    records = user_seed.load_user_records(str(plaintext))
+
+    assert len(records) == number_of_users
+    assert check_password_hash(records[-1][2], f'secret{number_of_users - 1}')
+
+
+def test_repository_snapshot_round_trip(in_memory_repo, tmp_path):
+    snapshot = str(tmp_path / 'repository.snapshot')
+    repository_snapshot.save(in_memory_repo, snapshot, b'f' * 32)
+
+    repo = repository_snapshot.load(snapshot, b'f' * 32)
+
+    assert repo.get_number_of_movies() == 1000
+    assert repo.get_movie(1).genres[2] is repo.get_genre('Sci-Fi')
+    assert repo.get_user('kilic20').user_name == 'kilic20'
+    assert repo.search_movies('prometheus')[0].rank == 2
+
+
+def test_repository_snapshot_is_rejected_when_stale_or_corrupt(in_memory_repo, tmp_path):
+    snapshot = tmp_path / 'repository.snapshot'
+    repository_snapshot.save(in_memory_repo, str(snapshot), b'f' * 32)
+
+    with pytest.raises(repository_snapshot.SnapshotError, match='source files have changed'):
+        repository_snapshot.load(str(snapshot), b'g' * 32)
+
+    data = bytearray(snapshot.read_bytes())
+    data[-1] ^= 0xff
+    snapshot.write_bytes(bytes(data))
+    with pytest.raises(repository_snapshot.SnapshotError, match='checksum mismatch'):
+        repository_snapshot.load(str(snapshot), b'f' * 32)
+
+
+def test_repository_snapshot_is_written_once_and_reused(data_path, tmp_path):
+    snapshot = str(tmp_path / 'repository.snapshot')
+    populated = []
+
+    def populate(data_path, repo):
+        populated.append(data_path)
+        memory_repository.populate(data_path, repo)
+
+    first = repository_snapshot.load_or_populate(snapshot, data_path, MemoryRepository, populate)
+    second = repository_snapshot.load_or_populate(snapshot, data_path, MemoryRepository, populate)
+
+    assert populated == [data_path]
+    assert second is not first
+    assert second.get_movie(3).title == first.get_movie(3).title == 'Split'
+
+
+def test_repository_filters_movies_by_facets(in_memory_repo):
+    movie_filter = MovieFilter(genres=('Action', 'Sci-Fi'), min_year=2015)
+    movies = in_memory_repo.get_movies_by_filter(movie_filter, 0, 3)
+    assert [movie.rank for movie in movies] == [13, 25, 33]
+    assert all(movie.year >= 2015 and Genre('Action') in movie.genres for movie in movies)
+    assert [movie.rank for movie in in_memory_repo.get_movies_by_filter(movie_filter, 25, 2)] == [33, 35]
+
+    ridley_scott = in_memory_repo.get_movies_by_filter(MovieFilter(director='Ridley Scott'), 0, 10)
+    assert [movie.title for movie in ridley_scott][:2] == ['Prometheus', 'The Martian']
+    assert in_memory_repo.get_movies_by_filter(MovieFilter(genres=('Not a genre',)), 0, 10) == []
+
+
+def test_repository_counts_facets_of_filtered_movies(in_memory_repo):
+    total, facets = in_memory_repo.get_facet_counts(MovieFilter(genres=('Action', 'Sci-Fi'), min_year=2015))
+    assert total == 21
+    assert facets['year'] == {2015: 10, 2016: 11}
+    assert facets['genre']['Action'] == facets['genre']['Sci-Fi'] == 21
+    assert sum(facets['rating'].values()) == 21
+
+    total, facets = in_memory_repo.get_facet_counts(MovieFilter(min_rating=8.5))
+    assert set(facets['rating']) == {8, 9}
+    assert total == facets['rating'][8] + facets['rating'][9]
+
+
+@pytest.mark.parametrize('bitset', [0, 1, 0b1011, 1 << 1000, (1 << 4096) - 1, int('10' * 5000, 2)])
+def test_bitsets_are_counted_without_int_bit_count(bitset):
+    assert byte_table_bitset_count(bitset) == bitset_count(bitset) == bin(bitset).count('1')
+
+
+def test_repository_gets_top_movies(in_memory_repo):
+    movies = [in_memory_repo.get_movie(rank) for rank in range(1, 1001)]
+    best_rated = sorted(movies, key=lambda movie: (-movie.rating, movie.rank))[:10]
+    assert in_memory_repo.get_top_movies('rating', 10) == best_rated
+
+    metascores = in_memory_repo.get_top_movies('metascore', 1000)
+    assert all(movie.metascore not in ('', 'N/A') for movie in metascores)
+    assert [int(movie.metascore) for movie in metascores] == sorted(int(movie.metascore) for movie in metascores)[::-1]
+
+    with pytest.raises(RepositoryException):
+        in_memory_repo.get_top_movies('runtime', 10)
+
+
+def test_repository_answers_concurrent_first_top_movies_queries(in_memory_repo):
+    # The first queries after loading all sort the index; each must see it sorted exactly once.
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(lambda _: in_memory_repo.get_top_movies('votes', 1000), range(8)))
+    assert len(results[0]) == len({movie.rank for movie in results[0]})
+    assert all(result == results[0] for result in results)
+
+
+def test_repository_gets_top_movies_matching_a_filter(in_memory_repo):
+    movie_filter = MovieFilter(genres=('Action', 'Sci-Fi'), min_year=2015)
+    matching = in_memory_repo.get_movies_by_filter(movie_filter, 0, 1000)
+    by_votes = sorted(matching, key=lambda movie: (-movie.votes, movie.rank))
+    assert in_memory_repo.get_top_movies('votes', 5, movie_filter) == by_votes[:5]
+    assert in_memory_repo.get_top_movies('votes', 100, movie_filter) == by_votes
+
+    blockbuster = Movie(1001, 'Blockbuster', 2016, 'A big one', None, 120, 5.0, 'N/A', revenue=1000.0)
+    blockbuster.add_genre(Genre('Action'))
+    in_memory_repo.add_movie(blockbuster)
+    assert in_memory_repo.get_top_movies('revenue', 1) == [blockbuster]
+    assert in_memory_repo.get_top_movies('revenue', 1, MovieFilter(genres=('Action',), min_year=2016)) == [blockbuster]
+    assert in_memory_repo.get_top_movies('revenue', 3, MovieFilter(genres=('Not a genre',))) == []
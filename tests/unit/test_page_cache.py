@@ -0,0 +1,65 @@
+import pytest
+
+from movie.movies.page_cache import PageCache, MemoryPageStore, SqlitePageStore, page_key
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def make_store(request, tmp_path):
+    def make(**limits):
+        if request.param == 'memory':
+            return MemoryPageStore(**limits)
+        return SqlitePageStore(str(tmp_path / 'pages.db'), **limits)
+    return make
+
+
+def test_page_cache_counts_hits_and_misses(make_store):
+    cache = PageCache(make_store())
+    assert cache.get(page_key(1, -1, None)) is None
+
+    cache.put(page_key(1, -1, None), '<html>1</html>', [1, 2, 3])
+    assert cache.get(page_key(1, -1, None)) == '<html>1</html>'
+    assert cache.get(page_key(1, -1, 'fmercury')) is None
+    assert cache.get(page_key(1, -1, None, '1:1:2020-01-01')) is None
+    assert cache.stats() == {'hits': 1, 'misses': 3, 'entries': 1}
+
+
+def test_invalidating_a_movie_evicts_only_pages_listing_it(make_store):
+    store = make_store()
+    store.put('1', 'ranks 1-3', [1, 2, 3])
+    store.put('3', 'ranks 3-5', [3, 4, 5])
+    store.put('4', 'ranks 4-6', [4, 5, 6])
+
+    store.invalidate_movie(3)
+    assert store.get('1') is None
+    assert store.get('3') is None
+    assert store.get('4') == 'ranks 4-6'
+
+
+def test_least_recently_used_pages_are_evicted(make_store):
+    store = make_store(max_entries=2, max_bytes=100)
+    store.put('1', 'a', [1])
+    store.put('2', 'b', [2])
+    store.get('1')
+    store.put('3', 'c', [3])
+    assert [store.get(key) for key in ('1', '2', '3')] == ['a', None, 'c']
+
+    # Pages larger than the whole cache are not stored; the size limit evicts as well.
+    store.put('4', 'x' * 101, [4])
+    assert store.get('4') is None
+    store.put('5', 'y' * 100, [5])
+    assert len(store) == 1
+
+
+def test_pages_expire(make_store):
+    store = make_store(ttl=-1)
+    store.put('1', 'a', [1])
+    assert store.get('1') is None
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    filename = str(tmp_path / 'pages.db')
+    SqlitePageStore(filename).put('1', 'a', [1])
+    assert SqlitePageStore(filename).get('1') == 'a'
+
+    SqlitePageStore(filename).invalidate_movie(1)
+    assert SqlitePageStore(filename).get('1') is None
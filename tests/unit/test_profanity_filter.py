@@ -0,0 +1,55 @@
+import pytest
+from better_profanity import profanity
+
+from movie.movies.profanity_filter import ProfanityMatcher, create_profanity_matcher
+
+
+@pytest.fixture
+def matcher():
+    return create_profanity_matcher({})
+
+
+@pytest.mark.parametrize('text', [
+    'What a load of shit', 'SHIT!', 'sh1t film', '$h17', 'a bull shit plot', 'bullshit', 'the a$$ of it'])
+def test_matcher_finds_profanity_and_its_leet_spellings(matcher, text):
+    assert matcher.contains_profanity(text)
+    assert profanity.contains_profanity(text)
+
+
+@pytest.mark.parametrize('text', [
+    'A classic', 'Shitake mushrooms', 'bull-shit', 'Assessment of the cast', 'shit_', 'Nothing to see here'])
+def test_matcher_only_matches_whole_words(matcher, text):
+    assert matcher.contains_profanity(text) == profanity.contains_profanity(text)
+
+
+@pytest.mark.parametrize('text', ['blow job', 'blow-job', 'blow.job', 'blow  job', 'Blow-Job was bad', 'bl0w j0b'])
+def test_matcher_finds_phrases_split_by_any_separators(matcher, text):
+    assert matcher.contains_profanity(text)
+    assert profanity.contains_profanity(text)
+
+
+@pytest.mark.parametrize('text', ['what a booty-call', 'booty  call', 'Booty... call'])
+def test_matcher_finds_phrases_the_library_only_finds_with_one_space(matcher, text):
+    # 'booty call' has no one-word spelling in the wordlist, so better_profanity needs the exact separator.
+    assert matcher.contains_profanity(text)
+    assert not profanity.contains_profanity(text)
+
+
+def test_matcher_uses_a_configurable_wordlist(tmp_path):
+    wordlist = tmp_path / 'words.txt'
+    wordlist.write_text('spoiler\nplot twist\ndarn\n')
+    matcher = create_profanity_matcher({'PROFANITY_WORDLIST': str(wordlist), 'PROFANITY_WHITELIST': 'darn'})
+
+    assert matcher.contains_profanity('No sp0il3rs please, just one SPOILER')
+    assert matcher.contains_profanity('What a plot twist')
+    assert matcher.contains_profanity('What a plot -- twist!')
+    assert not matcher.contains_profanity('What a plottwist')
+    assert not matcher.contains_profanity('Darn good movie')
+    assert not matcher.contains_profanity('What a shit plot')
+
+
+def test_matcher_checks_many_reviews_at_once():
+    matcher = ProfanityMatcher(['damn', 'blast it'])
+    reviews = ['Damn fine', 'fine', '', 'blast', 'it', 'well, blast it', 'damnation']
+    assert matcher.check_many(reviews) == [True, False, False, False, False, True, False]
+    assert matcher.check_many([]) == []
@@ -0,0 +1,56 @@
+import os
+import sqlite3
+
+from sqlalchemy import create_engine
+
+from movie.adapters import database_repository, orm, review_csv
+from movie.adapters.memory_repository import MemoryRepository, load_movies, load_users
+from movie.movies.profanity_filter import create_profanity_matcher
+
+
+def write_reviews(filename, rows):
+    with open(filename, 'w', encoding='utf-8', newline='') as outfile:
+        outfile.write(','.join(review_csv.HEADER) + '\n')
+        for row in rows:
+            outfile.write(','.join(row) + '\n')
+
+
+def test_memory_import_adds_every_review_of_known_users_and_movies(data_path, tmp_path):
+    repo = MemoryRepository()
+    load_movies(data_path, repo)
+    users = load_users(data_path, repo)
+    filename = str(tmp_path / 'reviews.csv')
+    write_reviews(filename, [
+        ('1', '1', '2', 'Great', '2020-03-01 10:00:00'),
+        ('2', '2', '2', 'Not for me', '2020-03-01 11:00:00'),
+        ('3', '99', '2', 'Unknown author', '2020-03-01 12:00:00'),
+        ('4', '1', '5000', 'Unknown movie', '2020-03-01 13:00:00'),
+    ])
+
+    progress = []
+    added, skipped = review_csv.ingest_reviews(filename, review_csv.MemoryReviewSink(repo, users), chunk_size=3,
+                                               progress=lambda rows, elapsed: progress.append(rows))
+    assert (added, skipped) == (2, 2)
+    assert progress == [3, 4]
+    assert [review.review for review in repo.get_movie(2).reviews] == ['Great', 'Not for me']
+    assert len(repo.get_reviews()) == 2
+
+
+def test_database_reviews_round_trip_through_csv(data_path, tmp_path):
+    engine = create_engine('sqlite:///' + str(tmp_path / 'movies.db'))
+    orm.metadata.create_all(engine)
+    database_repository.populate(engine, data_path)
+
+    exported = str(tmp_path / 'exported.csv')
+    conn = sqlite3.connect(str(tmp_path / 'movies.db'))
+    assert review_csv.export_reviews(conn, exported, chunk_size=2) == 3
+    records = list(review_csv.read_review_records(exported))
+    assert records == list(review_csv.read_review_records(os.path.join(data_path, 'reviews.csv')))
+
+    write_reviews(exported, [('1', '1', '3', 'What a load of sh1t', '2020-03-01 10:00:00'),
+                             ('2', '1', '3', 'Fine', '2020-03-01 10:05:00')])
+    added, skipped = review_csv.ingest_reviews(exported, review_csv.DatabaseReviewSink(conn),
+                                               create_profanity_matcher({}))
+    assert (added, skipped) == (1, 1)
+    assert conn.execute("SELECT review FROM reviews WHERE movie = 3").fetchall() == [('Fine',)]
+    conn.close()
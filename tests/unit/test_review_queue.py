@@ -0,0 +1,94 @@
+import time
+from datetime import datetime
+
+import pytest
+
+from movie.movies import services
+from movie.movies.review_queue import ReviewQueue
+
+
+@pytest.fixture
+def make_queue(tmp_path, in_memory_repo):
+    def make(apply_batch=None, **options):
+        if apply_batch is None:
+            apply_batch = lambda reviews: services.apply_queued_reviews(reviews, in_memory_repo)
+        return ReviewQueue(str(tmp_path / 'reviews.db'), apply_batch, **options)
+    return make
+
+
+def test_queued_reviews_are_pending_until_applied(make_queue, in_memory_repo):
+    queue = make_queue()
+    queue.enqueue(2, 'bmarshall7688', 'Worth the wait', datetime(2020, 3, 1, 12, 30))
+    queue.enqueue(3, 'bmarshall7688', 'Not bad at all')
+
+    assert [review.review_text for review in queue.pending('bmarshall7688')] == ['Worth the wait', 'Not bad at all']
+    assert queue.pending('someone else') == []
+    assert in_memory_repo.get_movie(2).number_of_reviews == 0
+
+    assert queue.apply_pending() == 2
+    assert queue.pending('bmarshall7688') == []
+    review = next(in_memory_repo.get_movie(2).reviews)
+    assert (review.review, review.user.user_name, review.timestamp) == \
+           ('Worth the wait', 'bmarshall7688', datetime(2020, 3, 1, 12, 30))
+
+
+def test_review_queue_applies_batches_and_reports_stats(make_queue):
+    queue = make_queue(batch_size=2)
+    for rank in (2, 3, 1001):
+        queue.enqueue(rank, 'bmarshall7688', 'Queued in a batch')
+    assert queue.stats()['depth'] == 3
+
+    queue.drain()
+    stats = queue.stats()
+    assert (stats['depth'], stats['batches'], stats['applied'], stats['failed']) == (0, 2, 2, 1)
+    assert 0 <= stats['mean_latency_seconds'] <= stats['max_latency_seconds']
+
+
+def test_claimed_reviews_are_retried_after_their_lease(make_queue, in_memory_repo):
+    def crash(reviews):
+        raise RuntimeError('worker died')
+
+    crashing = make_queue(crash, lease=0)
+    crashing.enqueue(2, 'bmarshall7688', 'Applied on the second attempt')
+    with pytest.raises(RuntimeError):
+        crashing.apply_pending()
+
+    queue = make_queue()
+    assert queue.apply_pending() == 1
+    assert [review.review for review in in_memory_repo.get_movie(2).reviews] == ['Applied on the second attempt']
+
+
+def test_failing_reviews_are_retried_alone_and_given_up(make_queue, in_memory_repo):
+    def apply_batch(reviews):
+        if any(review.review_text == 'Poison' for review in reviews):
+            raise RuntimeError('cannot apply')
+        return services.apply_queued_reviews(reviews, in_memory_repo)
+
+    queue = make_queue(apply_batch, lease=0, max_attempts=2)
+    for text in ('First', 'Poison', 'Last'):
+        queue.enqueue(2, 'bmarshall7688', text)
+    with pytest.raises(RuntimeError):
+        queue.apply_pending()
+    # The batch failed as a whole, so its reviews are retried one by one.
+    assert queue.apply_pending() == 1
+    with pytest.raises(RuntimeError):
+        queue.apply_pending()
+    # The poison review has had its attempts and is given up; the last review is applied.
+    assert queue.apply_pending() == 2
+    assert queue.apply_pending() == 0
+    assert [review.review for review in in_memory_repo.get_movie(2).reviews] == ['First', 'Last']
+    stats = queue.stats()
+    assert (stats['depth'], stats['applied'], stats['failed']) == (0, 2, 1)
+
+
+def test_review_queue_worker_applies_reviews_in_the_background(make_queue, in_memory_repo):
+    queue = make_queue(interval=0.01)
+    queue.start()
+    try:
+        queue.enqueue(2, 'bmarshall7688', 'Applied by the worker')
+        deadline = time.time() + 5
+        while not in_memory_repo.get_movie(2).number_of_reviews and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        queue.stop()
+    assert [review.review for review in in_memory_repo.get_movie(2).reviews] == ['Applied by the worker']
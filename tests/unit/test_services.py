@@ -105,6 +105,27 @@ def test_can_get_movie(in_memory_repo):
 
 
 
+def test_get_movies_page(in_memory_repo):
+    movies_as_dict, next_rank = movie_services.get_movies_page(0, 10, in_memory_repo)
+
+    assert [movie['rank'] for movie in movies_as_dict] == list(range(1, 11))
+    assert next_rank == 11
+
+
+def test_get_movies_page_at_end_of_catalogue(in_memory_repo):
+    movies_as_dict, next_rank = movie_services.get_movies_page(995, 10, in_memory_repo)
+
+    assert [movie['rank'] for movie in movies_as_dict] == [996, 997, 998, 999, 1000]
+    assert next_rank is None
+
+
+def test_can_search_movies(in_memory_repo):
+    movies_as_dict = movie_services.search_movies('Prometheus', in_memory_repo)
+
+    assert movies_as_dict[0]['rank'] == 2
+    assert movies_as_dict[0]['title'] == 'Prometheus'
+
+
 def test_cannot_get_movie_with_non_existent_rank(in_memory_repo):
     movie_rank = 1001
 
@@ -146,3 +167,34 @@ def test_get_reviews_for_movies_without_reviews(in_memory_repo):
     reviews_as_dict = movie_services.get_review_for_movie(2, in_memory_repo)
     assert len(reviews_as_dict) == 0
 
+
+
+def test_movies_page_version_changes_when_a_review_is_added(in_memory_repo):
+    version, last_modified = movie_services.get_movies_page_version(2, 2, in_memory_repo)
+    assert last_modified is None
+
+    movie_services.add_review(3, 'Changes the page', 'bmarshall7688', in_memory_repo)
+    new_version, last_modified = movie_services.get_movies_page_version(2, 2, in_memory_repo)
+    assert new_version != version
+    assert last_modified is not None
+
+
+def test_movie_projections(in_memory_repo):
+    assert movie_services.get_first_movie(in_memory_repo, movie_services.RANK_FIELDS) == {'rank': 1}
+
+    summary = movie_services.get_movie(1, in_memory_repo, movie_services.SUMMARY_FIELDS)
+    assert 'reviews' not in summary
+    assert summary['review_count'] == 3
+
+
+def test_lazy_movie_dicts_convert_reviews_only_when_read(in_memory_repo):
+    movies, next_rank = movie_services.get_movies_page(0, 2, in_memory_repo, lazy=True)
+    guardians = movies[0]
+    assert guardians.materialized == []
+    assert guardians['review_count'] == 3
+
+    guardians['view_review_url'] = '/movies?rank=1&view_reviews_for=1'
+    assert dict(guardians) == movie_services.get_movie(1, in_memory_repo) | {
+        'view_review_url': '/movies?rank=1&view_reviews_for=1'}
+    assert guardians.materialized == ['reviews']
+    assert movies[1].materialized == []
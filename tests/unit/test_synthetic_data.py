@@ -0,0 +1,40 @@
+from collections import Counter
+
+from sqlalchemy import create_engine
+
+from movie.adapters import database_repository, memory_repository, orm, review_csv, synthetic_data
+from movie.adapters.memory_repository import MemoryRepository
+from movie.authentication.services import authenticate_user
+
+
+def test_generated_dataset_loads_into_both_repositories(tmp_path):
+    assert synthetic_data.generate(str(tmp_path), 500, 20, 2000, seed=1) == {'movies': 500, 'users': 20,
+                                                                           'reviews': 2000}
+
+    repo = MemoryRepository()
+    memory_repository.populate(str(tmp_path), repo)
+    assert repo.get_number_of_movies() == 500
+    assert sum(movie.number_of_reviews for movie in repo.get_movies_page(0, 500)) == 2000
+    authenticate_user('ben1', synthetic_data.DEFAULT_PASSWORD, repo)
+
+    engine = create_engine('sqlite:///' + str(tmp_path / 'movies.db'))
+    orm.metadata.create_all(engine)
+    database_repository.create_search_index(engine)
+    database_repository.populate(engine, str(tmp_path))
+    assert engine.execute('SELECT COUNT(*) FROM reviews').scalar() == 2000
+    assert engine.execute('SELECT COUNT(*) FROM movies_fts').scalar() == 500
+
+
+def test_generated_dataset_is_deterministic_and_skewed(tmp_path):
+    for directory in ('a', 'b', 'c'):
+        synthetic_data.generate(str(tmp_path / directory), 200, 50, 5000, seed=2 if directory == 'c' else 1)
+    for filename in ('Data1000Movies.csv', 'users.csv', 'reviews.csv'):
+        assert (tmp_path / 'a' / filename).read_bytes() == (tmp_path / 'b' / filename).read_bytes()
+    assert (tmp_path / 'a' / 'reviews.csv').read_bytes() != (tmp_path / 'c' / 'reviews.csv').read_bytes()
+
+    reviews = list(review_csv.read_review_records(str(tmp_path / 'a' / 'reviews.csv')))
+    reviews_per_movie = Counter(review.movie_rank for review in reviews).most_common()
+    assert reviews_per_movie[0][0] == 1
+    # The most reviewed tenth of the movies gets most of the reviews.
+    assert sum(count for rank, count in reviews_per_movie[:20]) > len(reviews) / 2
+    assert [review.timestamp for review in reviews] == sorted(review.timestamp for review in reviews)